@@ -0,0 +1,233 @@
+"""
+Aggregator - Monta velas de timeframes maiores (5m/15m/1h) a partir de velas de 1m
+
+Em vez de consultar /klines para cada timeframe, as velas maiores são
+construídas localmente: cada vela de 1m fechada atualiza incrementalmente
+a vela em andamento de cada timeframe.
+"""
+import threading
+from collections import deque
+import numpy as np
+from candles import CandleSeries, FIELDS
+from kline_store import INTERVAL_MS
+
+
+def resample(series, interval, complete_only=False, base_interval=None):
+    """
+    Agrega uma CandleSeries em velas de `interval` (alinhadas pelo timestamp)
+    complete_only=True descarta buckets que não têm todas as velas base
+    """
+    if len(series) == 0:
+        return CandleSeries.empty()
+
+    interval_ms = INTERVAL_MS[interval]
+    timestamps = series['timestamp']
+    buckets = timestamps - timestamps % interval_ms
+
+    # Início de cada bucket (série ordenada por timestamp)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(series)] - 1
+
+    columns = {
+        'timestamp': buckets[starts],
+        'open': series['open'][starts],
+        'high': np.maximum.reduceat(series['high'], starts),
+        'low': np.minimum.reduceat(series['low'], starts),
+        'close': series['close'][ends],
+        'volume': np.add.reduceat(series['volume'], starts),
+        'close_time': buckets[starts] + interval_ms - 1,
+        'quote_volume': np.add.reduceat(series['quote_volume'], starts),
+        'trades': np.add.reduceat(series['trades'], starts),
+    }
+    result = CandleSeries(columns)
+
+    if complete_only:
+        if base_interval is None:
+            base_ms = int(np.min(np.diff(timestamps))) if len(timestamps) > 1 else interval_ms
+        else:
+            base_ms = INTERVAL_MS[base_interval]
+        counts = ends - starts + 1
+        complete = counts == interval_ms // base_ms
+        result = CandleSeries({name: col[complete] for name, col in result.columns.items()})
+
+    return result
+
+
+class CandleAggregator:
+    def __init__(self, base_interval='1m', intervals=('5m', '15m', '1h'), max_candles=1000):
+        """
+        base_interval: intervalo das velas recebidas em update()
+        intervals: timeframes montados localmente (múltiplos do base)
+        max_candles: quantas velas fechadas guardar por timeframe
+        """
+        self.base_interval = base_interval
+        self.base_ms = INTERVAL_MS[base_interval]
+        self.intervals = [i for i in intervals if i != base_interval]
+        self.callbacks = []
+
+        for interval in self.intervals:
+            if INTERVAL_MS[interval] % self.base_ms:
+                raise ValueError(f"{interval} não é múltiplo de {base_interval}")
+
+        self.history = {interval: deque(maxlen=max_candles) for interval in self.intervals}
+        self._current = {interval: None for interval in self.intervals}
+        self._open_base = None
+        self.last_timestamp = None
+        self._lock = threading.RLock()
+
+    def on_close(self, callback):
+        """Registra callback(interval, candle, complete) chamado quando uma vela maior fecha"""
+        self.callbacks.append(callback)
+
+    def seed(self, series):
+        """
+        Alimenta o agregador com velas base já fechadas (histórico)
+        Começa no início de um bucket do maior timeframe para não criar velas parciais
+        Com o agregador vazio, cada timeframe é montado direto das colunas (resample)
+        """
+        if len(series) == 0 or not self.intervals:
+            return
+
+        largest_ms = max(INTERVAL_MS[i] for i in self.intervals)
+        timestamps = series['timestamp']
+        aligned = np.flatnonzero(timestamps % largest_ms == 0)
+        start = int(aligned[0]) if len(aligned) else 0
+        series = series[start:]
+
+        with self._lock:
+            if self.last_timestamp is not None:
+                for candle in series:
+                    self._update(candle, True)
+                return
+
+            timestamps = series['timestamp']
+            last_ts = int(timestamps[-1])
+            for interval in self.intervals:
+                interval_ms = INTERVAL_MS[interval]
+                _, counts = np.unique(timestamps - timestamps % interval_ms, return_counts=True)
+                candles = resample(series, interval).to_dicts()
+                for candle, count in zip(candles, counts.tolist()):
+                    candle['base_count'] = count
+
+                # Só o último bucket pode estar em andamento
+                current = candles.pop()
+                for candle in candles:
+                    self._close(interval, candle)
+                if last_ts + self.base_ms >= current['timestamp'] + interval_ms:
+                    self._close(interval, current)
+                else:
+                    self._current[interval] = current
+
+            self.last_timestamp = last_ts
+            if self._open_base is not None and self._open_base['timestamp'] <= last_ts:
+                self._open_base = None
+
+    def update(self, candle, closed=True):
+        """
+        Recebe uma vela base (dict)
+        closed=False: vela ainda em andamento, usada só para a vela provisória
+        """
+        with self._lock:
+            self._update(candle, closed)
+
+    def _update(self, candle, closed):
+        if not closed:
+            self._open_base = candle
+            return
+
+        if self.last_timestamp is not None and candle['timestamp'] <= self.last_timestamp:
+            return  # Vela repetida/antiga
+
+        self.last_timestamp = candle['timestamp']
+        if self._open_base is not None and self._open_base['timestamp'] <= candle['timestamp']:
+            self._open_base = None
+
+        for interval in self.intervals:
+            interval_ms = INTERVAL_MS[interval]
+            bucket = candle['timestamp'] - candle['timestamp'] % interval_ms
+            current = self._current[interval]
+
+            if current is not None and current['timestamp'] != bucket:
+                # Bucket anterior ficou incompleto (ex: falha no stream)
+                self._close(interval, current)
+                current = None
+
+            if current is None:
+                current = self._new_candle(bucket, interval_ms, candle)
+                self._current[interval] = current
+            else:
+                self._merge(current, candle)
+
+            if candle['timestamp'] + self.base_ms >= bucket + interval_ms:
+                self._close(interval, current)
+
+    def _new_candle(self, bucket, interval_ms, candle):
+        new = {name: candle[name] for name in FIELDS}
+        new['timestamp'] = bucket
+        new['close_time'] = bucket + interval_ms - 1
+        new['base_count'] = 1
+        return new
+
+    def _merge(self, current, candle):
+        current['high'] = max(current['high'], candle['high'])
+        current['low'] = min(current['low'], candle['low'])
+        current['close'] = candle['close']
+        current['volume'] += candle['volume']
+        current['quote_volume'] += candle['quote_volume']
+        current['trades'] += candle['trades']
+        current['base_count'] += 1
+
+    def _close(self, interval, current):
+        """Fecha a vela do timeframe e avisa os callbacks"""
+        complete = current.pop('base_count') == INTERVAL_MS[interval] // self.base_ms
+        self.history[interval].append(current)
+        self._current[interval] = None
+
+        for callback in self.callbacks:
+            callback(interval, current, complete)
+
+    def current(self, interval):
+        """Vela em andamento do timeframe (inclui a vela base aberta, se houver)"""
+        with self._lock:
+            return self._current_candle(interval)
+
+    def _current_candle(self, interval):
+        interval_ms = INTERVAL_MS[interval]
+        current = self._current[interval]
+        open_base = self._open_base
+
+        if open_base is None:
+            if current is None:
+                return None
+            candle = dict(current)
+            candle.pop('base_count', None)
+            return candle
+
+        bucket = open_base['timestamp'] - open_base['timestamp'] % interval_ms
+        if current is None or current['timestamp'] != bucket:
+            candle = self._new_candle(bucket, interval_ms, open_base)
+        else:
+            candle = dict(current)
+            self._merge(candle, open_base)
+        candle.pop('base_count', None)
+        return candle
+
+    def tail(self, interval, count=2):
+        """Últimas `count` velas do timeframe (dicts), incluindo a vela em andamento"""
+        with self._lock:
+            current = self._current_candle(interval)
+            history = self.history[interval]
+            closed_count = min(count - (1 if current is not None else 0), len(history))
+            candles = [history[-i] for i in range(closed_count, 0, -1)]
+        if current is not None:
+            candles.append(current)
+        return candles
+
+    def series(self, interval, include_open=True):
+        """Velas do timeframe como CandleSeries (fechadas + em andamento)"""
+        with self._lock:
+            candles = list(self.history[interval])
+            current = self._current_candle(interval) if include_open else None
+        if current is not None:
+            candles.append(current)
+        return CandleSeries.from_dicts(candles)
@@ -1,13 +1,396 @@
 """
 Analyzer - Calcula indicadores técnicos e gera sinais de trading
 """
+from collections import deque, OrderedDict
+import threading
 import numpy as np
 from datetime import datetime
+from candles import as_series
+from aggregator import resample
+from kline_store import INTERVAL_MS
+import indicators
+from strategy import (StochRSIStrategy, STOCH_RSI_PARAMS, SIGNAL_NAMES, SIGNAL_CODES,
+                      NONE, LONG, SHORT)
+
+
+def _silent(*args, **kwargs):
+    pass
+
+
+def _value(x):
+    """Elemento de série -> float (None se NaN)"""
+    return None if np.isnan(x) else float(x)
+
+
+class RollingMean:
+    """
+    Média móvel simples de tamanho fixo, atualizada vela a vela
+    A janela (3 a 15 valores) é somada na mesma ordem do cálculo em lote
+    (np.add.reduce de uma fatia contígua): resultado idêntico ao de sma/window_rsi,
+    com custo fixo por vela. Cada valor é gravado em slot e slot + window, então
+    a janela é sempre uma fatia contígua, sem cópia
+    """
+    def __init__(self, window):
+        self.window = window
+        self.buffer = np.zeros(2 * window)
+        self.scratch = np.zeros(window)     # janela provisória do peek (sem alocar)
+        self.count = 0
+        self.last = -1
+    
+    def _values(self):
+        end = self.last + self.window + 1
+        return self.buffer[end - self.window:end]
+    
+    def update(self, value):
+        self.last = (self.last + 1) % self.window
+        self.buffer[self.last] = value
+        self.buffer[self.last + self.window] = value
+        self.count += 1
+        return self.value()
+    
+    def value(self):
+        if self.count < self.window:
+            return None
+        return float(np.add.reduce(self._values()) / self.window)
+    
+    def peek(self, value):
+        """Média se `value` entrasse agora (sem alterar o estado; mesmo valor que update)"""
+        if value is None or self.count < self.window - 1:
+            return None
+        self.scratch[:-1] = self._values()[1:]
+        self.scratch[-1] = value
+        return float(np.add.reduce(self.scratch) / self.window)
+
+
+class RollingMinMax:
+    """Máxima e mínima móveis com deques monotônicos (O(1) amortizado por valor)"""
+    def __init__(self, window):
+        self.window = window
+        self.index = 0
+        self.max_queue = deque()  # (índice, valor), valores decrescentes
+        self.min_queue = deque()  # (índice, valor), valores crescentes
+    
+    def update(self, value):
+        index = self.index
+        self.index += 1
+        
+        while self.max_queue and self.max_queue[-1][1] <= value:
+            self.max_queue.pop()
+        self.max_queue.append((index, value))
+        
+        while self.min_queue and self.min_queue[-1][1] >= value:
+            self.min_queue.pop()
+        self.min_queue.append((index, value))
+        
+        # Descartar valores que saíram da janela
+        oldest = index - self.window + 1
+        if self.max_queue[0][0] < oldest:
+            self.max_queue.popleft()
+        if self.min_queue[0][0] < oldest:
+            self.min_queue.popleft()
+        
+        return self.value()
+    
+    def value(self):
+        if self.index < self.window:
+            return None, None
+        return self.max_queue[0][1], self.min_queue[0][1]
+    
+    def peek(self, value):
+        """(máxima, mínima) se `value` entrasse agora (sem alterar o estado)"""
+        if value is None or self.index + 1 < self.window:
+            return None, None
+        
+        oldest = self.index - self.window + 1
+        highest = lowest = value
+        for index, v in self.max_queue:
+            if index >= oldest:
+                highest = max(highest, v)
+                break
+        for index, v in self.min_queue:
+            if index >= oldest:
+                lowest = min(lowest, v)
+                break
+        return highest, lowest
+
+
+def _rsi_from_averages(avg_gain, avg_loss):
+    if avg_loss == 0:
+        return 100.0
+    rs = avg_gain / avg_loss
+    return 100 - (100 / (1 + rs))
+
+
+class WindowRSI:
+    """
+    RSI sobre os últimos `period` deltas, atualizado vela a vela
+    (mesmo valor que rsi_series / calculate_stoch_rsi)
+    """
+    def __init__(self, period=14):
+        self.period = period
+        self.last_close = None
+        self.gains = RollingMean(period)
+        self.losses = RollingMean(period)
+    
+    @staticmethod
+    def _split(delta):
+        return (delta if delta > 0 else 0.0), (-delta if delta < 0 else 0.0)
+    
+    def update(self, close):
+        close = float(close)
+        if self.last_close is None:
+            self.last_close = close
+            return None
+        
+        gain, loss = self._split(close - self.last_close)
+        self.last_close = close
+        avg_gain = self.gains.update(gain)
+        avg_loss = self.losses.update(loss)
+        
+        if avg_gain is None:
+            return None
+        return _rsi_from_averages(avg_gain, avg_loss)
+    
+    def peek(self, close):
+        """RSI provisório da vela aberta (sem alterar o estado)"""
+        if self.last_close is None:
+            return None
+        gain, loss = self._split(float(close) - self.last_close)
+        avg_gain = self.gains.peek(gain)
+        avg_loss = self.losses.peek(loss)
+        
+        if avg_gain is None:
+            return None
+        return _rsi_from_averages(avg_gain, avg_loss)
+
+
+class WilderRSI:
+    """
+    RSI com suavização de Wilder (médias corridas de ganhos/perdas)
+    Mesmo valor que calculate_rsi sobre todo o histórico alimentado
+    """
+    def __init__(self, period=14):
+        self.period = period
+        self.last_close = None
+        self.seed_gains = []
+        self.seed_losses = []
+        self.avg_gain = None
+        self.avg_loss = None
+    
+    def _next_averages(self, close):
+        delta = close - self.last_close
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        
+        if self.avg_gain is None:
+            gains = self.seed_gains + [gain]
+            losses = self.seed_losses + [loss]
+            if len(gains) < self.period:
+                return None, None, gains, losses
+            # Primeira média (SMA)
+            return np.mean(gains), np.mean(losses), gains, losses
+        
+        avg_gain = (self.avg_gain * (self.period - 1) + gain) / self.period
+        avg_loss = (self.avg_loss * (self.period - 1) + loss) / self.period
+        return avg_gain, avg_loss, None, None
+    
+    def update(self, close):
+        close = float(close)
+        if self.last_close is None:
+            self.last_close = close
+            return None
+        
+        avg_gain, avg_loss, gains, losses = self._next_averages(close)
+        self.last_close = close
+        
+        if avg_gain is None:
+            self.seed_gains, self.seed_losses = gains, losses
+            return None
+        
+        self.avg_gain, self.avg_loss = avg_gain, avg_loss
+        return self.value()
+    
+    def seed(self, prices):
+        for close in prices:
+            self.update(close)
+        return self.value()
+    
+    def value(self):
+        if self.avg_gain is None:
+            return None
+        return _rsi_from_averages(self.avg_gain, self.avg_loss)
+    
+    def peek(self, close):
+        """RSI provisório da vela aberta (sem alterar o estado)"""
+        if self.last_close is None:
+            return None
+        avg_gain, avg_loss, _, _ = self._next_averages(float(close))
+        if avg_gain is None:
+            return None
+        return _rsi_from_averages(avg_gain, avg_loss)
+
+
+class StochRSIState:
+    """
+    Stoch RSI incremental: cada vela fechada custa O(1), sem recalcular o histórico
+    RSI por janela -> máxima/mínima móvel (deques) -> SMA (K) -> SMA (D)
+    Valores idênticos aos de stoch_rsi_series
+    """
+    def __init__(self, rsi_period=STOCH_RSI_PARAMS[0], stoch_period=STOCH_RSI_PARAMS[1],
+                 k_smooth=STOCH_RSI_PARAMS[2], d_smooth=STOCH_RSI_PARAMS[3]):
+        self.params = (rsi_period, stoch_period, k_smooth, d_smooth)
+        self.rsi = WindowRSI(rsi_period)
+        self.extremes = RollingMinMax(stoch_period)
+        self.k_mean = RollingMean(k_smooth)
+        self.d_mean = RollingMean(d_smooth)
+        self.k = None
+        self.d = None
+    
+    @property
+    def warmup(self):
+        """Quantidade de preços que influencia o valor atual (memória finita)"""
+        rsi_period, stoch_period, k_smooth, d_smooth = self.params
+        return rsi_period + stoch_period + k_smooth + d_smooth - 2
+    
+    @staticmethod
+    def _stoch(rsi, highest, lowest):
+        if highest is None:
+            return None
+        if highest == lowest:
+            return 50.0
+        return (rsi - lowest) / (highest - lowest) * 100
+    
+    def seed(self, prices):
+        """Carrega o histórico (só os últimos `warmup` preços importam)"""
+        for close in prices[-self.warmup:]:
+            self.update(close)
+        return self.k, self.d
+    
+    def update(self, close):
+        """Adiciona o fechamento de uma vela completa e retorna (K, D)"""
+        rsi = self.rsi.update(close)
+        if rsi is None:
+            return None, None
+        
+        stoch = self._stoch(rsi, *self.extremes.update(rsi))
+        if stoch is None:
+            return None, None
+        
+        self.k = self.k_mean.update(stoch)
+        if self.k is not None:
+            self.d = self.d_mean.update(self.k)
+        return self.k, self.d
+    
+    def peek(self, close):
+        """(K, D) provisórios da vela aberta, sem alterar o estado"""
+        rsi = self.rsi.peek(close)
+        stoch = self._stoch(rsi, *self.extremes.peek(rsi))
+        k = self.k_mean.peek(stoch)
+        d = self.d_mean.peek(k)
+        return k, d
+
+
+class MultiTimeframeState:
+    """
+    Stoch RSI de timeframes maiores montados a partir das velas base
+    
+    As velas de 15m/1h saem de resample() das velas base já recebidas, então
+    não há requisições extras. Cada timeframe tem seu StochRSIState, alimentado
+    só quando uma vela maior fecha (buckets incompletos são ignorados).
+    """
+    def __init__(self, base_interval='5m', intervals=('15m', '1h'), params=STOCH_RSI_PARAMS):
+        self.base_interval = base_interval
+        self.intervals = [i for i in intervals if INTERVAL_MS[i] > INTERVAL_MS[base_interval]]
+        self.params = tuple(params)
+        self.states = {interval: StochRSIState(*params) for interval in self.intervals}
+        self.last_timestamp = {interval: None for interval in self.intervals}
+    
+    def _ratio(self, interval):
+        return INTERVAL_MS[interval] // INTERVAL_MS[self.base_interval]
+    
+    def history_needed(self):
+        """Quantas velas base são necessárias para semear todos os timeframes"""
+        return max((StochRSIState(*self.params).warmup + 2) * self._ratio(interval)
+                   for interval in self.intervals) if self.intervals else 0
+    
+    def update(self, closed):
+        """
+        closed: CandleSeries só com velas base FECHADAS (o histórico no início,
+        depois basta a janela recente); consome as velas maiores ainda não vistas
+        """
+        closed = as_series(closed)
+        
+        for interval in self.intervals:
+            # Só as velas base que podem formar velas maiores novas
+            recent = closed if self.last_timestamp[interval] is None else closed[-2 * self._ratio(interval):]
+            higher = resample(recent, interval, complete_only=True, base_interval=self.base_interval)
+            
+            timestamps = higher['timestamp']
+            last = self.last_timestamp[interval]
+            new = slice(None) if last is None else timestamps > last
+            
+            for close in higher['close'][new]:
+                self.states[interval].update(close)
+            if len(timestamps) and (last is None or timestamps[-1] > last):
+                self.last_timestamp[interval] = int(timestamps[-1])
+    
+    def trends(self):
+        """K/D da última vela fechada de cada timeframe e a tendência (K acima/abaixo de D)"""
+        result = {}
+        for interval, state in self.states.items():
+            trend = None
+            if state.k is not None and state.d is not None:
+                trend = 'UP' if state.k > state.d else 'DOWN' if state.k < state.d else None
+            result[interval] = {
+                'k': round(state.k, 2) if state.k is not None else None,
+                'd': round(state.d, 2) if state.d is not None else None,
+                'trend': trend,
+                'timestamp': self.last_timestamp[interval]
+            }
+        return result
+
 
 class TechnicalAnalyzer:
-    def __init__(self):
+    def __init__(self, cache_size=256, strategy=None):
         self.last_signal = None
         self.last_signal_time = None
+        self.strategy = strategy or StochRSIStrategy()
+        
+        # Cache LRU das análises: (símbolo, intervalo, timestamp da última vela fechada, parâmetros)
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+        self.cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+    
+    def _cache_get(self, key):
+        with self.cache_lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                self.cache_stats['hits'] += 1
+                return dict(self.cache[key])
+            self.cache_stats['misses'] += 1
+            return None
+    
+    def _cache_put(self, key, analysis):
+        with self.cache_lock:
+            self.cache[key] = dict(analysis)
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+                self.cache_stats['evictions'] += 1
+    
+    def get_cache_stats(self):
+        """Hits/misses do cache de análises"""
+        with self.cache_lock:
+            stats = dict(self.cache_stats)
+            stats['entries'] = len(self.cache)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        return stats
+    
+    def clear_cache(self):
+        with self.cache_lock:
+            self.cache.clear()
         
     def calculate_rsi(self, prices, period=14):
         """
@@ -59,70 +442,43 @@ class TechnicalAnalyzer:
         
         return k, None  # Retornamos só K por enquanto
     
+    def rsi_series(self, prices, period=14):
+        """
+        RSI de cada ponto, calculado sobre os últimos `period` deltas
+        (mesmo valor que calculate_rsi(prices[i-period:i+1]) para cada i)
+        Retorna array do tamanho de prices, com NaN onde não há dados suficientes
+        """
+        return indicators.window_rsi(prices, period)
+    
+    def stoch_rsi_series(self, prices, rsi_period=14, stoch_period=14, k_smooth=3, d_smooth=3):
+        """
+        Calcula a série completa do Stoch RSI em uma passada vetorizada
+        Retorna (rsi, stoch_rsi, k, d): arrays do tamanho de prices, NaN no início
+        """
+        return indicators.stoch_rsi(prices, rsi_period, stoch_period, k_smooth, d_smooth)
+    
     def calculate_stoch_rsi(self, prices, rsi_period=14, stoch_period=14, k_smooth=3, d_smooth=3):
         """
-        Calcula Stochastic RSI
+        Calcula Stochastic RSI (valores mais recentes de stoch_rsi_series)
         Parâmetros padrão: (14, 14, 3, 3)
-        Para nossa estratégia: (15, 5, 3, 3)
+        Para nossa estratégia: STOCH_RSI_PARAMS
         """
         if len(prices) < rsi_period + stoch_period + k_smooth + d_smooth:
             return None, None
         
-        # 1. Calcular RSI para cada ponto
-        rsi_values = []
-        for i in range(rsi_period, len(prices)):
-            price_slice = prices[i-rsi_period:i+1]
-            rsi = self.calculate_rsi(price_slice, rsi_period)
-            if rsi is not None:
-                rsi_values.append(rsi)
-        
-        if len(rsi_values) < stoch_period:
-            return None, None
-        
-        # 2. Aplicar Stochastic no RSI
-        stoch_rsi_values = []
-        for i in range(stoch_period - 1, len(rsi_values)):
-            rsi_slice = rsi_values[i - stoch_period + 1:i + 1]
-            highest_rsi = max(rsi_slice)
-            lowest_rsi = min(rsi_slice)
-            
-            if highest_rsi == lowest_rsi:
-                stoch_rsi = 50
-            else:
-                stoch_rsi = ((rsi_values[i] - lowest_rsi) / (highest_rsi - lowest_rsi)) * 100
-            
-            stoch_rsi_values.append(stoch_rsi)
+        _, _, k, d = self.stoch_rsi_series(prices, rsi_period, stoch_period, k_smooth, d_smooth)
         
-        if len(stoch_rsi_values) < k_smooth:
-            return None, None
-        
-        # 3. Suavizar com SMA (K)
-        k_values = []
-        for i in range(k_smooth - 1, len(stoch_rsi_values)):
-            k_slice = stoch_rsi_values[i - k_smooth + 1:i + 1]
-            k = np.mean(k_slice)
-            k_values.append(k)
-        
-        if len(k_values) < d_smooth:
-            return None, None
-        
-        # 4. Suavizar K para obter D
-        d_values = []
-        for i in range(d_smooth - 1, len(k_values)):
-            d_slice = k_values[i - d_smooth + 1:i + 1]
-            d = np.mean(d_slice)
-            d_values.append(d)
-        
-        # Retornar os valores mais recentes
-        current_k = k_values[-1] if k_values else None
-        current_d = d_values[-1] if d_values else None
-        
-        return current_k, current_d
+        return _value(k[-1]), _value(d[-1])
     
-    def analyze_klines(self, klines, rsi_period=15, stoch_period=5, k_smooth=3, d_smooth=3):
+    def analyze_klines(self, klines, rsi_period=STOCH_RSI_PARAMS[0], stoch_period=STOCH_RSI_PARAMS[1],
+                       k_smooth=STOCH_RSI_PARAMS[2], d_smooth=STOCH_RSI_PARAMS[3],
+                       symbol=None, interval=None, verbose=True):
         """
         Analisa velas e retorna indicadores + sinais
-        Estratégia: Stoch RSI (15, 5, 3, 3)
+        Estratégia: Stoch RSI (STOCH_RSI_PARAMS)
+        klines: CandleSeries (ou lista de dicts)
+        symbol/interval: se informados, o resultado fica no cache até a próxima vela fechar
+        verbose: imprimir a análise no console
         """
         if not klines or len(klines) < rsi_period + stoch_period + k_smooth + d_smooth + 10:
             return {
@@ -132,12 +488,25 @@ class TechnicalAnalyzer:
                 'reason': 'Dados insuficientes'
             }
         
-        # Extrair preços de fechamento
-        closes = [k['close'] for k in klines]
+        # Extrair preços de fechamento (coluna, sem cópia)
+        series = as_series(klines)
+        closes = series['close']
+        timestamps = series['timestamp']
+        
+        # Mesma vela fechada e mesmos parâmetros: resultado do cache
+        key = None
+        if symbol is not None:
+            key = (symbol, interval, int(timestamps[-2]), (rsi_period, stoch_period, k_smooth, d_smooth))
+            cached = self._cache_get(key)
+            if cached is not None:
+                return cached
         
-        # Calcular Stoch RSI para a última vela COMPLETA (penúltima, pois última pode estar aberta)
-        closes_complete = closes[:-1]  # Remove a última vela (pode estar aberta)
-        k, d = self.calculate_stoch_rsi(closes_complete, rsi_period, stoch_period, k_smooth, d_smooth)
+        # Calcular a série do Stoch RSI uma única vez, sem a última vela (pode estar aberta)
+        closes_complete = closes[:-1]
+        _, _, k_series, d_series = self.stoch_rsi_series(closes_complete, rsi_period, stoch_period, k_smooth, d_smooth)
+        
+        # Última vela COMPLETA (penúltima)
+        k, d = _value(k_series[-1]), _value(d_series[-1])
         
         if k is None or d is None:
             return {
@@ -147,52 +516,72 @@ class TechnicalAnalyzer:
                 'reason': 'Erro no cálculo'
             }
         
-        # Calcular para a vela anterior também (2 velas atrás)
-        closes_prev = closes[:-2]
-        k_prev, d_prev = self.calculate_stoch_rsi(closes_prev, rsi_period, stoch_period, k_smooth, d_smooth)
+        # Vela anterior (2 velas atrás) vem da mesma série
+        k_prev = _value(k_series[-2])
+        
+        analysis = self._build_analysis(k, d, k_prev, closes, timestamps, verbose)
+        if key is not None:
+            self._cache_put(key, analysis)
+        return analysis
+    
+    def analyze_closed_candle(self, state, klines, symbol=None, interval=None):
+        """
+        Versão incremental de analyze_klines para o loop ao vivo
+        state: StochRSIState semeado com todas as velas completas menos a última;
+        é alimentado aqui com a vela que acabou de fechar (penúltima de klines)
+        symbol/interval: se informados, o resultado vai para o cache de analyze_klines
+        """
+        series = as_series(klines)
+        closes = series['close']
+        
+        k_prev = state.k
+        k, d = state.update(closes[-2])
+        
+        if k is None or d is None:
+            return {
+                'stoch_rsi_k': None,
+                'stoch_rsi_d': None,
+                'signal': None,
+                'reason': 'Dados insuficientes'
+            }
+        
+        timestamps = series['timestamp']
+        analysis = self._build_analysis(k, d, k_prev, closes, timestamps)
+        if symbol is not None:
+            self._cache_put((symbol, interval, int(timestamps[-2]), state.params), analysis)
+        return analysis
+    
+    def _build_analysis(self, k, d, k_prev, closes, timestamps, verbose=True):
+        """Gera o sinal a partir do K/D da última vela completa e do K da anterior"""
+        log = print if verbose else _silent
         
         # Mostrar apenas análise essencial
-        from datetime import datetime
-        dt_atual = datetime.fromtimestamp(klines[-2]['timestamp'] / 1000)
-        dt_prev = datetime.fromtimestamp(klines[-3]['timestamp'] / 1000)
+        dt_atual = datetime.fromtimestamp(timestamps[-2] / 1000)
+        dt_prev = datetime.fromtimestamp(timestamps[-3] / 1000)
         
         k_prev_str = f"{k_prev:.2f}" if k_prev is not None else "N/A"
         d_str = f"{d:.2f}" if d is not None else "N/A"
         
-        print(f"\n📊 [{datetime.now().strftime('%H:%M:%S')}] Stoch RSI Analysis:")
-        print(f"   {dt_prev.strftime('%H:%M')} (vela anterior): K={k_prev_str}")
-        print(f"   {dt_atual.strftime('%H:%M')} (vela atual):    K={k:.2f}, D={d_str}")
-        
-        signal = None
-        reason = 'Aguardando condições'
-        
-        # LONG: Stoch RSI estava < 20 na vela anterior
-        if k_prev is not None and k_prev < 20:
-            signal = 'LONG'
-            reason = f'Stoch RSI em oversold (prev={k_prev:.2f}, atual={k:.2f})'
-            print(f"   🟢 SINAL LONG detectado!")
-        
-        # SHORT: Stoch RSI estava > 80 na vela anterior
-        elif k_prev is not None and k_prev > 80:
-            signal = 'SHORT'
-            reason = f'Stoch RSI em overbought (prev={k_prev:.2f}, atual={k:.2f})'
-            print(f"   🔴 SINAL SHORT detectado!")
-        
-        # Condição de saída LONG: Stoch RSI > 80
-        elif k > 80:
-            signal = 'EXIT_LONG'
-            reason = f'Stoch RSI em overbought ({k:.2f}), sair de LONG'
-            print(f"   📤 EXIT LONG")
-        
-        # Condição de saída SHORT: Stoch RSI < 20
-        elif k < 20:
-            signal = 'EXIT_SHORT'
-            reason = f'Stoch RSI em oversold ({k:.2f}), sair de SHORT'
-            print(f"   📤 EXIT SHORT")
+        log(f"\n📊 [{datetime.now().strftime('%H:%M:%S')}] Stoch RSI Analysis:")
+        log(f"   {dt_prev.strftime('%H:%M')} (vela anterior): K={k_prev_str}")
+        log(f"   {dt_atual.strftime('%H:%M')} (vela atual):    K={k:.2f}, D={d_str}")
+        
+        # Regras da estratégia (as mesmas usadas no histórico inteiro)
+        code, reason = self.strategy.live_signal({'k': k, 'd': d, 'k_prev': k_prev})
+        signal = SIGNAL_NAMES[code]
+        
+        if signal == 'LONG':
+            log(f"   🟢 SINAL LONG detectado!")
+        elif signal == 'SHORT':
+            log(f"   🔴 SINAL SHORT detectado!")
+        elif signal == 'EXIT_LONG':
+            log(f"   📤 EXIT LONG")
+        elif signal == 'EXIT_SHORT':
+            log(f"   📤 EXIT SHORT")
         else:
-            print(f"   ⏸ Aguardando sinal (zona neutra)")
+            log(f"   ⏸ Aguardando sinal (zona neutra)")
         
-        print()
+        log()
         
         return {
             'stoch_rsi_k': round(k, 2),
@@ -201,9 +590,29 @@ class TechnicalAnalyzer:
             'signal': signal,
             'reason': reason,
             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'price': klines[-2]['close']  # Preço da última vela COMPLETA
+            'price': float(closes[-2])  # Preço da última vela COMPLETA
         }
     
+    def analyze_multi_timeframe(self, analysis, mtf_state):
+        """
+        Combina a análise do timeframe base com a tendência dos timeframes maiores
+        LONG só é confirmado se nenhum timeframe maior estiver em baixa (e vice-versa)
+        """
+        combined = dict(analysis)
+        trends = mtf_state.trends()
+        combined['timeframes'] = trends
+        combined['mtf_confirmed'] = True
+        combined['mtf_reason'] = ''
+        
+        against = {'LONG': 'DOWN', 'SHORT': 'UP'}.get(analysis.get('signal'))
+        if against:
+            blocking = [interval for interval, info in trends.items() if info['trend'] == against]
+            if blocking:
+                combined['mtf_confirmed'] = False
+                combined['mtf_reason'] = f"{analysis['signal']} contra a tendência de {', '.join(blocking)}"
+        
+        return combined
+    
     def check_entry_conditions(self, klines, signal_type):
         """
         Verifica condições adicionais de entrada conforme especificado:
@@ -214,28 +623,20 @@ class TechnicalAnalyzer:
         if len(klines) < 3:
             return False, "Dados insuficientes"
         
-        current_candle = klines[-1]
-        previous_candle = klines[-2]
+        code = SIGNAL_CODES.get(signal_type)
+        if code not in (LONG, SHORT):
+            return False, "Tipo de sinal inválido"
         
-        # Para LONG: verificar se não está caindo
-        if signal_type == 'LONG':
-            # Se a vela atual fechou abaixo da anterior, aguardar
-            if current_candle['close'] < previous_candle['close']:
+        # Sinal na penúltima vela, confirmado (ou não) pela última
+        last_two = as_series(klines)[-2:]
+        confirmed = self.strategy.confirm(last_two, np.array([code, NONE], dtype=np.int8))[-1]
+        
+        if not confirmed:
+            if code == LONG:
                 return False, "Vela fechou abaixo da anterior, aguardando próxima vela"
-            
-            # Se está subindo, pode entrar
-            return True, "Condições de entrada para LONG confirmadas"
-        
-        # Para SHORT: verificar se não está subindo
-        elif signal_type == 'SHORT':
-            # Se a vela atual fechou acima da anterior, aguardar
-            if current_candle['close'] > previous_candle['close']:
-                return False, "Vela fechou acima da anterior, aguardando próxima vela"
-            
-            # Se está caindo, pode entrar
-            return True, "Condições de entrada para SHORT confirmadas"
+            return False, "Vela fechou acima da anterior, aguardando próxima vela"
         
-        return False, "Tipo de sinal inválido"
+        return True, f"Condições de entrada para {signal_type} confirmadas"
 
 
 # Instância global
@@ -248,7 +649,8 @@ if __name__ == '__main__':
     
     # Simular alguns preços
     test_prices = [100 + np.sin(i/5) * 10 + np.random.randn() * 2 for i in range(100)]
-    test_klines = [{'close': p, 'high': p+1, 'low': p-1, 'open': p} for p in test_prices]
+    test_klines = [{'timestamp': i * 300_000, 'close': p, 'high': p+1, 'low': p-1, 'open': p}
+                   for i, p in enumerate(test_prices)]
     
     result = analyzer.analyze_klines(test_klines)
     
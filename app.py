@@ -10,13 +10,14 @@ import time
 # Importar módulos do bot
 try:
     from data_provider import data_provider
+    from candles import KlineWindow
     DATA_PROVIDER_AVAILABLE = True
 except ImportError:
     print("⚠️  data_provider.py não encontrado. Dados reais desabilitados.")
     DATA_PROVIDER_AVAILABLE = False
 
 try:
-    from analyzer import analyzer
+    from analyzer import analyzer, StochRSIState, MultiTimeframeState, STOCH_RSI_PARAMS
     ANALYZER_AVAILABLE = True
 except ImportError:
     print("⚠️  analyzer.py não encontrado. Análise desabilitada.")
@@ -24,6 +25,7 @@ except ImportError:
 
 try:
     from trader import trader
+    from trade_stats import TradeStats
     TRADER_AVAILABLE = True
 except ImportError:
     print("⚠️  trader.py não encontrado. Trading desabilitado.")
@@ -66,6 +68,7 @@ socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
 # Arquivo de dados
 TRADES_FILE = os.path.join(BASE_DIR, 'data', 'trades.json')
 SESSION_FILE = os.path.join(BASE_DIR, 'data', 'session.json')
+STATS_DIR = os.path.join(BASE_DIR, 'data', 'stats')
 
 # Estado global
 bot_state = {
@@ -77,6 +80,9 @@ bot_state = {
     'trades_won': 0,
     'trades_lost': 0,
     'biggest_win': 0.0,
+    'max_drawdown': 0.0,
+    'profit_factor': None,
+    'expectancy': 0.0,
     'btc_price': 0.0,
     'btc_change_today': 0.0,
     'btc_change_15min': 0.0,
@@ -87,10 +93,16 @@ bot_state = {
     'is_paused': True  # Inicia pausado
 }
 
-open_positions = []
+# Posições abertas: trader.open_positions (PositionBook, indexado por id e lado)
 
 # Controle de velas e sinais
-last_candle_time = None
+kline_window = None  # KlineWindow com as últimas 100 velas (atualizada no lugar)
+stoch_state = None   # StochRSIState incremental (O(1) por vela fechada)
+mtf_state = None     # Stoch RSI de 15m/1h montado a partir das velas base
+
+# Timeframes maiores usados como filtro de tendência das entradas
+MTF_INTERVALS = ('15m', '1h')
+MTF_FILTER = True
 waiting_for_confirmation = None  # Guarda sinal esperando confirmação
 
 # Thread para atualizar dados em tempo real
@@ -138,22 +150,127 @@ def start_market_updates():
     
     if not update_running and DATA_PROVIDER_AVAILABLE:
         update_running = True
+        # Preço/variações via WebSocket (REST continua como fallback)
+        data_provider.start_stream()
         update_thread = threading.Thread(target=update_market_data, daemon=True)
         update_thread.start()
         print("✅ Atualização de dados em tempo real iniciada")
 
+def load_kline_window():
+    """Cria a janela de velas recentes a partir do histórico (None se não houver dados)"""
+    global stoch_state, mtf_state
+    
+    # Uma única requisição com histórico suficiente para os timeframes maiores
+    mtf = MultiTimeframeState(data_provider.interval, MTF_INTERVALS, STOCH_RSI_PARAMS)
+    klines = data_provider.get_latest_klines(limit=max(100, mtf.history_needed()))
+    
+    if not klines or len(klines) < 50:
+        return None
+    
+    mtf.update(klines[:-1])
+    mtf_state = mtf
+    
+    # Semear o Stoch RSI com as velas completas, exceto a última
+    # (ela entra no on_candle_closed da primeira análise)
+    stoch_state = StochRSIState(*STOCH_RSI_PARAMS)
+    stoch_state.seed(klines['close'][:-2])
+    
+    window = KlineWindow(capacity=100)
+    window.seed(klines)
+    window.on_candle_closed(on_candle_closed)
+    return window
+
+def on_candle_closed(window):
+    """Vela de 5min fechou: atualizar posições, analisar e processar sinais"""
+    klines = window.series()
+    
+    # Vela fechada inteira: stop pela mínima/máxima final, trailing anda com o fechamento
+    update_open_positions(klines[-2], candle_closed=True)
+    # P&L pelo preço atual (vela recém-aberta)
+    update_open_positions(klines[-1], candle_closed=False)
+    
+    # Analisar indicadores (incremental: só a vela que acabou de fechar)
+    analysis = analyzer.analyze_closed_candle(stoch_state, klines, data_provider.symbol, data_provider.interval)
+    
+    # Tendência de 15m/1h a partir das mesmas velas (sem requisições extras)
+    mtf_state.update(klines[:-1])
+    analysis = analyzer.analyze_multi_timeframe(analysis, mtf_state)
+    
+    # Atualizar status
+    bot_state['last_signal'] = f"{analysis['signal'] or 'Nenhum'} - {analysis['reason']}"
+    
+    # Log da análise
+    print(f"\n📊 [{datetime.now().strftime('%H:%M:%S')}] Análise:")
+    print(f"   Stoch RSI K: {analysis['stoch_rsi_k']}")
+    print(f"   Sinal: {analysis['signal']}")
+    print(f"   Razão: {analysis['reason']}")
+    for interval, info in analysis['timeframes'].items():
+        print(f"   {interval}: K={info['k']} D={info['d']} ({info['trend'] or 'N/A'})")
+    
+    # Processar sinais
+    if analysis['signal'] in ['LONG', 'SHORT'] and MTF_FILTER and not analysis['mtf_confirmed']:
+        # Sinal contra a tendência dos timeframes maiores
+        bot_state['status'] = f"⏳ {analysis['mtf_reason']}"
+        print(f"   ⏳ {analysis['mtf_reason']}")
+    
+    elif analysis['signal'] in ['LONG', 'SHORT']:
+        # Verificar condições de entrada
+        can_enter, entry_reason = analyzer.check_entry_conditions(klines, analysis['signal'])
+        
+        if can_enter:
+            # Tentar abrir posição
+            position, msg = trader.open_position(analysis['signal'], analysis['price'])
+            
+            if position:
+                bot_state['status'] = f"✅ {msg}"
+                bot_state['session_trades'] += 1
+                print(f"   ✅ {msg}")
+                
+                # Salvar trade
+                save_trade(position)
+            else:
+                bot_state['status'] = f"⚠️ {msg}"
+                print(f"   ⚠️ {msg}")
+        else:
+            bot_state['status'] = entry_reason
+            print(f"   ⏳ {entry_reason}")
+    
+    elif analysis['signal'] == 'EXIT_LONG':
+        # Fechar posições LONG
+        close_positions_by_type('LONG', analysis['price'], 'Stoch RSI Overbought')
+    
+    elif analysis['signal'] == 'EXIT_SHORT':
+        # Fechar posições SHORT
+        close_positions_by_type('SHORT', analysis['price'], 'Stoch RSI Oversold')
+    
+    else:
+        bot_state['status'] = 'Bot Ativo - Aguardando Sinal'
+    
+    # Atualizar estatísticas
+    update_statistics()
+    
+    # Emitir atualização
+    socketio.emit('state_update', {
+        'bot_state': bot_state,
+        'open_positions': positions_payload()
+    })
+
 def trading_loop():
     """Loop principal de trading"""
-    global bot_state, last_candle_time, waiting_for_confirmation, trading_running
+    global bot_state, kline_window, waiting_for_confirmation, trading_running
     
-    candle_check_interval = 60  # Verificar a cada 1 minuto
     last_check = 0
     
     while trading_running:
         try:
             current_time = time.time()
             
-            # Verificar a cada minuto se uma vela de 5min fechou
+            # Com o stream ativo as velas vêm da memória (checar a cada 5s);
+            # sem ele, consultar o REST a cada 1 minuto
+            streaming = (DATA_PROVIDER_AVAILABLE and data_provider.stream is not None
+                         and data_provider.stream.is_alive())
+            candle_check_interval = 5 if streaming else 60
+            
             if current_time - last_check >= candle_check_interval:
                 last_check = current_time
                 
@@ -166,84 +283,32 @@ def trading_loop():
                     time.sleep(5)
                     continue
                 
-                # Obter últimas velas
-                klines = data_provider.get_latest_klines(limit=100)
-                
-                if not klines or len(klines) < 50:
-                    bot_state['status'] = 'Carregando dados...'
-                    time.sleep(5)
-                    continue
-                
-                # Verificar se uma nova vela de 5min fechou
-                current_candle_time = klines[-1]['timestamp']
-                candle_closed = (last_candle_time != current_candle_time)
-                
-                if candle_closed:
-                    last_candle_time = current_candle_time
-                    
-                    # Atualizar posições abertas
-                    update_open_positions(klines[-1]['close'], candle_closed=True)
+                if kline_window is None:
+                    kline_window = load_kline_window()
                     
-                    # Analisar indicadores
-                    analysis = analyzer.analyze_klines(klines)
+                    if kline_window is None:
+                        bot_state['status'] = 'Carregando dados...'
+                        time.sleep(5)
+                        continue
                     
-                    # Atualizar status
-                    bot_state['last_signal'] = f"{analysis['signal'] or 'Nenhum'} - {analysis['reason']}"
-                    
-                    # Log da análise
-                    print(f"\n📊 [{datetime.now().strftime('%H:%M:%S')}] Análise:")
-                    print(f"   Stoch RSI K: {analysis['stoch_rsi_k']}")
-                    print(f"   Sinal: {analysis['signal']}")
-                    print(f"   Razão: {analysis['reason']}")
-                    
-                    # Processar sinais
-                    if analysis['signal'] in ['LONG', 'SHORT']:
-                        # Verificar condições de entrada
-                        can_enter, entry_reason = analyzer.check_entry_conditions(klines, analysis['signal'])
-                        
-                        if can_enter:
-                            # Tentar abrir posição
-                            position, msg = trader.open_position(analysis['signal'], analysis['price'])
-                            
-                            if position:
-                                open_positions.append(position)
-                                bot_state['status'] = f"✅ {msg}"
-                                bot_state['session_trades'] += 1
-                                print(f"   ✅ {msg}")
-                                
-                                # Salvar trade
-                                save_trade(position)
-                            else:
-                                bot_state['status'] = f"⚠️ {msg}"
-                                print(f"   ⚠️ {msg}")
-                        else:
-                            bot_state['status'] = entry_reason
-                            print(f"   ⏳ {entry_reason}")
-                    
-                    elif analysis['signal'] == 'EXIT_LONG':
-                        # Fechar posições LONG
-                        close_positions_by_type('LONG', analysis['price'], 'Stoch RSI Overbought')
-                    
-                    elif analysis['signal'] == 'EXIT_SHORT':
-                        # Fechar posições SHORT
-                        close_positions_by_type('SHORT', analysis['price'], 'Stoch RSI Oversold')
+                    # Primeira análise logo ao carregar a janela
+                    on_candle_closed(kline_window)
+                
+                else:
+                    # Atualizar a vela aberta no lugar; se uma vela fechou,
+                    # on_candle_closed é chamado pela própria janela
+                    recent = data_provider.get_recent_candles(limit=2)
                     
-                    else:
-                        bot_state['status'] = 'Bot Ativo - Aguardando Sinal'
+                    if len(recent) and recent[0]['timestamp'] > kline_window.last_timestamp():
+                        # Janela ficou para trás (ex: bot pausado): recarregar
+                        kline_window = None
+                        continue
                     
-                    # Atualizar estatísticas
-                    update_statistics()
+                    candle_closed = kline_window.update_many(recent)
                     
-                    # Emitir atualização
-                    socketio.emit('state_update', {
-                        'bot_state': bot_state,
-                        'open_positions': open_positions
-                    })
-                
-                else:
-                    # Vela ainda aberta, apenas atualizar P&L das posições
-                    if klines:
-                        update_open_positions(klines[-1]['close'], candle_closed=False)
+                    if not candle_closed:
+                        # Vela ainda aberta: P&L e stop pela mínima/máxima até agora
+                        update_open_positions(kline_window.series()[-1], candle_closed=False)
             
             time.sleep(5)  # Verificar a cada 5 segundos
             
@@ -253,49 +318,44 @@ def trading_loop():
             traceback.print_exc()
             time.sleep(10)
 
-def update_open_positions(current_price, candle_closed=False):
-    """Atualiza todas as posições abertas"""
-    global open_positions
-    
+def update_open_positions(candle, candle_closed=False):
+    """
+    Atualiza todas as posições abertas com uma vela (dict open/high/low/close)
+    O stop é checado pela mínima/máxima da vela, então toques entre as
+    consultas não se perdem; o trailing só anda quando a vela fecha
+    """
     positions_to_close = []
     
-    for position in open_positions:
+    for position in trader.open_positions:
         # Atualizar P&L e verificar stop loss
-        hit_stop, stop_type = trader.update_position(position, current_price, candle_closed)
+        hit_stop, stop_type, exit_price = trader.update_position_candle(position, candle, candle_closed)
         
         if hit_stop:
-            positions_to_close.append((position, stop_type))
+            positions_to_close.append((position, stop_type, exit_price))
     
-    # Fechar posições que bateram no stop
-    for position, reason in positions_to_close:
-        close_position(position, current_price, reason)
+    # Fechar posições que bateram no stop (preço do stop, ou abertura em gap)
+    for position, reason, exit_price in positions_to_close:
+        close_position(position, exit_price, reason)
 
 def close_positions_by_type(position_type, current_price, reason):
     """Fecha todas as posições de um tipo específico"""
-    global open_positions
-    
-    positions_to_close = [p for p in open_positions if p['type'] == position_type]
-    
-    for position in positions_to_close:
+    for position in trader.open_positions.side(position_type):
         close_position(position, current_price, reason)
 
 def close_position(position, current_price, reason):
     """Fecha uma posição individual"""
-    global open_positions
-    
     closed = trader.close_position(position, current_price, reason)
     
-    if closed in open_positions:
-        open_positions.remove(closed)
-    
     # Atualizar estatísticas
     if closed['pnl_dollar'] > 0:
         bot_state['trades_won'] += 1
     else:
         bot_state['trades_lost'] += 1
     
-    # Salvar trade fechado
+    # Salvar trade fechado e estatísticas históricas (O(1) por trade)
     save_trade(closed)
+    historical_stats.add(closed['pnl_dollar'])
+    historical_stats.save()
     
     print(f"   🔒 Posição {closed['type']} fechada: {reason}")
     print(f"   💰 P&L: {closed['pnl_percent']:.2f}% (${closed['pnl_dollar']:.2f})")
@@ -309,11 +369,12 @@ def update_statistics():
     bot_state['biggest_win'] = stats['biggest_win']
     bot_state['portfolio'] = stats['current_capital']
     
-    # Calcular P&L histórico (incluindo trades anteriores)
-    all_trades = load_trades()
-    if all_trades:
-        historical_pnl = sum(t.get('pnl_dollar', 0) for t in all_trades)
-        bot_state['historical_pnl'] = (historical_pnl / 35.0) * 100
+    # P&L histórico (incluindo trades anteriores): agregados persistidos, sem reler trades.json
+    historical = historical_stats.summary()
+    bot_state['historical_pnl'] = historical['total_pnl_percent']
+    bot_state['max_drawdown'] = historical['max_drawdown']
+    bot_state['profit_factor'] = historical['profit_factor']
+    bot_state['expectancy'] = historical['expectancy']
 
 def start_trading():
     """Inicia thread de trading"""
@@ -325,6 +386,10 @@ def start_trading():
         trading_thread.start()
         print("✅ Trading loop iniciado")
 
+def positions_payload():
+    """Posições abertas no formato JSON do dashboard"""
+    return trader.open_positions.to_dicts() if TRADER_AVAILABLE else []
+
 def load_trades():
     """Carrega histórico de trades"""
     if os.path.exists(TRADES_FILE):
@@ -335,10 +400,24 @@ def load_trades():
 def save_trade(trade):
     """Salva um trade no histórico"""
     trades = load_trades()
-    trades.append(trade)
+    trades.append(trade.to_dict())
     with open(TRADES_FILE, 'w') as f:
         json.dump(trades, f, indent=2)
 
+def load_historical_stats():
+    """
+    Estatísticas históricas persistidas em data/stats
+    Na primeira execução são reconstruídas uma vez a partir do trades.json
+    """
+    stats = TradeStats(35.0, path=STATS_DIR)
+    if stats.total_trades == 0:
+        stats = TradeStats.from_trades(load_trades(), 35.0, path=STATS_DIR)
+        if stats.total_trades:
+            stats.save()
+    return stats
+
+historical_stats = load_historical_stats() if TRADER_AVAILABLE else None
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -348,7 +427,7 @@ def get_state():
     """Retorna estado atual do bot"""
     return jsonify({
         'bot_state': bot_state,
-        'open_positions': open_positions,
+        'open_positions': positions_payload(),
         'historical_trades': load_trades()
     })
 
@@ -359,40 +438,42 @@ def debug_stochrsi():
         return jsonify({'error': 'Módulos não disponíveis'})
     
     try:
-        # Obter últimas 100 velas
-        klines = data_provider.get_latest_klines(limit=100)
+        # Últimas 100 velas: da janela do trading loop se já carregada, senão da API
+        if kline_window is not None:
+            klines = kline_window.series()
+        else:
+            klines = data_provider.get_latest_klines(limit=100)
         
         if not klines:
             return jsonify({'error': 'Sem dados'})
         
-        # Analisar
-        analysis = analyzer.analyze_klines(klines)
+        # Analisar (em cache até a próxima vela fechar)
+        analysis = analyzer.analyze_klines(klines, symbol=data_provider.symbol,
+                                           interval=data_provider.interval, verbose=False)
         
         # Retornar últimas 20 velas + análise
         recent_klines = klines[-20:]
         
         return jsonify({
             'analysis': analysis,
-            'recent_candles': [
-                {
-                    'timestamp': k['timestamp'],
-                    'close': k['close'],
-                    'open': k['open'],
-                    'high': k['high'],
-                    'low': k['low']
-                }
-                for k in recent_klines
-            ],
-            'parameters': {
-                'rsi_period': 15,
-                'stoch_period': 5,
-                'k_smooth': 3,
-                'd_smooth': 3
-            }
+            'recent_candles': recent_klines.to_dicts(('timestamp', 'close', 'open', 'high', 'low')),
+            'parameters': dict(zip(('rsi_period', 'stoch_period', 'k_smooth', 'd_smooth'), STOCH_RSI_PARAMS)),
+            'cache': analyzer.get_cache_stats(),
+            'timeframes': mtf_state.trends() if mtf_state is not None else None
         })
     except Exception as e:
         return jsonify({'error': str(e)})
 
+@app.route('/api/debug/http')
+def debug_http():
+    """Endpoint de debug com latência/erros por endpoint da Binance + estatísticas do cache"""
+    if not DATA_PROVIDER_AVAILABLE:
+        return jsonify({'error': 'Módulos não disponíveis'})
+    
+    stats = data_provider.get_http_stats()
+    stats['cache'] = data_provider.get_cache_stats()
+    return jsonify(stats)
+
 @app.route('/api/update_portfolio', methods=['POST'])
 def update_portfolio():
     """Atualiza valor do portfolio"""
@@ -419,9 +500,7 @@ def pause_bot():
 @app.route('/api/close_all', methods=['POST'])
 def close_all_positions():
     """Fecha todas as posições abertas"""
-    global open_positions
-    
-    if not open_positions:
+    if not TRADER_AVAILABLE or not trader.open_positions:
         return jsonify({'success': False, 'message': 'Nenhuma posição aberta'})
     
     # Obter preço atual
@@ -431,7 +510,7 @@ def close_all_positions():
         return jsonify({'success': False, 'message': 'Preço atual não disponível'})
     
     # Fechar todas as posições
-    for position in open_positions[:]:  # Cópia da lista
+    for position in trader.open_positions:  # Itera sobre uma cópia
         close_position(position, current_price, 'Fechamento Manual')
     
     bot_state['status'] = 'Todas posições fechadas manualmente'
@@ -439,7 +518,7 @@ def close_all_positions():
     
     socketio.emit('state_update', {
         'bot_state': bot_state, 
-        'open_positions': open_positions,
+        'open_positions': positions_payload(),
         'historical_trades': load_trades()
     })
     
@@ -456,7 +535,7 @@ def handle_connect():
     
     emit('state_update', {
         'bot_state': bot_state,
-        'open_positions': open_positions,
+        'open_positions': positions_payload(),
         'historical_trades': load_trades()
     })
 
@@ -0,0 +1,245 @@
+"""
+Backtest - Reproduz a estratégia sobre velas históricas em segundos
+
+Usa as mesmas peças do trading loop ao vivo:
+- sinais das regras da estratégia (strategy.py), calculados de uma vez para
+  o histórico inteiro;
+- confirmação de entrada de check_entry_conditions (preço atual x fechamento
+  da vela do sinal);
+- TradeSimulator para abrir/fechar posições, trailing stop e slippage.
+
+Linha do tempo de cada vela j (igual ao on_candle_closed do app.py):
+1. durante a vela j: stop atingido se a mínima (LONG) / máxima (SHORT) tocar o
+   trailing stop; preenche no stop (ou na abertura, se a vela já abriu além dele);
+2. a vela j fecha: o trailing stop anda com o fechamento;
+3. sinal da vela j: abre posição (preço = fechamento de j, confirmada pela
+   abertura de j+1) ou fecha por saída.
+
+O loop só visita as velas com entrada; a saída de cada posição (stop ou sinal
+de saída) é resolvida de uma vez com TradeSimulator.resolve_stop.
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+import numpy as np
+
+import indicators
+from aggregator import resample
+from candles import CandleSeries, as_series
+from kline_store import INTERVAL_MS, KlineStore
+from strategy import StochRSIStrategy, STOCH_RSI_PARAMS, NONE, LONG, SHORT, EXIT_LONG, EXIT_SHORT, SIGNAL_NAMES
+from trader import TradeSimulator
+
+
+def load_candles(path, symbol='BTCUSDT', interval='5m'):
+    """
+    Carrega velas de um arquivo ou de um KlineStore
+    - pasta: KlineStore (ex: data/klines/futures)
+    - .csv: cabeçalho com timestamp,open,high,low,close[,volume,...]
+    - .json: lista de dicts (formato antigo)
+    """
+    if os.path.isdir(path):
+        return CandleSeries(KlineStore(path).load(symbol, interval))
+
+    if path.endswith('.json'):
+        import json
+        with open(path, 'r') as f:
+            return CandleSeries.from_dicts(json.load(f))
+
+    data = np.genfromtxt(path, delimiter=',', names=True)
+    return CandleSeries.from_dicts([dict(zip(data.dtype.names, row)) for row in data.tolist()])
+
+
+def mtf_allowed(series, signals, intervals, base_interval, params):
+    """
+    Filtro de tendência dos timeframes maiores, vetorizado (mesma regra do
+    MultiTimeframeState): LONG bloqueado se algum timeframe estiver com K < D
+    na última vela maior já fechada, SHORT se K > D
+    """
+    allowed = np.ones(len(series), dtype=bool)
+    close_times = series['timestamp'] + INTERVAL_MS[base_interval]
+
+    for interval in intervals:
+        higher = resample(series, interval, complete_only=True, base_interval=base_interval)
+        if not len(higher):
+            continue
+        _, _, k, d = indicators.stoch_rsi(higher['close'], *params)
+
+        # Última vela maior completa até o fechamento de cada vela base
+        index = np.searchsorted(higher['timestamp'] + INTERVAL_MS[interval], close_times, side='right') - 1
+        known = index >= 0
+        index = index.clip(0)
+        up = known & (k[index] > d[index])
+        down = known & (k[index] < d[index])
+
+        allowed &= ~(((signals == LONG) & down) | ((signals == SHORT) & up))
+
+    return allowed
+
+
+class Backtester:
+    def __init__(self, strategy=None, initial_capital=35.0, investment_per_trade=25.0, leverage=50,
+                 base_interval='5m', mtf_intervals=None, warmup=50, stop_loss_percent=5.0):
+        """
+        strategy: estratégia (padrão: StochRSIStrategy com STOCH_RSI_PARAMS)
+        stop_loss_percent: distância do stop/trailing (padrão do TradeSimulator: 5%)
+        mtf_intervals: ex ('15m', '1h') para aplicar o filtro de tendência do app
+        warmup: velas carregadas antes da primeira análise (como o trading loop)
+        """
+        self.strategy = strategy or StochRSIStrategy()
+        self.initial_capital = initial_capital
+        self.investment_per_trade = investment_per_trade
+        self.leverage = leverage
+        self.base_interval = base_interval
+        self.mtf_intervals = mtf_intervals or ()
+        self.warmup = warmup
+        self.stop_loss_percent = stop_loss_percent
+
+    def _simulator(self):
+        sim = TradeSimulator(self.initial_capital, self.investment_per_trade, self.leverage)
+        sim.stop_loss_percent = self.stop_loss_percent
+        return sim
+
+    def prepare(self, candles):
+        """
+        Sinais e confirmações do histórico inteiro -> (signals, confirmed)
+        Só dependem da estratégia: podem ser reaproveitados entre runs com
+        outros stops/alavancagens, ou fatiados para janelas de tempo
+        """
+        series = as_series(candles)
+
+        # Sinais do histórico inteiro (sinal da vela i, avaliado no fechamento dela)
+        signals = self.strategy.generate(series)
+        signals[:self.warmup - 2] = NONE
+
+        # Confirmação no início da vela seguinte: preço atual = abertura
+        confirmed = np.zeros(len(series), dtype=bool)
+        confirmed[:-1] = self.strategy.entry_allowed(signals[:-1], series['open'][1:], series['close'][:-1])
+        if self.mtf_intervals:
+            confirmed &= mtf_allowed(series, signals, self.mtf_intervals, self.base_interval,
+                                     getattr(self.strategy, 'params', STOCH_RSI_PARAMS))
+        return signals, confirmed
+
+    def run(self, candles, prepared=None):
+        """
+        Executa o backtest -> {'trades': [...], 'statistics': {...}}
+        prepared: (signals, confirmed) de prepare() para as mesmas velas
+        """
+        started = time.perf_counter()
+        series = as_series(candles)
+        closes = series['close'].tolist()
+        timestamps = series['timestamp'].tolist()
+        signals, confirmed = prepared if prepared is not None else self.prepare(series)
+
+        # Eventos: entrada na vela j+1 (sinal da vela j confirmado)
+        entries = np.flatnonzero(((signals == LONG) | (signals == SHORT)) & confirmed) + 1
+        entries = entries[entries < len(series)]
+        exit_signals = {'LONG': np.flatnonzero(signals == EXIT_LONG), 'SHORT': np.flatnonzero(signals == EXIT_SHORT)}
+        signals = signals.tolist()
+
+        sim = self._simulator()
+        pending = []  # (evento de saída, etapa, id, posição, preço, motivo, momento)
+
+        for event in entries.tolist():
+            self._settle(sim, pending, event)
+            moment = datetime.fromtimestamp(timestamps[event] / 1000)
+            position, _ = sim.open_position(SIGNAL_NAMES[signals[event - 1]], closes[event - 1], timestamp=moment)
+            if position:
+                pending.append(self._resolve_exit(sim, position, event, series, exit_signals))
+
+        self._settle(sim, pending, len(closes))
+
+        # Posições ainda abertas são encerradas no último fechamento
+        if len(closes):
+            end = datetime.fromtimestamp(timestamps[-1] / 1000)
+            for position in list(sim.open_positions):
+                sim.close_position(position, closes[-1], 'Fim do backtest', timestamp=end)
+
+        statistics = self.statistics(sim, signals)
+        statistics['candles'] = len(closes)
+        statistics['elapsed'] = round(time.perf_counter() - started, 3)
+        if len(closes):
+            statistics['start'] = datetime.fromtimestamp(timestamps[0] / 1000).strftime('%Y-%m-%d %H:%M')
+            statistics['end'] = datetime.fromtimestamp(timestamps[-1] / 1000).strftime('%Y-%m-%d %H:%M')
+
+        return {'trades': sim.closed_trades, 'statistics': statistics}
+
+    def _resolve_exit(self, sim, position, event, series, exit_signals, block=64):
+        """
+        Saída de uma posição aberta no evento `event` -> item de `pending`
+        Procura o stop em blocos crescentes até a vela do próximo sinal de saída;
+        o sinal de saída da vela j fecha a posição no evento j+1
+        """
+        candles = len(series)
+        exits = exit_signals[position['type']]
+        following = np.searchsorted(exits, event)
+        exit_candle = int(exits[following]) if following < len(exits) else None
+        if exit_candle is not None and exit_candle >= candles - 1:
+            exit_candle = None      # evento fora dos dados: fecha no fim do backtest
+        last = exit_candle if exit_candle is not None else candles - 1
+
+        start = event
+        while start <= last:
+            stop = min(start + block, last + 1)
+            index, price = sim.resolve_stop(position, series['open'][start:stop], series['high'][start:stop],
+                                            series['low'][start:stop], series['close'][start:stop])
+            if index is not None:
+                candle = start + index
+                moment = datetime.fromtimestamp(int(series['timestamp'][candle]) / 1000)
+                return (candle + 1, 0, position['id'], position, price, 'Trailing Stop', moment)
+            start = stop
+            block *= 2
+
+        if exit_candle is None:
+            return (candles, 2, position['id'], position, None, None, None)
+
+        reason = 'Stoch RSI Overbought' if position['type'] == 'LONG' else 'Stoch RSI Oversold'
+        moment = datetime.fromtimestamp(int(series['timestamp'][exit_candle + 1]) / 1000)
+        return (exit_candle + 1, 1, position['id'], position, float(series['close'][exit_candle]), reason, moment)
+
+    def _settle(self, sim, pending, event):
+        """Fecha, em ordem cronológica, as posições com saída até o evento `event`"""
+        due = sorted((item for item in pending if item[0] <= event and item[4] is not None), key=lambda item: item[:3])
+        for item in due:
+            pending.remove(item)
+            _, _, _, position, price, reason, moment = item
+            sim.close_position(position, price, reason, timestamp=moment)
+
+    def statistics(self, sim, signals):
+        """Estatísticas do TradeSimulator (com drawdown e profit factor) + contagem de sinais"""
+        stats = sim.get_statistics()
+        stats['signals'] = {name: signals.count(code) for code, name in SIGNAL_NAMES.items() if name}
+        return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Backtest da estratégia Stoch RSI')
+    parser.add_argument('--file', default=None, help='CSV/JSON de velas ou pasta de um KlineStore')
+    parser.add_argument('--days', type=int, default=30, help='Dias de histórico do provedor (sem --file)')
+    parser.add_argument('--symbol', default='BTCUSDT')
+    parser.add_argument('--interval', default='5m')
+    parser.add_argument('--mtf', action='store_true', help='Aplicar o filtro de tendência 15m/1h')
+    args = parser.parse_args()
+
+    if args.file:
+        candles = load_candles(args.file, args.symbol, args.interval)
+    else:
+        from data_provider import data_provider
+        candles = data_provider.get_historical_klines(args.days, args.symbol, args.interval)
+
+    print(f"🧪 Backtest: {len(candles)} velas de {args.interval} ({args.symbol})")
+
+    backtester = Backtester(base_interval=args.interval, mtf_intervals=('15m', '1h') if args.mtf else None)
+    result = backtester.run(candles)
+    stats = result['statistics']
+
+    print(f"\n📊 Estatísticas ({stats.get('start')} → {stats.get('end')}):")
+    print(f"   Trades: {stats['total_trades']} ({stats['won']} ganhos / {stats['lost']} perdas)")
+    print(f"   Win rate: {stats['win_rate']:.1f}%")
+    print(f"   P&L total: ${stats['total_pnl']:.2f} ({stats['total_pnl_percent']:.2f}%)")
+    print(f"   Maior ganho: ${stats['biggest_win']:.2f} | Maior perda: ${stats['biggest_loss']:.2f}")
+    print(f"   Drawdown máximo: ${stats['max_drawdown']:.2f}")
+    print(f"   Capital final: ${stats['current_capital']:.2f}")
+    print(f"   Sinais: {stats['signals']}")
+    print(f"\n⏱  {stats['elapsed']:.2f}s")
@@ -0,0 +1,400 @@
+"""
+Benchmark Analyzer - Regressão de corretude e desempenho do analyzer (offline)
+
+Gera séries sintéticas (e usa velas gravadas no KlineStore, se houver) de 1k a
+1M velas e:
+- compara as implementações rápidas com uma cópia congelada do cálculo
+  escalar original (calculate_rsi / calculate_stoch_rsi);
+- mede tempo e pico de memória de cada caminho por tamanho;
+- divide o tempo da referência pelo de cada caminho, na mesma execução, e
+  falha se a aceleração ficou abaixo do mínimo (não depende da máquina);
+- compara os tempos com um baseline salvo, se houver, e falha se algo ficou
+  mais lento que o limite (padrão: 1.5x).
+
+Uso:
+    python benchmark_analyzer.py                      # roda e compara com o baseline
+    python benchmark_analyzer.py --save-baseline      # grava os tempos atuais
+    python benchmark_analyzer.py --sizes 1000,10000 --store data/klines/futures
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+import indicators
+from analyzer import TechnicalAnalyzer, StochRSIState, WilderRSI, STOCH_RSI_PARAMS
+from candles import CandleSeries
+from kline_store import KlineStore, COLUMNS
+from strategy import StochRSIStrategy
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(BASE_DIR, 'data', 'benchmarks', 'analyzer.json')
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+DEFAULT_THRESHOLD = 1.5
+MIN_REGRESSION = 0.002      # ignorar diferenças menores que 2ms (ruído)
+REFERENCE_MAX = 10_000      # referência escalar cronometrada só até aqui (é O(n·período))
+STREAM_MAX = 10_000         # StochRSIState vela a vela só até aqui (loop Python)
+SAMPLES = 300               # pontos comparados com a referência por série
+
+# Aceleração mínima de cada caminho sobre reference_stoch_rsi no mesmo tamanho
+# (~1/4 da observada; stoch_rsi_state processa a série inteira vela a vela)
+MIN_SPEEDUP = {
+    'stoch_rsi_series': 50,
+    'analyze_klines': 50,
+    'rsi_wilder': 25,
+    'strategy_generate': 50,
+    'stoch_rsi_state': 0.9,
+}
+
+
+# ============================================================
+# Referência congelada: cópia do cálculo escalar original.
+# NÃO otimizar nem alterar - é o que define "o sinal não mudou".
+# ============================================================
+
+def reference_calculate_rsi(prices, period=14):
+    if len(prices) < period + 1:
+        return None
+
+    deltas = np.diff(prices)
+    gains = np.where(deltas > 0, deltas, 0)
+    losses = np.where(deltas < 0, -deltas, 0)
+
+    avg_gain = np.mean(gains[:period])
+    avg_loss = np.mean(losses[:period])
+
+    for i in range(period, len(gains)):
+        avg_gain = (avg_gain * (period - 1) + gains[i]) / period
+        avg_loss = (avg_loss * (period - 1) + losses[i]) / period
+
+    if avg_loss == 0:
+        return 100
+
+    rs = avg_gain / avg_loss
+    rsi = 100 - (100 / (1 + rs))
+
+    return rsi
+
+
+def reference_calculate_stoch_rsi(prices, rsi_period=14, stoch_period=14, k_smooth=3, d_smooth=3):
+    if len(prices) < rsi_period + stoch_period + k_smooth + d_smooth:
+        return None, None
+
+    rsi_values = []
+    for i in range(rsi_period, len(prices)):
+        price_slice = prices[i-rsi_period:i+1]
+        rsi = reference_calculate_rsi(price_slice, rsi_period)
+        if rsi is not None:
+            rsi_values.append(rsi)
+
+    if len(rsi_values) < stoch_period:
+        return None, None
+
+    stoch_rsi_values = []
+    for i in range(stoch_period - 1, len(rsi_values)):
+        rsi_slice = rsi_values[i - stoch_period + 1:i + 1]
+        highest_rsi = max(rsi_slice)
+        lowest_rsi = min(rsi_slice)
+
+        if highest_rsi == lowest_rsi:
+            stoch_rsi = 50
+        else:
+            stoch_rsi = ((rsi_values[i] - lowest_rsi) / (highest_rsi - lowest_rsi)) * 100
+
+        stoch_rsi_values.append(stoch_rsi)
+
+    if len(stoch_rsi_values) < k_smooth:
+        return None, None
+
+    k_values = []
+    for i in range(k_smooth - 1, len(stoch_rsi_values)):
+        k_slice = stoch_rsi_values[i - k_smooth + 1:i + 1]
+        k = np.mean(k_slice)
+        k_values.append(k)
+
+    if len(k_values) < d_smooth:
+        return None, None
+
+    d_values = []
+    for i in range(d_smooth - 1, len(k_values)):
+        d_slice = k_values[i - d_smooth + 1:i + 1]
+        d = np.mean(d_slice)
+        d_values.append(d)
+
+    current_k = k_values[-1] if k_values else None
+    current_d = d_values[-1] if d_values else None
+
+    return current_k, current_d
+
+
+# ============================================================
+# Séries de teste
+# ============================================================
+
+def synthetic_series(kind, size, seed=0):
+    """Fechamentos sintéticos: random_walk, trend ou flat (preços repetidos, RSI 100/stoch 50)"""
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0, 1, size)
+
+    if kind == 'trend':
+        steps += 0.3
+    elif kind == 'flat':
+        # Trechos parados e preços arredondados geram empates e avg_loss == 0
+        steps[rng.random(size) < 0.4] = 0
+        return np.round(1000 + np.cumsum(steps))
+
+    return 1000 + np.cumsum(steps)
+
+
+def recorded_series(store_dir, size, symbol='BTCUSDT', interval='5m'):
+    """Últimos `size` fechamentos gravados no KlineStore (None se não houver)"""
+    if not store_dir or not os.path.isdir(store_dir):
+        return None
+    closes = KlineStore(store_dir).load(symbol, interval)['close']
+    if len(closes) < min(size, 1_000):
+        return None
+    return np.array(closes[-size:], dtype=np.float64)
+
+
+def make_series(sizes, store_dir=None):
+    """Lista de (nome, fechamentos) para cada tamanho"""
+    series = []
+    for size in sizes:
+        for kind in ('random_walk', 'trend', 'flat'):
+            series.append((f'{kind}_{size}', synthetic_series(kind, size, seed=size)))
+
+        recorded = recorded_series(store_dir, size)
+        if recorded is not None:
+            series.append((f'recorded_{len(recorded)}', recorded))
+    return series
+
+
+# ============================================================
+# Corretude
+# ============================================================
+
+def _equal(fast, reference):
+    if reference is None:
+        return fast is None or np.isnan(fast)
+    return fast == reference
+
+
+def check_correctness(closes, params=STOCH_RSI_PARAMS, samples=SAMPLES, seed=0):
+    """
+    Compara os caminhos rápidos com a referência congelada
+    Retorna a lista de divergências (vazia = tudo igual)
+    """
+    analyzer = TechnicalAnalyzer()
+    errors = []
+    n = len(closes)
+    minimum = sum(params)
+    tail = 2 * minimum  # o Stoch RSI só depende dos últimos preços
+
+    _, _, k, d = analyzer.stoch_rsi_series(closes, *params)
+
+    # Pontos amostrados + os primeiros válidos + o último
+    rng = np.random.default_rng(seed)
+    points = set(rng.integers(minimum - 1, n, size=min(samples, n)).tolist())
+    points.update(range(minimum - 1, min(minimum + 5, n)))
+    points.add(n - 1)
+
+    for i in sorted(points):
+        ref_k, ref_d = reference_calculate_stoch_rsi(closes[max(0, i + 1 - tail):i + 1], *params)
+        if not (_equal(k[i], ref_k) and _equal(d[i], ref_d)):
+            errors.append(f'stoch_rsi[{i}]: rápido=({k[i]}, {d[i]}) referência=({ref_k}, {ref_d})')
+
+    # Escalar público = último ponto da série
+    if analyzer.calculate_stoch_rsi(closes, *params) != reference_calculate_stoch_rsi(closes[-tail:], *params):
+        errors.append('calculate_stoch_rsi difere da referência')
+
+    # Estado incremental (semeado pela cauda) = série em lote
+    state = StochRSIState(*params)
+    state.seed(closes)
+    if not (_equal(k[-1], state.k) and _equal(d[-1], state.d)):
+        errors.append(f'StochRSIState=({state.k}, {state.d}) série=({k[-1]}, {d[-1]})')
+
+    # RSI de Wilder sobre o histórico inteiro
+    ref_rsi = reference_calculate_rsi(closes, 14)
+    wilder = WilderRSI(14)
+    if wilder.seed(closes) != ref_rsi:
+        errors.append(f'WilderRSI={wilder.value()} referência={ref_rsi}')
+    if not np.isclose(indicators.rsi(closes, 14)[-1], ref_rsi, rtol=1e-9):
+        errors.append(f'indicators.rsi={indicators.rsi(closes, 14)[-1]} referência={ref_rsi}')
+
+    return errors
+
+
+# ============================================================
+# Desempenho
+# ============================================================
+
+def _stream(closes):
+    state = StochRSIState(*STOCH_RSI_PARAMS)
+    for close in closes.tolist():
+        state.update(close)
+
+
+def _analyze(candles):
+    return TechnicalAnalyzer().analyze_klines(candles, verbose=False)
+
+
+def _reference_series(closes):
+    return reference_calculate_stoch_rsi(closes, *STOCH_RSI_PARAMS)
+
+
+# nome -> (função, tamanho máximo, entrada)
+BENCHMARKS = {
+    'stoch_rsi_series': (lambda closes: indicators.stoch_rsi(closes, *STOCH_RSI_PARAMS), None, 'closes'),
+    'analyze_klines': (_analyze, None, 'candles'),
+    'rsi_wilder': (lambda closes: indicators.rsi(closes, 14), None, 'closes'),
+    'strategy_generate': (lambda closes: StochRSIStrategy().generate({'close': closes}), None, 'closes'),
+    'stoch_rsi_state': (_stream, STREAM_MAX, 'closes'),
+    'reference_stoch_rsi': (_reference_series, REFERENCE_MAX, 'closes'),
+}
+
+
+def _candles(closes):
+    columns = {name: np.zeros(len(closes), dtype=dtype) for name, dtype in COLUMNS}
+    columns['timestamp'] = np.arange(len(closes), dtype=np.int64) * 300_000
+    columns['close'] = closes
+    return CandleSeries(columns)
+
+
+def measure(func, arg, repeat=3):
+    """(melhor tempo em segundos, pico de memória em bytes)"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def run_benchmarks(sizes, repeat=3):
+    """Tempos por benchmark e tamanho -> {'nome/tamanho': {'seconds', 'peak_bytes'}}"""
+    results = {}
+    for size in sizes:
+        closes = synthetic_series('random_walk', size, seed=size)
+        inputs = {'closes': closes, 'candles': _candles(closes)}
+
+        for name, (func, max_size, kind) in BENCHMARKS.items():
+            if max_size is not None and size > max_size:
+                continue
+            seconds, peak = measure(func, inputs[kind], repeat=1 if size >= 100_000 else repeat)
+            results[f'{name}/{size}'] = {'seconds': seconds, 'peak_bytes': peak}
+    return results
+
+
+def load_baseline(path=BASELINE_FILE):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_baseline(results, path=BASELINE_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def find_regressions(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Benchmarks mais lentos que baseline × threshold -> lista de (chave, atual, baseline)"""
+    regressions = []
+    for key, result in results.items():
+        previous = (baseline or {}).get(key)
+        if previous is None:
+            continue
+        current, before = result['seconds'], previous['seconds']
+        if current > before * threshold and current - before > MIN_REGRESSION:
+            regressions.append((key, current, before))
+    return regressions
+
+
+def speedups(results):
+    """Tempo da referência / tempo de cada caminho, por tamanho (onde a referência foi cronometrada)"""
+    ratios = {}
+    for key, result in results.items():
+        name, size = key.split('/')
+        reference = results.get(f'reference_stoch_rsi/{size}')
+        if reference is not None and name != 'reference_stoch_rsi':
+            ratios[key] = reference['seconds'] / result['seconds']
+    return ratios
+
+
+def find_slow_paths(results, minimum=MIN_SPEEDUP):
+    """Caminhos com aceleração abaixo do mínimo -> lista de (chave, aceleração, mínimo)"""
+    slow = []
+    for key, ratio in speedups(results).items():
+        required = minimum.get(key.split('/')[0])
+        if required is not None and ratio < required:
+            slow.append((key, ratio, required))
+    return slow
+
+
+def print_report(results, baseline=None):
+    ratios = speedups(results)
+    print(f"\n{'Benchmark':<34} {'Tempo':>11} {'Memória':>11} {'Aceleração':>11} {'Baseline':>11}")
+    print('-' * 82)
+    for key, result in results.items():
+        previous = (baseline or {}).get(key)
+        before = f"{previous['seconds'] * 1000:9.2f}ms" if previous else '-'
+        speedup = f"{ratios[key]:.1f}x" if key in ratios else '-'
+        print(f"{key:<34} {result['seconds'] * 1000:9.2f}ms "
+              f"{result['peak_bytes'] / 1e6:9.2f}MB {speedup:>11} {before:>11}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark e regressão do analyzer')
+    parser.add_argument('--sizes', default=','.join(str(s) for s in SIZES))
+    parser.add_argument('--store', default=None, help='Pasta de um KlineStore com velas gravadas')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(',')]
+
+    print("🧪 Corretude (implementações rápidas × referência congelada)...")
+    failed = False
+    for name, closes in make_series(sizes, args.store):
+        errors = check_correctness(closes)
+        print(f"   {'✅' if not errors else '❌'} {name}")
+        for error in errors[:5]:
+            print(f"      {error}")
+        failed = failed or bool(errors)
+
+    print("\n⏱  Desempenho...")
+    results = run_benchmarks(sizes)
+    baseline = load_baseline(args.baseline)
+    print_report(results, baseline)
+
+    for key, ratio, required in find_slow_paths(results):
+        print(f"❌ {key}: {ratio:.1f}x mais rápido que a referência (mínimo {required:g}x)")
+        failed = True
+
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        print(f"\n💾 Baseline salvo em {args.baseline}")
+    elif baseline is None:
+        print(f"\n⚠️  Sem baseline em {args.baseline} (use --save-baseline)")
+    else:
+        regressions = find_regressions(results, baseline, args.threshold)
+        for key, current, before in regressions:
+            print(f"❌ {key}: {current * 1000:.2f}ms (baseline {before * 1000:.2f}ms)")
+        failed = failed or bool(regressions)
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
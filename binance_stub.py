@@ -0,0 +1,334 @@
+"""
+Binance Stub - Servidor local que imita a API REST da Binance Futures
+
+Implementa os endpoints usados pelo bot (/ticker/price, /ticker/24hr e
+/klines com paginação por startTime/endTime/limit) a partir de velas
+sintéticas ou gravadas (KlineStore). Permite injetar latência, erros 5xx
+e respostas de rate limit (429) para testar/medir o provedor sem internet.
+
+Uso:
+    python binance_stub.py --port 8081 --latency 0.05 --error-rate 0.01
+    python binance_stub.py --bench 200     # mede o provedor contra o stub
+"""
+import argparse
+import json
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+from aggregator import resample
+from candles import CandleSeries
+from kline_store import KlineStore, INTERVAL_MS
+
+BASE_MS = INTERVAL_MS['1m']
+
+
+class BinanceStub:
+    def __init__(self, symbols=('BTCUSDT',), days=30, latency=0.0, error_rate=0.0,
+                 rate_limit_rate=0.0, weight_limit=2400, seed=42, store_dir=None,
+                 host='127.0.0.1', port=0):
+        """
+        latency: atraso por requisição (segundos, +/- 20% de jitter)
+        error_rate: fração das requisições que recebem HTTP 500
+        rate_limit_rate: fração das requisições que recebem HTTP 429
+        weight_limit: peso por minuto; acima disso todas recebem 429
+        store_dir: pasta de um KlineStore com velas de 1m gravadas (senão, sintéticas)
+        """
+        self.symbols = list(symbols)
+        self.days = days
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.weight_limit = weight_limit
+        self.rng = random.Random(seed)
+        self.np_rng = np.random.default_rng(seed)
+
+        self.candles = {}
+        self.used_weight = 0
+        self.weight_minute = 0
+        self.stats = {'requests': 0, 'errors': 0, 'rate_limited': 0, 'by_path': {}}
+        self._lock = threading.Lock()
+
+        for symbol in self.symbols:
+            if store_dir:
+                columns = KlineStore(store_dir).load(symbol, '1m')
+                self.candles[symbol] = CandleSeries({k: np.array(v) for k, v in columns.items()})
+            else:
+                self.candles[symbol] = self._synthetic(days)
+
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/fapi/v1"
+
+    def start(self):
+        """Inicia o servidor em uma thread e retorna a base_url"""
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    # ---------------------------------------------------------------- dados
+
+    def _synthetic(self, days, start_price=60000.0):
+        """Passeio aleatório de velas de 1m terminando no minuto atual"""
+        now_ms = int(time.time() * 1000)
+        end = now_ms - now_ms % BASE_MS
+        count = days * 24 * 60 + 1
+        timestamps = end - np.arange(count - 1, -1, -1, dtype=np.int64) * BASE_MS
+
+        returns = self.np_rng.normal(0, 0.0008, count)
+        closes = start_price * np.exp(np.cumsum(returns))
+        opens = np.r_[start_price, closes[:-1]]
+        spread = np.abs(self.np_rng.normal(0, 0.0005, count)) * closes
+        volume = self.np_rng.uniform(5, 50, count)
+
+        return CandleSeries({
+            'timestamp': timestamps,
+            'open': opens,
+            'high': np.maximum(opens, closes) + spread,
+            'low': np.minimum(opens, closes) - spread,
+            'close': closes,
+            'volume': volume,
+            'close_time': timestamps + BASE_MS - 1,
+            'quote_volume': volume * closes,
+            'trades': self.np_rng.integers(50, 500, count),
+        })
+
+    def _extend(self, symbol):
+        """Acrescenta velas de 1m até o minuto atual (o relógio continua andando)"""
+        series = self.candles[symbol]
+        now_ms = int(time.time() * 1000)
+        last = int(series['timestamp'][-1])
+        missing = (now_ms - last) // BASE_MS
+        if missing <= 0:
+            return series
+
+        timestamps = last + np.arange(1, missing + 1, dtype=np.int64) * BASE_MS
+        closes = series['close'][-1] * np.exp(np.cumsum(self.np_rng.normal(0, 0.0008, missing)))
+        opens = np.r_[series['close'][-1], closes[:-1]]
+        volume = self.np_rng.uniform(5, 50, missing)
+        extra = CandleSeries({
+            'timestamp': timestamps,
+            'open': opens,
+            'high': np.maximum(opens, closes),
+            'low': np.minimum(opens, closes),
+            'close': closes,
+            'volume': volume,
+            'close_time': timestamps + BASE_MS - 1,
+            'quote_volume': volume * closes,
+            'trades': self.np_rng.integers(50, 500, missing),
+        })
+        series = CandleSeries.concat([series, extra])
+        self.candles[symbol] = series
+        return series
+
+    def klines(self, symbol, interval, start_time=None, end_time=None, limit=500):
+        """Mesma semântica do GET /klines da Binance"""
+        with self._lock:
+            base = self._extend(symbol)
+
+        interval_ms = INTERVAL_MS[interval]
+        timestamps = base['timestamp']
+
+        # Recortar as velas base que podem cair no intervalo pedido
+        if start_time is not None:
+            first = int(np.searchsorted(timestamps, start_time - start_time % interval_ms))
+            last = min(len(base), first + (limit + 1) * (interval_ms // BASE_MS))
+        else:
+            end = end_time if end_time is not None else timestamps[-1]
+            last = int(np.searchsorted(timestamps, end, side='right'))
+            first = max(0, last - (limit + 1) * (interval_ms // BASE_MS))
+
+        candles = base[first:last] if interval == '1m' else resample(base[first:last], interval)
+        ts = candles['timestamp']
+        mask = np.ones(len(candles), dtype=bool)
+        if start_time is not None:
+            mask &= ts >= start_time
+        if end_time is not None:
+            mask &= ts <= end_time
+        index = np.flatnonzero(mask)
+        index = index[:limit] if start_time is not None else index[-limit:]
+
+        return [
+            [int(c['timestamp']), f"{c['open']:.2f}", f"{c['high']:.2f}", f"{c['low']:.2f}",
+             f"{c['close']:.2f}", f"{c['volume']:.3f}", int(c['close_time']),
+             f"{c['quote_volume']:.2f}", int(c['trades'])]
+            for c in (candles[int(i)] for i in index)
+        ]
+
+    def ticker(self, symbol):
+        """Último preço e variação das últimas 24h"""
+        with self._lock:
+            base = self._extend(symbol)
+        price = float(base['close'][-1])
+        past = float(base['close'][max(0, len(base) - 24 * 60)])
+        return {
+            'symbol': symbol,
+            'price': f"{price:.2f}",
+            'lastPrice': f"{price:.2f}",
+            'priceChangePercent': f"{(price - past) / past * 100:.3f}",
+        }
+
+    # ------------------------------------------------------------- servidor
+
+    def _weight(self, path, query):
+        if path.endswith('/klines'):
+            limit = int(query.get('limit', 500))
+            return 1 if limit < 100 else 2 if limit < 500 else 5 if limit <= 1000 else 10
+        if 'symbol' in query:
+            return 1
+        return 2 if path.endswith('/ticker/price') else 40
+
+    def _account(self, path, weight):
+        """Contabiliza peso/estatísticas e decide se a requisição falha"""
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['by_path'][path] = self.stats['by_path'].get(path, 0) + 1
+
+            minute = int(time.time() // 60)
+            if minute != self.weight_minute:
+                self.weight_minute = minute
+                self.used_weight = 0
+            self.used_weight += weight
+
+            if self.used_weight > self.weight_limit or self.rng.random() < self.rate_limit_rate:
+                self.stats['rate_limited'] += 1
+                return 429
+            if self.rng.random() < self.error_rate:
+                self.stats['errors'] += 1
+                return 500
+            return 200
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive
+
+            def setup(self):
+                super().setup()
+                # Sem Nagle: cabeçalho e corpo saem juntos (latência real = latência simulada)
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                path = parsed.path
+                query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+
+                if stub.latency:
+                    time.sleep(stub.latency * stub.rng.uniform(0.8, 1.2))
+
+                status = stub._account(path, stub._weight(path, query))
+                if status == 429:
+                    return self._send(429, {'code': -1003, 'msg': 'Too many requests'}, {'Retry-After': '1'})
+                if status == 500:
+                    return self._send(500, {'code': -1000, 'msg': 'Erro simulado'})
+
+                try:
+                    symbol = query.get('symbol')
+                    if path.endswith('/ticker/price') or path.endswith('/ticker/24hr'):
+                        if symbol:
+                            body = stub.ticker(symbol)
+                        else:
+                            body = [stub.ticker(s) for s in stub.symbols]
+                    elif path.endswith('/klines'):
+                        if symbol not in stub.candles:
+                            return self._send(400, {'code': -1121, 'msg': 'Invalid symbol.'})
+                        body = stub.klines(
+                            symbol, query.get('interval', '1m'),
+                            int(query['startTime']) if 'startTime' in query else None,
+                            int(query['endTime']) if 'endTime' in query else None,
+                            min(int(query.get('limit', 500)), 1500)
+                        )
+                    else:
+                        return self._send(404, {'code': -1, 'msg': 'Not found'})
+                except (KeyError, ValueError) as e:
+                    return self._send(400, {'code': -1100, 'msg': str(e)})
+
+                self._send(200, body)
+
+            def _send(self, status, body, headers=None):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.send_header('X-MBX-USED-WEIGHT-1M', str(stub.used_weight))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def run_benchmark(stub, requests_count, workers=8):
+    """Mede o provedor contra o stub (vazão, latência e retries)"""
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+    from data_provider import BinanceDataProvider
+
+    # Velas do teste em uma pasta temporária apagada no fim (memmaps não ficam em /tmp)
+    with tempfile.TemporaryDirectory() as store_dir:
+        provider = BinanceDataProvider(base_url=stub.base_url, store_dir=store_dir, symbols=stub.symbols)
+        provider.price_ttl = provider.change_24h_ttl = provider.klines_ttl = 0
+
+        start = time.perf_counter()
+        provider.get_historical_klines(days=min(stub.days, 30))
+        history_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(lambda _: provider.get_current_price(), range(requests_count)))
+        ticker_time = time.perf_counter() - start
+
+        print(f"\n⏱  Histórico ({min(stub.days, 30)} dias): {history_time:.2f}s")
+        print(f"⏱  {requests_count} preços ({workers} threads): {ticker_time:.2f}s "
+              f"({requests_count / ticker_time:.0f} req/s)")
+        print(f"\n📊 Provedor: {json.dumps(provider.get_http_stats(), indent=2)}")
+        print(f"📊 Stub: {json.dumps(stub.stats, indent=2)}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Stub local da API REST da Binance Futures')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--symbols', default='BTCUSDT')
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--weight-limit', type=int, default=2400)
+    parser.add_argument('--store', default=None, help='Pasta de um KlineStore com velas de 1m')
+    parser.add_argument('--bench', type=int, default=0, help='Roda N requisições de benchmark e sai')
+    args = parser.parse_args()
+
+    stub = BinanceStub(symbols=args.symbols.split(','), days=args.days, latency=args.latency,
+                       error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                       weight_limit=args.weight_limit, store_dir=args.store,
+                       port=0 if args.bench else args.port)
+    base_url = stub.start()
+
+    if args.bench:
+        run_benchmark(stub, args.bench)
+        stub.stop()
+    else:
+        print(f"🧪 Stub da Binance rodando em {base_url}")
+        print(f"   BinanceDataProvider(base_url='{base_url}')")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            stub.stop()
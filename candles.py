@@ -0,0 +1,185 @@
+"""
+Candles - Série de velas em formato colunar (arrays NumPy contíguos)
+
+Substitui a lista de dicts: cada coluna (timestamp, open, high, low, close,
+volume, ...) é um único array. Fatiar a série não copia dados, e a conversão
+para dicts só acontece na borda JSON (to_dicts).
+"""
+import numpy as np
+from kline_store import COLUMNS, raw_to_columns, empty_columns
+
+FIELDS = tuple(name for name, _ in COLUMNS)
+
+
+class CandleSeries:
+    def __init__(self, columns):
+        """columns: dict nome -> array (todas as colunas de COLUMNS, mesmo tamanho)"""
+        self.columns = {name: np.asarray(columns[name]) for name in FIELDS}
+
+        lengths = {len(col) for col in self.columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Colunas com tamanhos diferentes: {lengths}")
+
+    @classmethod
+    def empty(cls):
+        return cls(empty_columns())
+
+    @classmethod
+    def from_raw(cls, klines):
+        """Velas cruas da Binance (listas) -> série"""
+        if not klines:
+            return cls.empty()
+        return cls(raw_to_columns(klines))
+
+    @classmethod
+    def from_dicts(cls, klines):
+        """Lista de dicts (formato antigo) -> série; campos ausentes viram 0"""
+        columns = {}
+        for name, dtype in COLUMNS:
+            columns[name] = np.array([k.get(name, 0) for k in klines], dtype=dtype)
+        return cls(columns)
+
+    @classmethod
+    def concat(cls, series_list):
+        """Concatena várias séries (copia os dados)"""
+        series_list = [s for s in series_list if len(s)]
+        if not series_list:
+            return cls.empty()
+        if len(series_list) == 1:
+            return series_list[0]
+        return cls({
+            name: np.concatenate([s.columns[name] for s in series_list])
+            for name in FIELDS
+        })
+
+    def __len__(self):
+        return len(self.columns['timestamp'])
+
+    def __getattr__(self, name):
+        # series.close, series.timestamp, ...
+        columns = self.__dict__.get('columns')
+        if columns is not None and name in columns:
+            return columns[name]
+        raise AttributeError(name)
+
+    def __getitem__(self, key):
+        """
+        series['close'] -> coluna (array)
+        series[-1]      -> vela como dict
+        series[-20:]    -> nova série (view, sem cópia)
+        """
+        if isinstance(key, str):
+            return self.columns[key]
+        if isinstance(key, slice):
+            return CandleSeries({name: col[key] for name, col in self.columns.items()})
+        return {name: col[key].item() for name, col in self.columns.items()}
+
+    def __iter__(self):
+        # Uma vela (dict) por vez: não monta a lista inteira de dicts
+        values = [self.columns[name].tolist() for name in FIELDS]
+        for row in zip(*values):
+            yield dict(zip(FIELDS, row))
+
+    def to_dicts(self, fields=FIELDS):
+        """Converte para lista de dicts (usar só na borda JSON)"""
+        values = [self.columns[name].tolist() for name in fields]
+        return [dict(zip(fields, row)) for row in zip(*values)]
+
+
+def as_series(klines):
+    """Aceita CandleSeries ou lista de dicts e retorna CandleSeries"""
+    if isinstance(klines, CandleSeries):
+        return klines
+    return CandleSeries.from_dicts(klines or [])
+
+
+class KlineWindow:
+    """
+    Janela circular de tamanho fixo com as velas mais recentes
+
+    A vela aberta é atualizada no lugar; quando chega uma vela com timestamp
+    novo, a anterior é considerada fechada, os callbacks on_candle_closed são
+    chamados e a nova ocupa o próximo slot. Cada valor é gravado duas vezes
+    (slot e slot + capacidade), então series() é sempre uma view contígua,
+    sem cópia e sem alocar arrays novos a cada tick.
+    """
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self.buffers = {name: np.zeros(2 * capacity, dtype=dtype) for name, dtype in COLUMNS}
+        self.count = 0
+        self.last = -1          # slot da vela mais recente
+        self.callbacks = []
+
+    def on_candle_closed(self, callback):
+        """Registra callback(window) chamado quando uma vela fecha (a nova já está na janela)"""
+        self.callbacks.append(callback)
+
+    def __len__(self):
+        return self.count
+
+    def last_timestamp(self):
+        return int(self.buffers['timestamp'][self.last]) if self.count else None
+
+    def _write(self, slot, candle):
+        for name, buffer in self.buffers.items():
+            value = candle[name]
+            buffer[slot] = value
+            buffer[slot + self.capacity] = value
+
+    def seed(self, klines):
+        """Carrega o histórico inicial (sem disparar callbacks), coluna a coluna"""
+        series = as_series(klines)[-self.capacity:]
+        if not len(series):
+            return
+        slots = (self.last + 1 + np.arange(len(series))) % self.capacity
+        for name, buffer in self.buffers.items():
+            buffer[slots] = series[name]
+            buffer[slots + self.capacity] = series[name]
+        self.last = int(slots[-1])
+        self.count = min(self.count + len(series), self.capacity)
+
+    def _append(self, candle):
+        self.last = (self.last + 1) % self.capacity
+        self._write(self.last, candle)
+        self.count = min(self.count + 1, self.capacity)
+
+    def update(self, candle):
+        """
+        Atualiza a janela com uma vela (dict)
+        Retorna True se uma vela fechou (a nova vela começou)
+        """
+        last_ts = self.last_timestamp()
+
+        if last_ts is not None and candle['timestamp'] == last_ts:
+            # Mesma vela: atualizar no lugar
+            self._write(self.last, candle)
+            return False
+
+        if last_ts is not None and candle['timestamp'] < last_ts:
+            # Valores finais atrasados da vela anterior (já fechada)
+            previous = (self.last - 1) % self.capacity
+            if self.count > 1 and candle['timestamp'] == self.buffers['timestamp'][previous]:
+                self._write(previous, candle)
+            return False
+
+        self._append(candle)
+
+        if last_ts is None:
+            return False
+
+        for callback in self.callbacks:
+            callback(self)
+        return True
+
+    def update_many(self, klines):
+        """Atualiza com várias velas em ordem (ex: últimas 2 velas do REST)"""
+        closed = False
+        for candle in klines:
+            closed = self.update(candle) or closed
+        return closed
+
+    def series(self):
+        """Velas em ordem cronológica como CandleSeries (view, sem cópia)"""
+        end = self.last + self.capacity + 1
+        start = end - self.count
+        return CandleSeries({name: buffer[start:end] for name, buffer in self.buffers.items()})
@@ -1,201 +1,854 @@
 """
 Data Provider - Coleta dados em tempo real da Binance
 """
-import requests
 import time
 from datetime import datetime, timedelta
 import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+from http_client import BinanceHTTPClient, BinanceAPIError
+from aggregator import CandleAggregator
+from candles import CandleSeries
+import indicators
+from kline_store import KlineStore, COLUMNS, INTERVAL_MS, DEFAULT_STORE_DIR, raw_to_columns
+
+try:
+    import simple_websocket
+    WEBSOCKET_AVAILABLE = True
+except ImportError:
+    WEBSOCKET_AVAILABLE = False
+
+
+class TTLCache:
+    """
+    Cache com TTL por chave e coalescência de requisições (single-flight)
+    Se várias threads pedem a mesma chave ao mesmo tempo, só uma executa
+    fetch(); as outras esperam e recebem o mesmo resultado
+    """
+    def __init__(self):
+        self._entries = {}      # chave -> (expira_em, valor)
+        self._in_flight = {}    # chave -> [evento, valor, erro]
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'errors': 0}
+
+    def get_or_fetch(self, key, ttl, fetch):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                self.stats['hits'] += 1
+                return entry[1]
+
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = [threading.Event(), None, None]
+                self._in_flight[key] = flight
+                self.stats['misses'] += 1
+            else:
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            # Outra thread já está buscando: esperar o resultado dela
+            flight[0].wait()
+            if flight[2] is not None:
+                raise flight[2]
+            return flight[1]
+
+        try:
+            value = fetch()
+            flight[1] = value
+            with self._lock:
+                if ttl > 0:
+                    self._entries[key] = (time.time() + ttl, value)
+            return value
+        except Exception as e:
+            flight[2] = e
+            with self._lock:
+                self.stats['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            flight[0].set()
+
+    def invalidate(self, key=None):
+        """Remove uma chave (ou tudo)"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            requests = stats['hits'] + stats['misses'] + stats['coalesced']
+            stats['hit_rate'] = ((stats['hits'] + stats['coalesced']) / requests * 100) if requests else 0
+            stats['entries'] = len(self._entries)
+            return stats
+
+
+class MarketStream:
+    """
+    Mantém preço, variação 24h e vela em andamento via WebSocket da Binance
+    Reconecta sozinho; enquanto estiver desconectado, is_alive() retorna False
+    e o provedor volta a usar a API REST
+    """
+    def __init__(self, provider, stream_url=None, stale_after=10, max_klines=20,
+                 reconnect_delay=1, max_reconnect_delay=30):
+        self.provider = provider
+        self.stream_url = stream_url or self._default_url()
+        self.stale_after = stale_after
+        self.max_klines = max_klines
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
+        self.state = {
+            'price': 0.0,
+            'mark_price': 0.0,
+            'change_24h': 0.0,
+            'klines': [],
+            'last_message': 0
+        }
+        self.reconnects = 0
+        self._lock = threading.Lock()
+        self._running = False
+        self._thread = None
+        self._ws = None
+        self._gap_sync = None
+
+    def _default_url(self):
+        """URL do stream combinado (kline + markPrice + ticker)"""
+        symbol = self.provider.symbol.lower()
+        streams = [f"{symbol}@kline_{self.provider.base_interval}", f"{symbol}@ticker"]
+        if self.provider.use_futures:
+            streams.append(f"{symbol}@markPrice@1s")
+            host = "wss://fstream.binance.com"
+        else:
+            host = "wss://stream.binance.com:9443"
+        return f"{host}/stream?streams={'/'.join(streams)}"
+
+    def start(self, seed_klines=None):
+        """Inicia a thread do stream (seed_klines: velas recentes já formatadas)"""
+        if self._running:
+            return
+
+        if seed_klines:
+            with self._lock:
+                self.state['klines'] = list(seed_klines[-self.max_klines:])
+                self.state['price'] = seed_klines[-1]['close']
+
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Encerra o stream"""
+        self._running = False
+        ws = self._ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def is_alive(self):
+        """True se recebemos mensagem recentemente"""
+        return self._running and (time.time() - self.state['last_message']) < self.stale_after
+
+    def _run(self):
+        """Loop de conexão com reconexão automática (backoff exponencial)"""
+        delay = self.reconnect_delay
+
+        while self._running:
+            try:
+                self._ws = simple_websocket.Client(self.stream_url)
+                print(f"🔌 Stream conectado: {self.stream_url}")
+                delay = self.reconnect_delay
+
+                while self._running:
+                    message = self._ws.receive(timeout=self.stale_after)
+                    if message is None:
+                        # Sem mensagens: conexão provavelmente travada
+                        raise ConnectionError("Stream sem mensagens")
+                    self.handle_message(message)
+
+            except Exception as e:
+                if not self._running:
+                    break
+                self.reconnects += 1
+                print(f"⚠️  Stream desconectado ({e}), reconectando em {delay}s...")
+            finally:
+                if self._ws is not None:
+                    try:
+                        self._ws.close()
+                    except Exception:
+                        pass
+                    self._ws = None
+
+            time.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def handle_message(self, message):
+        """Processa uma mensagem do stream combinado ({'stream': ..., 'data': ...})"""
+        payload = json.loads(message)
+        data = payload.get('data', payload)
+        event = data.get('e')
+        candle = None
+
+        with self._lock:
+            if event == 'kline':
+                candle = self._handle_kline(data['k'])
+            elif event == '24hrTicker':
+                self.state['price'] = float(data['c'])
+                self.state['change_24h'] = float(data['P'])
+            elif event == 'markPriceUpdate':
+                self.state['mark_price'] = float(data['p'])
+
+            self.state['last_message'] = time.time()
+
+        # Agregador e disco fora do lock: snapshot() não espera por I/O
+        if candle is not None:
+            self._store_kline(candle, data['k']['x'])
+
+    def _handle_kline(self, k):
+        """Atualiza a vela em andamento (ou adiciona uma nova) e retorna a vela"""
+        candle = {
+            'timestamp': k['t'],
+            'open': float(k['o']),
+            'high': float(k['h']),
+            'low': float(k['l']),
+            'close': float(k['c']),
+            'volume': float(k['v']),
+            'close_time': k['T'],
+            'quote_volume': float(k['q']),
+            'trades': k['n']
+        }
+
+        klines = self.state['klines']
+        if klines and klines[-1]['timestamp'] == candle['timestamp']:
+            klines[-1] = candle
+        elif not klines or candle['timestamp'] > klines[-1]['timestamp']:
+            klines.append(candle)
+            if len(klines) > self.max_klines:
+                del klines[0]
+
+        self.state['price'] = candle['close']
+        return candle
+
+    def _store_kline(self, candle, closed):
+        """Alimenta o agregador e grava a vela fechada no armazenamento local"""
+        provider = self.provider
+        symbol, interval = provider.symbol, provider.base_interval
+
+        # Timeframes maiores são montados a partir da vela base
+        aggregator = provider.aggregators.get(symbol)
+        if aggregator is not None:
+            aggregator.update(candle, closed=closed)
+
+        if not closed or provider.append_candle(symbol, interval, candle):
+            return
+
+        # Vela fechada não continua o histórico em disco (stream caiu, bot parado):
+        # baixar o trecho que falta via REST, sem travar o recebimento de mensagens
+        last = provider.store.last_timestamp(symbol, interval)
+        syncing = self._gap_sync is not None and self._gap_sync.is_alive()
+        if last is not None and candle['timestamp'] > last and not syncing:
+            self._gap_sync = threading.Thread(target=self._sync_gap, args=(symbol, interval), daemon=True)
+            self._gap_sync.start()
+
+    def _sync_gap(self, symbol, interval):
+        try:
+            # Uma sincronização em cache pode ser anterior à vela que acabou de fechar
+            self.provider.request_cache.invalidate(('sync', symbol, interval))
+            self.provider.sync_klines(symbol, interval)
+        except Exception as e:
+            print(f"Erro ao preencher buraco do stream ({symbol} {interval}): {e}")
+
+    def snapshot(self):
+        """Cópia do estado atual"""
+        with self._lock:
+            return {
+                'price': self.state['price'],
+                'mark_price': self.state['mark_price'],
+                'change_24h': self.state['change_24h'],
+                'klines': list(self.state['klines'])
+            }
+
 
 class BinanceDataProvider:
-    def __init__(self, use_futures=True):
+    def __init__(self, use_futures=True, store_dir=None, symbols=None, intervals=None, base_url=None):
         """
         Inicializa o provedor de dados
         use_futures=True: Usa mercado de futuros/perpetual (mais próximo de dYdX/MEXC)
         use_futures=False: Usa mercado spot
+        symbols/intervals: listas de símbolos e intervalos atendidos (o primeiro é o padrão)
+        base_url: URL alternativa da API REST (ex: stub local, ver binance_stub.py)
         """
-        if use_futures:
+        if base_url:
+            self.base_url = base_url
+        elif use_futures:
             self.base_url = "https://fapi.binance.com/fapi/v1"  # Futures API
-            self.symbol = "BTCUSDT"  # No futures não precisa do .P
         else:
             self.base_url = "https://api.binance.com/api/v3"  # Spot API
-            self.symbol = "BTCUSDT"
-        
-        self.interval = "5m"  # 5 minutos
+
+        # No futures não precisa do .P
+        self.symbols = [s.upper() for s in (symbols or ["BTCUSDT"])]
+        self.intervals = list(intervals or ["5m"])  # 5 minutos
+        self.symbol = self.symbols[0]
+        self.interval = self.intervals[0]
         self.use_futures = use_futures
         self.cache = {
-            'klines': [],
+            'open_klines': {},      # (símbolo, intervalo) -> velas ainda abertas
+            'prices': {},           # símbolo -> último preço
+            'changes_24h': {},      # símbolo -> variação 24h
             'last_update': 0,
             'current_price': 0
         }
-        
+
+        # Cache compartilhado das leituras REST (TTL por endpoint + single-flight)
+        # Thread de atualização, trading loop e endpoints de debug reaproveitam
+        # a mesma resposta em vez de repetir a requisição
+        self.request_cache = TTLCache()
+        self.price_ttl = 1.0        # ticker/price
+        self.change_24h_ttl = 10.0  # ticker/24hr de todos os símbolos (peso 40)
+        self.klines_ttl = 1.0       # sincronização de velas
+
+        # Velas fechadas ficam em disco (data/klines), separadas por mercado
+        market = 'futures' if use_futures else 'spot'
+        self.store = KlineStore(os.path.join(store_dir or DEFAULT_STORE_DIR, market))
+
+        # Sessão HTTP compartilhada (keep-alive + controle de peso/rate limit)
+        self.http = BinanceHTTPClient(self.base_url, weight_limit=2400 if use_futures else 6000)
+
+        # Stream WebSocket (opcional, ver start_stream)
+        self.stream = None
+
+        # Timeframes maiores montados localmente a partir de velas de 1m
+        self.base_interval = '1m'
+        self.aggregators = {}
+
         print(f"📊 Usando Binance {'Futures (Perpetual)' if use_futures else 'Spot'}")
-    
-    def get_current_price(self):
-        """Obtém o preço atual do BTC"""
-        try:
-            url = f"{self.base_url}/ticker/price"
+
+    def view(self, symbol, interval=None):
+        """
+        Retorna uma visão de um símbolo/intervalo com a mesma interface do provedor
+        (compartilha conexões, cache e armazenamento)
+        """
+        symbol = symbol.upper()
+        interval = interval or self.interval
+
+        if symbol not in self.symbols:
+            self.symbols.append(symbol)
+        if interval not in self.intervals:
+            self.intervals.append(interval)
+
+        return SymbolView(self, symbol, interval)
+
+    @staticmethod
+    def _cache_key(path, params):
+        return (path, tuple(sorted((params or {}).items())))
+
+    def _cached_get(self, path, params, weight, ttl, timeout=5):
+        """GET com cache por TTL e coalescência (chamadas simultâneas iguais fazem 1 requisição)"""
+        key = self._cache_key(path, params)
+        return self.request_cache.get_or_fetch(
+            key, ttl, lambda: self.http.get(path, params, weight=weight, timeout=timeout)
+        )
+
+    def refresh_tickers(self, force=False):
+        """
+        Atualiza preço e variação 24h de todos os símbolos
+        Com vários símbolos, usa os endpoints sem 'symbol' (uma requisição para todos)
+        """
+        single = len(self.symbols) == 1
+
+        if single:
             params = {'symbol': self.symbol}
-            response = requests.get(url, params=params, timeout=5)
-            
-            if response.status_code == 200:
-                data = response.json()
-                price = float(data['price'])
+            price_weight, change_weight = 1, 1
+            change_ttl = self.price_ttl
+        else:
+            params = None
+            price_weight = 2 if self.use_futures else 4
+            change_weight = 40 if self.use_futures else 80
+            change_ttl = self.change_24h_ttl
+
+        if force:
+            # Só os tickers: as sincronizações de velas em cache continuam valendo
+            self.request_cache.invalidate(self._cache_key('ticker/price', params))
+            self.request_cache.invalidate(self._cache_key('ticker/24hr', params))
+
+        data = self._cached_get('ticker/price', params, price_weight, self.price_ttl)
+        for item in ([data] if single else data):
+            if item['symbol'] in self.symbols:
+                self.cache['prices'][item['symbol']] = float(item['price'])
+
+        data = self._cached_get('ticker/24hr', params, change_weight, change_ttl)
+        for item in ([data] if single else data):
+            if item['symbol'] in self.symbols:
+                self.cache['changes_24h'][item['symbol']] = float(item['priceChangePercent'])
+
+    def get_current_price(self, symbol=None):
+        """Obtém o preço atual do símbolo (padrão: BTC)"""
+        symbol = symbol or self.symbol
+        try:
+            self.refresh_tickers()
+            price = self.cache['prices'][symbol]
+            if symbol == self.symbol:
                 self.cache['current_price'] = price
-                return price
-            else:
-                print(f"Erro ao obter preço: {response.status_code}")
-                return self.cache.get('current_price', 0)
+            return price
         except Exception as e:
             print(f"Erro na requisição de preço: {e}")
-            return self.cache.get('current_price', 0)
-    
-    def get_24h_change(self):
+            return self.cache['prices'].get(symbol, 0)
+
+    def get_24h_change(self, symbol=None):
         """Obtém a variação de 24h"""
+        symbol = symbol or self.symbol
         try:
-            url = f"{self.base_url}/ticker/24hr"
-            params = {'symbol': self.symbol}
-            response = requests.get(url, params=params, timeout=5)
-            
-            if response.status_code == 200:
-                data = response.json()
-                return float(data['priceChangePercent'])
-            else:
-                return 0.0
+            self.refresh_tickers()
+            return self.cache['changes_24h'][symbol]
         except Exception as e:
             print(f"Erro ao obter variação 24h: {e}")
-            return 0.0
-    
-    def get_historical_klines(self, days=30):
-        """Obtém velas históricas de X dias"""
+            return self.cache['changes_24h'].get(symbol, 0.0)
+
+    def _klines_weight(self, limit):
+        """Peso de uma requisição /klines (tabela da documentação da Binance)"""
+        if not self.use_futures:
+            return 2
+        if limit < 100:
+            return 1
+        if limit < 500:
+            return 2
+        if limit <= 1000:
+            return 5
+        return 10
+
+    def get_http_stats(self):
+        """Latência, erros e peso usado por endpoint"""
+        return self.http.get_stats()
+
+    def get_cache_stats(self):
+        """Hits/misses/coalescências do cache de leituras"""
+        return self.request_cache.get_stats()
+
+    def _fetch_klines(self, symbol, interval, start_time, end_time, limit=1000):
+        """
+        Baixa velas cruas entre start_time e end_time
+        Períodos maiores que uma página são baixados em paralelo (backfill_klines)
+        Retorna lista de velas no formato da Binance
+        """
+        interval_ms = INTERVAL_MS[interval]
+        if (end_time - start_time) > limit * interval_ms:
+            return self.backfill_klines(start_time, end_time, limit=limit,
+                                        symbol=symbol, interval=interval)
+
+        # Binance permite max 1000 velas por request
+        # (o ritmo das requisições é controlado pelo peso em self.http)
+        all_klines = []
+        current_start = start_time
+
+        while current_start < end_time:
+            params = {
+                'symbol': symbol,
+                'interval': interval,
+                'startTime': current_start,
+                'limit': limit
+            }
+
+            try:
+                klines = self.http.get('klines', params, weight=self._klines_weight(limit))
+            except BinanceAPIError as e:
+                print(f"Erro ao obter klines: {e}")
+                break
+
+            if not klines:
+                break
+
+            all_klines.extend(klines)
+            current_start = klines[-1][0] + 1  # Próximo timestamp
+
+            if len(klines) < limit:
+                break
+
+        return all_klines
+
+    def backfill_klines(self, start_time, end_time, limit=1000, workers=4, progress=None,
+                        symbol=None, interval=None):
+        """
+        Baixa um período longo dividindo-o em janelas independentes de `limit` velas
+        As janelas são baixadas em paralelo (o peso continua limitado por self.http)
+        progress(concluídas, total) é chamado a cada janela finalizada
+        Se uma janela falhar, retorna apenas o trecho contínuo antes dela
+        """
+        symbol = symbol or self.symbol
+        interval = interval or self.interval
+        interval_ms = INTERVAL_MS[interval]
+        window_ms = limit * interval_ms
+        windows = [(start, min(start + window_ms, end_time))
+                   for start in range(start_time, end_time, window_ms)]
+
+        if progress is None:
+            step = max(1, len(windows) // 10)
+
+            def progress(done, total):
+                if done % step == 0 or done == total:
+                    print(f"   ⏳ Backfill {symbol} {interval}: {done}/{total} janelas")
+
+        def fetch_window(window):
+            params = {
+                'symbol': symbol,
+                'interval': interval,
+                'startTime': window[0],
+                'endTime': window[1] - 1,
+                'limit': limit
+            }
+            return self.http.get('klines', params, weight=self._klines_weight(limit))
+
+        results = [None] * len(windows)
+        failed = len(windows)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(fetch_window, w): i for i, w in enumerate(windows)}
+            for done, future in enumerate(as_completed(futures), start=1):
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except BinanceAPIError as e:
+                    print(f"Erro ao obter klines (janela {index + 1}/{len(windows)}): {e}")
+                    failed = min(failed, index)
+                progress(done, len(windows))
+
+        # Juntar em ordem de timestamp sem duplicatas
+        all_klines = []
+        last_ts = None
+        for klines in results[:failed]:
+            for k in klines:
+                if last_ts is None or k[0] > last_ts:
+                    all_klines.append(k)
+                    last_ts = k[0]
+
+        return all_klines
+
+    def _store_closed(self, symbol, interval, klines):
+        """Grava no disco apenas as velas já fechadas e retorna a vela aberta (se houver)"""
+        now_ms = int(time.time() * 1000)
+        closed = [k for k in klines if k[6] < now_ms]
+        open_klines = [k for k in klines if k[6] >= now_ms]
+
+        if closed:
+            self.store.append(symbol, interval, raw_to_columns(closed))
+
+        self.cache['open_klines'][(symbol, interval)] = open_klines
+        return open_klines
+
+    def sync_klines(self, symbol=None, interval=None):
+        """
+        Preenche incrementalmente o armazenamento local
+        Baixa apenas as velas que faltam desde a última vela gravada
+        Chamadas dentro de klines_ttl reaproveitam a mesma sincronização
+        """
+        symbol = symbol or self.symbol
+        interval = interval or self.interval
+        return self.request_cache.get_or_fetch(
+            ('sync', symbol, interval), self.klines_ttl, lambda: self._sync_klines(symbol, interval)
+        )
+
+    def _sync_klines(self, symbol, interval):
+        last = self.store.last_timestamp(symbol, interval)
+        if last is None:
+            return []
+
+        end_time = int(time.time() * 1000)
+        klines = self._fetch_klines(symbol, interval, last + 1, end_time)
+        open_klines = self._store_closed(symbol, interval, klines)
+        self.cache['last_update'] = time.time()
+        return open_klines
+
+    def _find_listing_time(self, symbol, interval, start_time):
+        """
+        Primeira vela a partir de start_time (1 requisição de peso 1)
+        Se ela começa depois de start_time, o símbolo foi listado ali: o timestamp é
+        gravado no armazenamento e os próximos carregamentos não pedem o trecho vazio
+        """
+        params = {'symbol': symbol, 'interval': interval, 'startTime': start_time, 'limit': 1}
+        try:
+            klines = self.http.get('klines', params, weight=self._klines_weight(1))
+        except BinanceAPIError as e:
+            print(f"Erro ao obter início do histórico: {e}")
+            return None
+
+        if not klines or klines[0][0] <= start_time + INTERVAL_MS[interval]:
+            return None
+        self.store.set_listing_time(symbol, interval, int(klines[0][0]))
+        return int(klines[0][0])
+
+    def get_historical_klines(self, days=30, symbol=None, interval=None):
+        """Obtém velas históricas de X dias (usando o armazenamento local)"""
+        symbol = symbol or self.symbol
+        interval = interval or self.interval
         try:
             # Calcular timestamp de início
             end_time = int(time.time() * 1000)
             start_time = end_time - (days * 24 * 60 * 60 * 1000)
-            
-            all_klines = []
-            current_start = start_time
-            
-            print(f"📊 Carregando {days} dias de dados (5min)...")
-            
-            # Binance permite max 1000 velas por request
-            while current_start < end_time:
-                url = f"{self.base_url}/klines"
-                params = {
-                    'symbol': self.symbol,
-                    'interval': self.interval,
-                    'startTime': current_start,
-                    'limit': 1000
-                }
-                
-                response = requests.get(url, params=params, timeout=10)
-                
-                if response.status_code == 200:
-                    klines = response.json()
-                    if not klines:
-                        break
-                    
-                    all_klines.extend(klines)
-                    current_start = klines[-1][0] + 1  # Próximo timestamp
-                    
-                    # Pequeno delay para não sobrecarregar a API
-                    time.sleep(0.1)
+            interval_ms = INTERVAL_MS[interval]
+
+            first = self.store.first_timestamp(symbol, interval)
+
+            # Símbolo listado depois do início pedido: não há velas antes da listagem
+            listed = self.store.listing_time(symbol, interval)
+            if listed is None and (first is None or first > start_time + interval_ms):
+                listed = self._find_listing_time(symbol, interval, start_time)
+            head_start = max(start_time, listed or start_time)
+
+            if first is None or first > head_start + interval_ms:
+                # Armazenamento vazio ou sem o início do período: baixar o que falta
+                head_end = first if first is not None else end_time
+                print(f"📊 Carregando {days} dias de dados ({symbol} {interval})...")
+                head = self._fetch_klines(symbol, interval, head_start, head_end)
+
+                if first is None:
+                    self._store_closed(symbol, interval, head)
                 else:
-                    print(f"Erro ao obter klines: {response.status_code}")
-                    break
-            
-            print(f"✅ {len(all_klines)} velas carregadas")
-            self.cache['klines'] = all_klines
+                    # Prefixar o histórico novo ao já gravado
+                    now_ms = int(time.time() * 1000)
+                    head = [k for k in head if k[0] < first and k[6] < now_ms]
+                    # Só prefixar se o trecho baixado encosta no que já está gravado
+                    if head and head[-1][0] + interval_ms >= first:
+                        stored = self.store.load(symbol, interval)
+                        head_columns = raw_to_columns(head)
+                        self.store.replace(symbol, interval, {
+                            name: np.concatenate([head_columns[name], stored[name]])
+                            for name in head_columns
+                        })
+
+            # Completar velas desde a última execução
+            open_klines = self.sync_klines(symbol, interval)
+
+            columns = self.store.load(symbol, interval)
+            start_index = int(np.searchsorted(columns['timestamp'], start_time))
+            series = CandleSeries.concat([
+                CandleSeries(columns)[start_index:],
+                self._format_klines(open_klines)
+            ])
+
+            print(f"✅ {len(series)} velas disponíveis ({self.store.count(symbol, interval)} em disco)")
             self.cache['last_update'] = time.time()
-            
-            return self._format_klines(all_klines)
-            
+
+            return series
+
         except Exception as e:
             print(f"Erro ao obter dados históricos: {e}")
-            return []
-    
-    def get_latest_klines(self, limit=100):
+            return CandleSeries.empty()
+
+    def get_latest_klines(self, limit=100, symbol=None, interval=None):
         """Obtém as últimas N velas"""
+        symbol = symbol or self.symbol
+        interval = interval or self.interval
         try:
-            url = f"{self.base_url}/klines"
+            last = self.store.last_timestamp(symbol, interval)
+
+            if last is not None:
+                # Só baixar as velas novas desde a última gravada
+                open_klines = self.sync_klines(symbol, interval)
+                columns = self.store.load(symbol, interval)
+                start_index = max(0, len(columns['timestamp']) - (limit - len(open_klines)))
+                series = CandleSeries.concat([
+                    CandleSeries(columns)[start_index:],
+                    self._format_klines(open_klines)
+                ])
+
+                if len(series) >= limit:
+                    return series[-limit:]
+
             params = {
-                'symbol': self.symbol,
-                'interval': self.interval,
+                'symbol': symbol,
+                'interval': interval,
                 'limit': limit
             }
-            
-            response = requests.get(url, params=params, timeout=5)
-            
-            if response.status_code == 200:
-                klines = response.json()
-                return self._format_klines(klines)
-            else:
-                return []
-                
+
+            klines = self.http.get('klines', params, weight=self._klines_weight(limit), timeout=5)
+            if last is None:
+                self._store_closed(symbol, interval, klines)
+            return self._format_klines(klines)
+
         except Exception as e:
             print(f"Erro ao obter últimas velas: {e}")
-            return []
-    
+            return CandleSeries.empty()
+
+    def append_candle(self, symbol, interval, candle):
+        """
+        Grava uma vela fechada vinda do stream/agregador
+        Só grava se ela continua o histórico em disco (buracos ficam para sync_klines)
+        """
+        last = self.store.last_timestamp(symbol, interval)
+        if last is not None and candle['timestamp'] != last + INTERVAL_MS[interval]:
+            return False
+
+        self.store.append(symbol, interval, {
+            name: np.array([candle[name]], dtype=dtype) for name, dtype in COLUMNS
+        })
+        return True
+
+    def get_aggregator(self, symbol=None):
+        """
+        Agregador de velas do símbolo (criado e alimentado com o histórico de 1m na primeira vez)
+        Velas maiores completas também são gravadas no armazenamento local
+        """
+        symbol = symbol or self.symbol
+        aggregator = self.aggregators.get(symbol)
+
+        if aggregator is None:
+            intervals = [i for i in self.intervals if i != self.base_interval]
+            for interval in ('5m', '15m', '1h'):
+                if interval not in intervals:
+                    intervals.append(interval)
+
+            aggregator = CandleAggregator(self.base_interval, intervals)
+            aggregator.on_close(
+                lambda interval, candle, complete: complete and self.append_candle(symbol, interval, candle)
+            )
+
+            base = self.get_latest_klines(limit=1000, symbol=symbol, interval=self.base_interval)
+            now_ms = int(time.time() * 1000)
+            closed = base['close_time'] < now_ms if len(base) else np.zeros(0, dtype=bool)
+            aggregator.seed(base[:int(closed.sum())])
+            for candle in base[int(closed.sum()):]:
+                aggregator.update(candle, closed=False)
+
+            self.aggregators[symbol] = aggregator
+
+        return aggregator
+
+    def _feed_aggregator(self, symbol):
+        """Sem stream: busca (via REST) só as velas de 1m novas e alimenta o agregador"""
+        aggregator = self.get_aggregator(symbol)
+        now_ms = int(time.time() * 1000)
+        missing = (now_ms - (aggregator.last_timestamp or now_ms)) // INTERVAL_MS[self.base_interval]
+        base = self.get_latest_klines(limit=int(min(1000, max(2, missing + 1))),
+                                      symbol=symbol, interval=self.base_interval)
+
+        for candle in base:
+            aggregator.update(candle, closed=candle['close_time'] < now_ms)
+
+    def get_aggregated_klines(self, interval, limit=100, symbol=None):
+        """Velas de `interval` montadas localmente a partir das velas de 1m"""
+        symbol = symbol or self.symbol
+        streaming = symbol == self.symbol and self.stream is not None and self.stream.is_alive()
+
+        if not streaming:
+            self._feed_aggregator(symbol)
+
+        return self.get_aggregator(symbol).series(interval)[-limit:]
+
+    def get_recent_candles(self, limit=2, symbol=None, interval=None):
+        """
+        Últimas velas (fechadas + em andamento) para atualizar janelas em memória
+        Com o stream ativo vem do agregador (sem REST); senão, de get_latest_klines
+        """
+        symbol = symbol or self.symbol
+        interval = interval or self.interval
+        streaming = symbol == self.symbol and self.stream is not None and self.stream.is_alive()
+
+        if streaming and interval != self.base_interval:
+            return self.get_aggregator(symbol).tail(interval, limit)
+
+        return self.get_latest_klines(limit=limit, symbol=symbol, interval=interval)
+
     def _format_klines(self, klines):
-        """Formata velas para um formato mais amigável"""
-        formatted = []
-        for k in klines:
-            formatted.append({
-                'timestamp': k[0],
-                'open': float(k[1]),
-                'high': float(k[2]),
-                'low': float(k[3]),
-                'close': float(k[4]),
-                'volume': float(k[5]),
-                'close_time': k[6],
-                'quote_volume': float(k[7]),
-                'trades': k[8]
-            })
-        return formatted
-    
-    def calculate_price_change(self, klines, minutes):
+        """Converte velas cruas da Binance em CandleSeries (colunas NumPy)"""
+        return CandleSeries.from_raw(klines)
+
+    def calculate_price_change(self, klines, minutes, interval=None):
         """Calcula variação percentual nos últimos X minutos"""
         if not klines or len(klines) < 2:
             return 0.0
-        
+
         try:
-            # Número de velas necessárias (5min cada)
-            num_candles = max(1, minutes // 5)
-            
+            # Número de velas necessárias (cada vela tem a duração do intervalo)
+            interval_minutes = INTERVAL_MS[interval or self.interval] // 60_000
+            num_candles = max(1, minutes // interval_minutes)
+
             if len(klines) <= num_candles:
                 num_candles = len(klines) - 1
-            
+
             # Preço atual (última vela)
             current_price = klines[-1]['close']
-            
+
             # Preço há X minutos
             past_price = klines[-(num_candles + 1)]['close']
-            
+
             if past_price == 0:
                 return 0.0
-            
+
             change_percent = ((current_price - past_price) / past_price) * 100
             return round(change_percent, 2)
-            
+
         except Exception as e:
             print(f"Erro ao calcular variação: {e}")
             return 0.0
-    
-    def get_market_data(self):
-        """Retorna todos os dados de mercado atualizados"""
+
+    def start_stream(self, stream_url=None):
+        """
+        Liga o modo streaming: preço, variação 24h e vela atual chegam via WebSocket
+        Se o stream cair, get_market_data volta a usar REST até reconectar
+        """
+        if not WEBSOCKET_AVAILABLE:
+            print("⚠️  simple-websocket não instalado. Usando apenas REST.")
+            return None
+
+        if self.stream is None:
+            self.get_aggregator(self.symbol)
+            self.stream = MarketStream(self, stream_url=stream_url)
+            self.stream.start(seed_klines=self.get_latest_klines(limit=self.stream.max_klines,
+                                                                 interval=self.base_interval))
+
+        return self.stream
+
+    def stop_stream(self):
+        """Desliga o modo streaming"""
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream = None
+
+    def get_market_data(self, symbol=None):
+        """
+        Retorna todos os dados de mercado atualizados
+        As variações de 5/15 min usam velas de 1m (minutos exatos)
+        """
+        symbol = symbol or self.symbol
+        base = self.base_interval
         try:
+            if symbol == self.symbol and self.stream is not None and self.stream.is_alive():
+                # Dados em memória vindos do WebSocket (sem requisições REST)
+                state = self.stream.snapshot()
+                if state['price']:
+                    self.cache['current_price'] = state['price']
+
+                return {
+                    'price': state['price'],
+                    'change_24h': state['change_24h'],
+                    'change_15min': self.calculate_price_change(state['klines'], 15, base),
+                    'change_5min': self.calculate_price_change(state['klines'], 5, base),
+                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                }
+
             # Obter preço atual
-            current_price = self.get_current_price()
-            
+            current_price = self.get_current_price(symbol)
+
             # Obter variação 24h
-            change_24h = self.get_24h_change()
-            
+            change_24h = self.get_24h_change(symbol)
+
             # Obter últimas velas para calcular variações
-            latest_klines = self.get_latest_klines(limit=20)
-            
+            latest_klines = self.get_latest_klines(limit=20, symbol=symbol, interval=base)
+
             # Calcular variações
-            change_15min = self.calculate_price_change(latest_klines, 15)
-            change_5min = self.calculate_price_change(latest_klines, 5)
-            
+            change_15min = self.calculate_price_change(latest_klines, 15, base)
+            change_5min = self.calculate_price_change(latest_klines, 5, base)
+
             return {
                 'price': current_price,
                 'change_24h': change_24h,
@@ -203,7 +856,7 @@ class BinanceDataProvider:
                 'change_5min': change_5min,
                 'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
-            
+
         except Exception as e:
             print(f"Erro ao obter dados de mercado: {e}")
             return {
@@ -214,6 +867,61 @@ class BinanceDataProvider:
                 'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
 
+    def get_all_market_data(self):
+        """Dados de mercado de todos os símbolos (tickers em uma única requisição)"""
+        try:
+            self.refresh_tickers()
+        except Exception as e:
+            print(f"Erro ao atualizar tickers: {e}")
+
+        return {symbol: self.get_market_data(symbol) for symbol in list(self.symbols)}
+
+    def get_watchlist_arrays(self, limit=100, interval=None, fields=('open', 'high', 'low', 'close', 'volume')):
+        """
+        Últimas N velas de todos os símbolos alinhadas em arrays 2-D (símbolos × tempo)
+        para os kernels de indicators.py -> (símbolos, timestamps, colunas)
+        """
+        interval = interval or self.interval
+        series_by_symbol = {}
+        for symbol in list(self.symbols):
+            klines = self.get_latest_klines(limit, symbol, interval)
+            if len(klines):
+                series_by_symbol[symbol] = klines
+
+        return indicators.stack_series(series_by_symbol, fields, length=limit)
+
+
+class SymbolView:
+    """
+    Visão de um símbolo/intervalo do BinanceDataProvider
+    Mesma interface (e assinaturas) do provedor de um símbolo só
+    """
+    def __init__(self, provider, symbol, interval):
+        self.provider = provider
+        self.symbol = symbol
+        self.interval = interval
+
+    def get_current_price(self):
+        return self.provider.get_current_price(self.symbol)
+
+    def get_24h_change(self):
+        return self.provider.get_24h_change(self.symbol)
+
+    def get_historical_klines(self, days=30):
+        return self.provider.get_historical_klines(days, self.symbol, self.interval)
+
+    def get_latest_klines(self, limit=100):
+        return self.provider.get_latest_klines(limit, self.symbol, self.interval)
+
+    def calculate_price_change(self, klines, minutes):
+        return self.provider.calculate_price_change(klines, minutes, self.interval)
+
+    def get_aggregated_klines(self, interval, limit=100):
+        return self.provider.get_aggregated_klines(interval, limit, self.symbol)
+
+    def get_market_data(self):
+        return self.provider.get_market_data(self.symbol)
+
 
 # Instância global - USA FUTURES/PERPETUAL
 data_provider = BinanceDataProvider(use_futures=True)
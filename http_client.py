@@ -0,0 +1,189 @@
+"""
+HTTP Client - Sessão HTTP compartilhada para a API REST da Binance
+
+- Conexões keep-alive reaproveitadas (pool de conexões)
+- Contabiliza o peso usado (header X-MBX-USED-WEIGHT-1M) e espera a virada
+  do minuto antes de estourar o limite
+- Repete 418/429/5xx, erros de conexão e respostas que não são JSON com
+  backoff exponencial + jitter
+- Guarda latência e erros por endpoint
+"""
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class BinanceAPIError(Exception):
+    """Erro retornado pela API (depois de esgotar as tentativas)"""
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class BinanceHTTPClient:
+    def __init__(self, base_url, weight_limit=2400, safety_margin=0.9, max_retries=4,
+                 backoff_base=0.5, backoff_max=30, timeout=10, pool_size=10):
+        """
+        weight_limit: peso máximo por minuto (Futures: 2400, Spot: 6000)
+        safety_margin: fração do limite que usamos antes de pausar
+        """
+        self.base_url = base_url.rstrip('/')
+        self.weight_limit = weight_limit
+        self.safety_margin = safety_margin
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.used_weight = 0
+        self.weight_minute = 0
+        self.banned_until = 0
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def _current_minute(self):
+        return int(time.time() // 60)
+
+    def _reserve_weight(self, weight):
+        """Reserva peso no minuto atual; espera a virada do minuto se não couber"""
+        while True:
+            with self._lock:
+                now = time.time()
+                minute = int(now // 60)
+
+                if minute != self.weight_minute:
+                    self.weight_minute = minute
+                    self.used_weight = 0
+
+                if now < self.banned_until:
+                    wait = self.banned_until - now
+                elif self.used_weight + weight <= self.weight_limit * self.safety_margin:
+                    self.used_weight += weight
+                    return
+                else:
+                    wait = (minute + 1) * 60 - now
+
+            time.sleep(wait + 0.05)
+
+    def _update_weight(self, response):
+        """Sincroniza o peso usado com o valor informado pela Binance"""
+        header = response.headers.get('X-MBX-USED-WEIGHT-1M') or response.headers.get('X-MBX-USED-WEIGHT')
+        if header is None:
+            return
+
+        with self._lock:
+            minute = self._current_minute()
+            if minute != self.weight_minute:
+                self.weight_minute = minute
+                self.used_weight = 0
+            self.used_weight = max(self.used_weight, int(header))
+
+    def _record(self, endpoint, latency=None, error=False, retry=False):
+        """Atualiza contadores do endpoint"""
+        with self._lock:
+            stats = self.stats.setdefault(endpoint, {
+                'requests': 0,
+                'errors': 0,
+                'retries': 0,
+                'total_latency': 0.0,
+                'max_latency': 0.0
+            })
+            if latency is not None:
+                stats['requests'] += 1
+                stats['total_latency'] += latency
+                stats['max_latency'] = max(stats['max_latency'], latency)
+            if error:
+                stats['errors'] += 1
+            if retry:
+                stats['retries'] += 1
+
+    def _backoff(self, attempt):
+        """Backoff exponencial com jitter total"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def get(self, path, params=None, weight=1, timeout=None):
+        """
+        GET em base_url + path, retorna o JSON
+        Lança BinanceAPIError se a requisição falhar depois das tentativas
+        """
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        endpoint = '/' + path.lstrip('/')
+        last_error = None
+
+        for attempt in range(self.max_retries + 1):
+            self._reserve_weight(weight)
+
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, timeout=timeout or self.timeout)
+            except requests.RequestException as e:
+                self._record(endpoint, time.perf_counter() - start, error=True)
+                last_error = BinanceAPIError(f"Erro de conexão em {endpoint}: {e}")
+                if attempt < self.max_retries:
+                    self._record(endpoint, retry=True)
+                    time.sleep(self._backoff(attempt))
+                continue
+
+            latency = time.perf_counter() - start
+            self._update_weight(response)
+
+            if response.status_code == 200:
+                try:
+                    data = response.json()
+                except ValueError as e:
+                    # Corpo truncado/inválido (ex: proxy no meio): tratar como falha temporária
+                    self._record(endpoint, latency, error=True)
+                    last_error = BinanceAPIError(f"Resposta inválida em {endpoint}: {e}", response.status_code)
+                    if attempt < self.max_retries:
+                        self._record(endpoint, retry=True)
+                        time.sleep(self._backoff(attempt))
+                    continue
+                self._record(endpoint, latency)
+                return data
+
+            self._record(endpoint, latency, error=True)
+            last_error = BinanceAPIError(f"HTTP {response.status_code} em {endpoint}", response.status_code)
+
+            if response.status_code in (418, 429):
+                # Rate limit (429) ou IP banido (418): respeitar Retry-After
+                # A espera fica só em banned_until: _reserve_weight segura esta e as outras threads
+                retry_after = float(response.headers.get('Retry-After', 0) or 0)
+                with self._lock:
+                    self.banned_until = max(self.banned_until,
+                                            time.time() + max(retry_after, self._backoff(attempt)))
+                wait = 0
+            elif response.status_code >= 500:
+                wait = self._backoff(attempt)
+            else:
+                # Erros 4xx (parâmetros inválidos etc.) não adianta repetir
+                raise last_error
+
+            if attempt < self.max_retries:
+                self._record(endpoint, retry=True)
+                if wait:
+                    time.sleep(wait)
+
+        raise last_error
+
+    def get_stats(self):
+        """Contadores por endpoint + peso usado no minuto atual"""
+        with self._lock:
+            endpoints = {}
+            for endpoint, stats in self.stats.items():
+                endpoints[endpoint] = dict(stats)
+                endpoints[endpoint]['avg_latency'] = (
+                    stats['total_latency'] / stats['requests'] if stats['requests'] else 0.0
+                )
+
+            return {
+                'used_weight': self.used_weight if self.weight_minute == self._current_minute() else 0,
+                'weight_limit': self.weight_limit,
+                'endpoints': endpoints
+            }
@@ -0,0 +1,261 @@
+"""
+Indicators - Kernels vetorizados de indicadores técnicos
+
+Todas as funções recebem arrays 1-D (um ativo) ou 2-D (ativos × tempo) e
+calculam ao longo do último eixo. Uma chamada processa a watchlist inteira,
+então o custo cresce com o tamanho dos arrays, não com o número de ativos.
+As saídas têm o mesmo formato da entrada, com NaN onde ainda não há dados.
+"""
+from functools import reduce
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Tamanho dos blocos da recorrência linear (EMA/Wilder)
+CHUNK_SIZE = 64
+
+
+def _as_2d(values):
+    """Retorna (array 2-D float64, era_1d)"""
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        return values[np.newaxis, :], True
+    return values, False
+
+
+def _restore(result, was_1d):
+    return result[0] if was_1d else result
+
+
+def _first_valid(values):
+    """Primeira coluna sem NaN em nenhuma linha (len se não houver)"""
+    valid = ~np.isnan(values).any(axis=0)
+    return int(valid.argmax()) if valid.any() else values.shape[1]
+
+
+def _rolling(ufunc, values, window):
+    """Máxima/mínima móvel: combina `window` fatias deslocadas (sem loop por elemento)"""
+    size = values.shape[-1] - window + 1
+    result = values[..., :size].copy()
+    for offset in range(1, window):
+        ufunc(result, values[..., offset:offset + size], out=result)
+    return result
+
+
+def _linear_recurrence(values, alpha, initial, out):
+    """
+    out[:, t] = (1 - alpha) * out[:, t-1] + alpha * values[:, t], partindo de `initial`
+
+    Resolve a recorrência em blocos de CHUNK_SIZE com uma multiplicação de
+    matrizes por bloco (a matriz de decaimento é triangular inferior)
+    """
+    decay = 1 - alpha
+    steps = np.arange(CHUNK_SIZE)
+    lags = np.maximum(steps[:, np.newaxis] - steps[np.newaxis, :], 0)
+    weights = np.tril(alpha * decay ** lags)       # peso de values[j] em out[i]
+    carry = decay ** (steps + 1)                    # peso do valor anterior ao bloco
+
+    previous = initial
+    for start in range(0, values.shape[1], CHUNK_SIZE):
+        chunk = values[:, start:start + CHUNK_SIZE]
+        n = chunk.shape[1]
+        block = chunk @ weights[:n, :n].T + previous[:, np.newaxis] * carry[:n]
+        out[:, start:start + n] = block
+        previous = block[:, -1]
+    return out
+
+
+def _smooth(values, period, alpha):
+    """Suavização exponencial semeada com a SMA dos primeiros `period` valores válidos"""
+    values, was_1d = _as_2d(values)
+    result = np.full(values.shape, np.nan)
+
+    start = _first_valid(values)
+    seed_at = start + period - 1
+    if seed_at >= values.shape[1]:
+        return _restore(result, was_1d)
+
+    result[:, seed_at] = values[:, start:seed_at + 1].mean(axis=1)
+    _linear_recurrence(values[:, seed_at + 1:], alpha, result[:, seed_at], result[:, seed_at + 1:])
+    return _restore(result, was_1d)
+
+
+def sma(values, period):
+    """Média móvel simples"""
+    values, was_1d = _as_2d(values)
+    result = np.full(values.shape, np.nan)
+    if values.shape[1] >= period:
+        result[:, period - 1:] = sliding_window_view(values, period, axis=-1).mean(axis=-1)
+    return _restore(result, was_1d)
+
+
+def ema(values, period):
+    """Média móvel exponencial (alpha = 2 / (period + 1)), semeada com SMA"""
+    return _smooth(values, period, 2 / (period + 1))
+
+
+def wilder(values, period):
+    """Suavização de Wilder (alpha = 1 / period), semeada com SMA"""
+    return _smooth(values, period, 1 / period)
+
+
+def rolling_max(values, period):
+    values, was_1d = _as_2d(values)
+    result = np.full(values.shape, np.nan)
+    if values.shape[1] >= period:
+        result[:, period - 1:] = _rolling(np.maximum, values, period)
+    return _restore(result, was_1d)
+
+
+def rolling_min(values, period):
+    values, was_1d = _as_2d(values)
+    result = np.full(values.shape, np.nan)
+    if values.shape[1] >= period:
+        result[:, period - 1:] = _rolling(np.minimum, values, period)
+    return _restore(result, was_1d)
+
+
+def _gains_losses(closes):
+    deltas = np.diff(closes, axis=-1)
+    return np.where(deltas > 0, deltas, 0), np.where(deltas < 0, -deltas, 0)
+
+
+def _rsi_from_averages(avg_gain, avg_loss):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = avg_gain / avg_loss
+        return np.where(avg_loss == 0, 100.0, 100 - (100 / (1 + rs)))
+
+
+def rsi(closes, period=14):
+    """RSI com suavização de Wilder sobre todo o histórico (como calculate_rsi)"""
+    closes, was_1d = _as_2d(closes)
+    result = np.full(closes.shape, np.nan)
+    if closes.shape[1] < period + 1:
+        return _restore(result, was_1d)
+
+    gains, losses = _gains_losses(closes)
+    result[:, 1:] = _rsi_from_averages(wilder(gains, period), wilder(losses, period))
+    return _restore(result, was_1d)
+
+
+def window_rsi(closes, period=14):
+    """RSI de cada ponto sobre os últimos `period` deltas (base do Stoch RSI do analyzer)"""
+    closes, was_1d = _as_2d(closes)
+    result = np.full(closes.shape, np.nan)
+    if closes.shape[1] < period + 1:
+        return _restore(result, was_1d)
+
+    gains, losses = _gains_losses(closes)
+    avg_gain = sliding_window_view(gains, period, axis=-1).mean(axis=-1)
+    avg_loss = sliding_window_view(losses, period, axis=-1).mean(axis=-1)
+    result[:, period:] = _rsi_from_averages(avg_gain, avg_loss)
+    return _restore(result, was_1d)
+
+
+def oscillator(values, highest, lowest):
+    """(valor - mínima) / (máxima - mínima) * 100, 50 se a faixa for zero"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(highest == lowest, 50.0, (values - lowest) / (highest - lowest) * 100)
+
+
+def stoch_rsi(closes, rsi_period=14, stoch_period=14, k_smooth=3, d_smooth=3):
+    """Stochastic RSI -> (rsi, stoch_rsi, k, d)"""
+    rsi_values = window_rsi(closes, rsi_period)
+    stoch = oscillator(rsi_values, rolling_max(rsi_values, stoch_period), rolling_min(rsi_values, stoch_period))
+    k = sma(stoch, k_smooth)
+    d = sma(k, d_smooth)
+    return rsi_values, stoch, k, d
+
+
+def stochastic(highs, lows, closes, period=14, k_smooth=3, d_smooth=3):
+    """Stochastic Oscillator -> (k, d)"""
+    raw_k = oscillator(np.asarray(closes, dtype=np.float64), rolling_max(highs, period), rolling_min(lows, period))
+    k = sma(raw_k, k_smooth)
+    return k, sma(k, d_smooth)
+
+
+def true_range(highs, lows, closes):
+    highs, was_1d = _as_2d(highs)
+    lows, _ = _as_2d(lows)
+    closes, _ = _as_2d(closes)
+
+    result = highs - lows
+    previous = closes[:, :-1]
+    result[:, 1:] = np.maximum.reduce([
+        result[:, 1:],
+        np.abs(highs[:, 1:] - previous),
+        np.abs(lows[:, 1:] - previous),
+    ])
+    return _restore(result, was_1d)
+
+
+def atr(highs, lows, closes, period=14):
+    """Average True Range (Wilder)"""
+    return wilder(true_range(highs, lows, closes), period)
+
+
+def macd(closes, fast=12, slow=26, signal=9):
+    """MACD -> (macd, sinal, histograma)"""
+    line = ema(closes, fast) - ema(closes, slow)
+    signal_line = ema(line, signal)
+    return line, signal_line, line - signal_line
+
+
+def bollinger(closes, period=20, num_std=2):
+    """Bandas de Bollinger -> (superior, média, inferior), desvio padrão populacional"""
+    closes, was_1d = _as_2d(closes)
+    middle = np.full(closes.shape, np.nan)
+    std = np.full(closes.shape, np.nan)
+    if closes.shape[1] >= period:
+        windows = sliding_window_view(closes, period, axis=-1)
+        middle[:, period - 1:] = windows.mean(axis=-1)
+        std[:, period - 1:] = windows.std(axis=-1)
+
+    upper = middle + num_std * std
+    lower = middle - num_std * std
+    return _restore(upper, was_1d), _restore(middle, was_1d), _restore(lower, was_1d)
+
+
+def stack_series(series_by_symbol, fields=('open', 'high', 'low', 'close', 'volume'), length=None):
+    """
+    Alinha várias CandleSeries pelo timestamp e empilha as colunas em 2-D
+    series_by_symbol: dict símbolo -> CandleSeries
+    Retorna (símbolos, timestamps, dict campo -> array símbolos × tempo)
+    """
+    symbols = list(series_by_symbol)
+    if not symbols:
+        return [], np.empty(0, dtype=np.int64), {name: np.empty((0, 0)) for name in fields}
+
+    # Só os timestamps presentes em todos os ativos
+    timestamps = reduce(np.intersect1d, (series_by_symbol[s]['timestamp'] for s in symbols))
+    if length is not None:
+        timestamps = timestamps[-length:]
+
+    columns = {name: np.empty((len(symbols), len(timestamps))) for name in fields}
+    for row, symbol in enumerate(symbols):
+        series = series_by_symbol[symbol]
+        index = np.searchsorted(series['timestamp'], timestamps)
+        for name in fields:
+            columns[name][row] = series[name][index]
+
+    return symbols, timestamps, columns
+
+
+if __name__ == '__main__':
+    import time
+
+    print("🧪 Testando kernels de indicadores...\n")
+
+    rng = np.random.default_rng(0)
+    closes = 100 + np.cumsum(rng.normal(0, 1, (50, 2000)), axis=1)
+    highs = closes + rng.random(closes.shape)
+    lows = closes - rng.random(closes.shape)
+
+    start = time.perf_counter()
+    rsi(closes)
+    stoch_rsi(closes, 15, 5, 3, 3)
+    macd(closes)
+    bollinger(closes)
+    atr(highs, lows, closes)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    print(f"📊 {closes.shape[0]} ativos × {closes.shape[1]} velas: {elapsed:.1f} ms")
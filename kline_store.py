@@ -0,0 +1,227 @@
+"""
+Kline Store - Armazena velas localmente em disco (colunar, append-only)
+
+Cada par símbolo+intervalo vira uma pasta com um arquivo binário por coluna
+(ex: data/klines/BTCUSDT_5m/close.f8). Os arquivos são lidos via np.memmap,
+então abrir 30 dias de velas custa só alguns milissegundos de I/O.
+"""
+import os
+import shutil
+import threading
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STORE_DIR = os.path.join(BASE_DIR, 'data', 'klines')
+
+# Colunas armazenadas (mesma ordem do retorno /klines da Binance)
+COLUMNS = (
+    ('timestamp', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8'),
+    ('close_time', '<i8'),
+    ('quote_volume', '<f8'),
+    ('trades', '<i8'),
+)
+
+# Timestamp da primeira vela existente na corretora (símbolo listado depois do início pedido)
+LISTING_FILE = 'listing.i8'
+
+# Duração de cada intervalo em milissegundos
+INTERVAL_MS = {
+    '1m': 60_000,
+    '3m': 3 * 60_000,
+    '5m': 5 * 60_000,
+    '15m': 15 * 60_000,
+    '30m': 30 * 60_000,
+    '1h': 60 * 60_000,
+    '2h': 2 * 60 * 60_000,
+    '4h': 4 * 60 * 60_000,
+    '1d': 24 * 60 * 60_000,
+}
+
+
+def raw_to_columns(klines):
+    """Converte velas cruas da Binance (listas de strings) em colunas NumPy"""
+    columns = {}
+    for i, (name, dtype) in enumerate(COLUMNS):
+        if dtype == '<i8':
+            columns[name] = np.array([int(k[i]) for k in klines], dtype=dtype)
+        else:
+            columns[name] = np.array([float(k[i]) for k in klines], dtype=dtype)
+    return columns
+
+
+def empty_columns():
+    """Colunas vazias com os tipos corretos"""
+    return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS}
+
+
+class KlineStore:
+    def __init__(self, base_dir=None):
+        self.base_dir = base_dir or DEFAULT_STORE_DIR
+        self._lock = threading.Lock()
+
+    def _dir(self, symbol, interval):
+        return os.path.join(self.base_dir, f"{symbol}_{interval}")
+
+    def _file(self, symbol, interval, name, dtype):
+        return os.path.join(self._dir(symbol, interval), f"{name}.{dtype[1:]}")
+
+    def _recover(self, symbol, interval):
+        """Troca de geração interrompida (ver replace): volta para a geração completa"""
+        directory = self._dir(symbol, interval)
+        old_dir = directory + '.old'
+        if not os.path.exists(old_dir):
+            return
+        if os.path.exists(directory):
+            shutil.rmtree(old_dir, ignore_errors=True)
+        else:
+            os.rename(old_dir, directory)
+
+    def _length(self, symbol, interval):
+        """
+        Número de velas completas gravadas
+        Se uma escrita foi interrompida, as colunas maiores são truncadas
+        """
+        self._recover(symbol, interval)
+        sizes = []
+        for name, dtype in COLUMNS:
+            path = self._file(symbol, interval, name, dtype)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            sizes.append((path, size, np.dtype(dtype).itemsize))
+
+        length = min(size // itemsize for _, size, itemsize in sizes)
+
+        for path, size, itemsize in sizes:
+            if size > length * itemsize:
+                with open(path, 'r+b') as f:
+                    f.truncate(length * itemsize)
+
+        return length
+
+    def load(self, symbol, interval):
+        """Retorna as colunas gravadas (memmap somente leitura)"""
+        with self._lock:
+            length = self._length(symbol, interval)
+            if length == 0:
+                return empty_columns()
+
+            return {
+                name: np.memmap(self._file(symbol, interval, name, dtype),
+                                dtype=dtype, mode='r', shape=(length,))
+                for name, dtype in COLUMNS
+            }
+
+    def count(self, symbol, interval):
+        """Quantidade de velas gravadas"""
+        with self._lock:
+            return self._length(symbol, interval)
+
+    def last_timestamp(self, symbol, interval):
+        """Timestamp de abertura da última vela gravada (None se vazio)"""
+        with self._lock:
+            length = self._length(symbol, interval)
+            if length == 0:
+                return None
+
+            path = self._file(symbol, interval, 'timestamp', '<i8')
+            with open(path, 'rb') as f:
+                f.seek((length - 1) * 8)
+                return int(np.frombuffer(f.read(8), dtype='<i8')[0])
+
+    def first_timestamp(self, symbol, interval):
+        """Timestamp de abertura da primeira vela gravada (None se vazio)"""
+        with self._lock:
+            if self._length(symbol, interval) == 0:
+                return None
+
+            path = self._file(symbol, interval, 'timestamp', '<i8')
+            with open(path, 'rb') as f:
+                return int(np.frombuffer(f.read(8), dtype='<i8')[0])
+
+    def listing_time(self, symbol, interval):
+        """Primeira vela existente na corretora (None se desconhecida), ver set_listing_time"""
+        path = os.path.join(self._dir(symbol, interval), LISTING_FILE)
+        with self._lock:
+            self._recover(symbol, interval)
+            if not os.path.exists(path) or os.path.getsize(path) < 8:
+                return None
+            with open(path, 'rb') as f:
+                return int(np.frombuffer(f.read(8), dtype='<i8')[0])
+
+    def set_listing_time(self, symbol, interval, timestamp):
+        """Grava o início do histórico na corretora (antes dele não há velas para baixar)"""
+        with self._lock:
+            os.makedirs(self._dir(symbol, interval), exist_ok=True)
+            path = os.path.join(self._dir(symbol, interval), LISTING_FILE)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(np.array([timestamp], dtype='<i8').tobytes())
+            os.replace(tmp_path, path)
+
+    def append(self, symbol, interval, columns):
+        """
+        Acrescenta velas FECHADAS ao final do arquivo
+        Velas com timestamp <= último gravado são ignoradas (sem duplicatas)
+        Retorna quantas velas foram gravadas
+        """
+        timestamps = np.asarray(columns['timestamp'], dtype='<i8')
+        if len(timestamps) == 0:
+            return 0
+
+        with self._lock:
+            os.makedirs(self._dir(symbol, interval), exist_ok=True)
+            length = self._length(symbol, interval)
+
+            mask = np.ones(len(timestamps), dtype=bool)
+            if length > 0:
+                path = self._file(symbol, interval, 'timestamp', '<i8')
+                with open(path, 'rb') as f:
+                    f.seek((length - 1) * 8)
+                    last = int(np.frombuffer(f.read(8), dtype='<i8')[0])
+                mask &= timestamps > last
+
+            # Garantir ordem crescente e sem repetições dentro do próprio lote
+            mask[1:] &= timestamps[1:] > timestamps[:-1]
+
+            count = int(mask.sum())
+            if count == 0:
+                return 0
+
+            for name, dtype in COLUMNS:
+                data = np.asarray(columns[name], dtype=dtype)[mask]
+                with open(self._file(symbol, interval, name, dtype), 'ab') as f:
+                    f.write(data.tobytes())
+
+            return count
+
+    def replace(self, symbol, interval, columns):
+        """
+        Reescreve todo o armazenamento (usado para preencher o início do histórico)
+        A geração nova é gravada em uma pasta temporária e trocada pela atual de uma
+        vez: uma queda no meio deixa a geração antiga ou a nova, nunca colunas misturadas
+        """
+        with self._lock:
+            self._recover(symbol, interval)
+            directory = self._dir(symbol, interval)
+            tmp_dir = directory + '.tmp'
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+
+            for name, dtype in COLUMNS:
+                with open(os.path.join(tmp_dir, f"{name}.{dtype[1:]}"), 'wb') as f:
+                    f.write(np.asarray(columns[name], dtype=dtype).tobytes())
+
+            listing = os.path.join(directory, LISTING_FILE)
+            if os.path.exists(listing):
+                shutil.copy2(listing, tmp_dir)
+
+            # Pasta atual -> .old, nova -> atual; entre as duas trocas _recover restaura a antiga
+            if os.path.exists(directory):
+                os.rename(directory, directory + '.old')
+            os.rename(tmp_dir, directory)
+            shutil.rmtree(directory + '.old', ignore_errors=True)
+
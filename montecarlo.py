@@ -0,0 +1,166 @@
+"""
+Monte Carlo - Risco da sequência de trades (bootstrap/permutação vetorizados)
+
+Com 50x de alavancagem em uma conta de $35, a ordem dos trades decide se a
+conta sobrevive; as estatísticas do TradeSimulator não mostram isso. Aqui
+a lista de trades fechados é reamostrada em milhares de caminhos:
+- 'bootstrap': sorteio com reposição (mesmo número de trades);
+- 'permutation': os mesmos trades em outra ordem (P&L final igual, risco não).
+
+Cada bloco de caminhos é uma matriz (caminhos × trades): cumsum dá a curva
+de capital, e drawdown/ruína saem de operações ao longo do eixo dos trades.
+Ruína: capital abaixo do necessário para abrir um trade (investment_per_trade
+do TradeSimulator); depois dela o caminho fica parado, como o bot ficaria.
+"""
+import argparse
+import json
+import os
+import time
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TRADES_FILE = os.path.join(BASE_DIR, 'data', 'trades.json')
+
+# Elementos (caminhos × trades) por bloco: limita a memória a algumas dezenas de MB
+BLOCK_ELEMENTS = 2_000_000
+
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+
+
+def trade_pnls(trades):
+    """P&L em dólares dos trades fechados (Position, dicts do trades.json ou números)"""
+    pnls = []
+    for trade in trades:
+        if isinstance(trade, (int, float, np.floating)):
+            pnls.append(float(trade))
+        elif trade.get('status', 'closed') == 'closed':
+            pnls.append(float(trade['pnl_dollar']))
+    return np.array(pnls, dtype=np.float64)
+
+
+def path_statistics(samples, initial_capital=35.0, ruin_level=25.0):
+    """
+    Estatísticas de cada caminho (linhas de `samples`, P&L por trade)
+    Retorna (capital final, drawdown máximo $, drawdown máximo %, arruinado)
+    """
+    samples = np.asarray(samples, dtype=np.float64)
+    paths, length = samples.shape
+    equity = initial_capital + np.cumsum(samples, axis=1)
+
+    # Ruína: primeiro trade que deixa o capital abaixo do mínimo; depois dele o caminho para
+    below = equity < ruin_level
+    ruined = below.any(axis=1)
+    first = np.where(ruined, below.argmax(axis=1), length - 1)
+    frozen = equity[np.arange(paths), first]
+    equity = np.where(np.arange(length) > first[:, np.newaxis], frozen[:, np.newaxis], equity)
+
+    peaks = np.maximum(np.maximum.accumulate(equity, axis=1), initial_capital)
+    drawdowns = peaks - equity
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdown_percent = np.where(peaks > 0, drawdowns / peaks * 100, 100.0).max(axis=1)
+
+    return frozen, drawdowns.max(axis=1), drawdown_percent, ruined
+
+
+def simulate(pnls, paths=10_000, method='bootstrap', initial_capital=35.0, ruin_level=25.0,
+             length=None, seed=None):
+    """
+    Reamostra a sequência de trades em `paths` caminhos
+    length: trades por caminho (padrão: os mesmos da lista; só para bootstrap)
+    Retorna dict de arrays (um valor por caminho): final_capital, max_drawdown,
+    max_drawdown_percent, ruined
+    """
+    pnls = np.asarray(pnls, dtype=np.float64)
+    if not len(pnls):
+        raise ValueError("Nenhum trade fechado para simular")
+    if method not in ('bootstrap', 'permutation'):
+        raise ValueError(f"Método desconhecido: {method}")
+    if method == 'permutation' and length not in (None, len(pnls)):
+        raise ValueError("Permutação usa sempre todos os trades")
+
+    length = length or len(pnls)
+    rng = np.random.default_rng(seed)
+    block = max(1, BLOCK_ELEMENTS // length)
+
+    result = {
+        'final_capital': np.empty(paths),
+        'max_drawdown': np.empty(paths),
+        'max_drawdown_percent': np.empty(paths),
+        'ruined': np.empty(paths, dtype=bool),
+    }
+
+    for start in range(0, paths, block):
+        count = min(block, paths - start)
+        if method == 'bootstrap':
+            samples = pnls[rng.integers(0, len(pnls), (count, length))]
+        else:
+            samples = rng.permuted(np.broadcast_to(pnls, (count, length)), axis=1)
+
+        values = path_statistics(samples, initial_capital, ruin_level)
+        for name, value in zip(result, values):
+            result[name][start:start + count] = value
+
+    return result
+
+
+def summarize(result, percentiles=PERCENTILES):
+    """Distribuições (percentis e média) e probabilidade de ruína"""
+    summary = {'paths': len(result['ruined']), 'probability_of_ruin': float(result['ruined'].mean())}
+    for name in ('final_capital', 'max_drawdown', 'max_drawdown_percent'):
+        values = result[name]
+        summary[name] = {'mean': float(values.mean()),
+                         **{f"p{p}": float(v) for p, v in zip(percentiles, np.percentile(values, percentiles))}}
+    return summary
+
+
+def analyze(trades, paths=10_000, method='bootstrap', initial_capital=35.0, ruin_level=25.0,
+            length=None, seed=None):
+    """
+    Análise completa de uma lista de trades fechados
+    Inclui a sequência real ('observed') para comparar com a distribuição
+    """
+    started = time.perf_counter()
+    pnls = trade_pnls(trades)
+    summary = summarize(simulate(pnls, paths, method, initial_capital, ruin_level, length, seed))
+
+    final, drawdown, drawdown_percent, ruined = path_statistics(pnls[np.newaxis, :], initial_capital, ruin_level)
+    summary['observed'] = {
+        'final_capital': float(final[0]),
+        'max_drawdown': float(drawdown[0]),
+        'max_drawdown_percent': float(drawdown_percent[0]),
+        'ruined': bool(ruined[0]),
+    }
+    summary.update(trades=len(pnls), method=method, elapsed=round(time.perf_counter() - started, 3))
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Monte Carlo da sequência de trades')
+    parser.add_argument('--trades', default=TRADES_FILE, help='trades.json do bot')
+    parser.add_argument('--backtest', default=None, help='CSV/JSON de velas: usa os trades de um backtest')
+    parser.add_argument('--paths', type=int, default=100_000)
+    parser.add_argument('--method', default='bootstrap', choices=('bootstrap', 'permutation'))
+    parser.add_argument('--capital', type=float, default=35.0)
+    parser.add_argument('--ruin', type=float, default=25.0, help='Capital mínimo para abrir um trade')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.backtest:
+        from backtest import Backtester, load_candles
+        trades = Backtester(initial_capital=args.capital).run(load_candles(args.backtest))['trades']
+    else:
+        with open(args.trades, 'r') as f:
+            trades = json.load(f)
+
+    print(f"🎲 Monte Carlo ({args.method}): {args.paths} caminhos")
+    summary = analyze(trades, args.paths, args.method, args.capital, args.ruin, seed=args.seed)
+    observed = summary['observed']
+
+    print(f"\n📊 {summary['trades']} trades em {summary['elapsed']:.2f}s")
+    print(f"   Probabilidade de ruína: {summary['probability_of_ruin'] * 100:.1f}%")
+    for name, label in (('final_capital', 'Capital final'), ('max_drawdown', 'Drawdown máximo')):
+        stats = summary[name]
+        print(f"   {label}: p5=${stats['p5']:.2f} | p50=${stats['p50']:.2f} | p95=${stats['p95']:.2f} "
+              f"(real: ${observed[name]:.2f})")
+    print(f"   Drawdown %: p50={summary['max_drawdown_percent']['p50']:.1f}% | "
+          f"p95={summary['max_drawdown_percent']['p95']:.1f}%")
@@ -0,0 +1,356 @@
+"""
+Optimizer - Busca de parâmetros com backtests em paralelo (pool de processos)
+
+Cada job é um backtest: parâmetros do Stoch RSI, stop_loss_percent,
+alavancagem e investimento por trade, sobre uma janela de tempo.
+
+- As velas ficam em um bloco de multiprocessing.shared_memory; os workers
+  recebem só o nome do bloco e montam a CandleSeries como view (sem pickle
+  das velas por job).
+- Os sinais só dependem dos parâmetros da estratégia: cada worker os calcula
+  uma vez (Backtester.prepare) e reaproveita para todos os stops/alavancagens
+  e janelas. Os jobs saem agrupados por estratégia para aproveitar esse cache.
+- Cada resultado é gravado no CSV assim que chega (uma linha por job). Ao
+  rodar de novo com o mesmo arquivo, os jobs já gravados são pulados, então
+  uma busca interrompida continua de onde parou.
+- Ao lado do CSV fica a identidade da busca (<arquivo>.meta.json): hash das
+  velas e configurações do backtest. Sem arquivo explícito, o nome do CSV vem
+  desse hash (data/optimize/results-<hash>.csv): as mesmas velas retomam a
+  busca e velas novas (histórico ao vivo) começam outro arquivo. Um arquivo
+  explícito de outras velas ou outra configuração é recusado, em vez de
+  devolver resultados de outra busca.
+"""
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import time
+from datetime import datetime
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+
+from backtest import Backtester, load_candles
+from candles import CandleSeries, as_series
+from strategy import StochRSIStrategy
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESULTS_DIR = os.path.join(BASE_DIR, 'data', 'optimize')
+
+# Colunas da tabela de resultados: parâmetros do job (chave) + estatísticas
+PARAM_COLUMNS = ('rsi_period', 'stoch_period', 'k_smooth', 'd_smooth',
+                 'stop_loss_percent', 'leverage', 'investment_per_trade', 'start', 'end')
+RESULT_COLUMNS = ('total_trades', 'win_rate', 'total_pnl', 'total_pnl_percent', 'max_drawdown',
+                  'profit_factor', 'expectancy', 'current_capital', 'elapsed')
+
+# Sinais por estratégia guardados em cada worker
+PREPARED_CACHE_SIZE = 4
+
+
+class SharedCandles:
+    """
+    Colunas das velas copiadas para um único bloco de memória compartilhada
+    O processo que cria é dono do bloco (close() libera); os workers usam attach()
+    """
+
+    def __init__(self, candles):
+        series = as_series(candles)
+        self.length = len(series)
+        self.layout = []
+        offset = 0
+        for name, column in series.columns.items():
+            self.layout.append((name, column.dtype.str, offset))
+            offset += column.nbytes
+
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for name, dtype, start in self.layout:
+            view = np.ndarray(self.length, dtype=dtype, buffer=self.shm.buf, offset=start)
+            view[:] = series[name]
+
+    @property
+    def descriptor(self):
+        """O que vai para os workers (nome do bloco + layout, alguns bytes)"""
+        return self.shm.name, self.length, self.layout
+
+    @staticmethod
+    def attach(descriptor):
+        """Abre o bloco em outro processo -> (SharedMemory, CandleSeries com views)"""
+        name, length, layout = descriptor
+        shm = shared_memory.SharedMemory(name=name)
+        columns = {column: np.ndarray(length, dtype=dtype, buffer=shm.buf, offset=start)
+                   for column, dtype, start in layout}
+        return shm, CandleSeries(columns)
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def time_windows(series, count=1):
+    """Divide as velas em `count` janelas iguais -> [(timestamp inicial, timestamp final)]"""
+    timestamps = series['timestamp']
+    bounds = np.linspace(0, len(timestamps), count + 1).astype(int)
+    return [(int(timestamps[a]), int(timestamps[b - 1])) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def parameter_grid(rsi_periods, stoch_periods, k_smooths, d_smooths,
+                   stop_losses=(5.0,), leverages=(50,), investments=(25.0,), windows=((None, None),)):
+    """
+    Jobs da busca (tuplas na ordem de PARAM_COLUMNS), agrupados por estratégia
+    windows: [(timestamp inicial, timestamp final)], (None, None) = histórico inteiro
+    """
+    grid = itertools.product(rsi_periods, stoch_periods, k_smooths, d_smooths,
+                             stop_losses, leverages, investments, windows)
+    return [(int(r), int(s), int(k), int(d), float(stop), int(leverage), float(investment), *window)
+            for r, s, k, d, stop, leverage, investment, window in grid]
+
+
+def job_key(job):
+    """Chave do job como aparece no CSV (strings)"""
+    return tuple('' if value is None else str(value) for value in job[:len(PARAM_COLUMNS)])
+
+
+def dataset_fingerprint(series, settings):
+    """Identidade da busca: velas (tamanho, início/fim, hash) + configurações do backtest"""
+    digest = hashlib.sha1()
+    for name in ('timestamp', 'open', 'high', 'low', 'close'):
+        digest.update(np.ascontiguousarray(series[name]).tobytes())
+    timestamps = series['timestamp']
+    return {
+        'candles': len(series),
+        'first': int(timestamps[0]) if len(series) else None,
+        'last': int(timestamps[-1]) if len(series) else None,
+        'sha1': digest.hexdigest(),
+        **{name: list(value) if isinstance(value, tuple) else value for name, value in settings.items()},
+    }
+
+
+def fingerprint_path(fingerprint, directory=DEFAULT_RESULTS_DIR, prefix='results'):
+    """CSV de resultados próprio de uma identidade de busca: <pasta>/<prefixo>-<hash>.csv"""
+    digest = hashlib.sha1(json.dumps(fingerprint, sort_keys=True).encode()).hexdigest()[:12]
+    return os.path.join(directory, f"{prefix}-{digest}.csv")
+
+
+def _meta_path(path):
+    return path + '.meta.json'
+
+
+def check_fingerprint(path, fingerprint):
+    """
+    Grava a identidade de uma busca nova ou confere a de uma busca retomada
+    ValueError se o CSV existente for de outras velas/configuração
+    """
+    meta_path = _meta_path(path)
+    if os.path.exists(meta_path):
+        with open(meta_path, 'r') as f:
+            stored = json.load(f)
+        if stored != fingerprint:
+            changed = sorted(name for name in set(stored) | set(fingerprint) if stored.get(name) != fingerprint.get(name))
+            raise ValueError(f"{path} é de outra busca (diferenças: {', '.join(changed)}); "
+                             f"use outro arquivo de resultados")
+        return
+
+    if completed_keys(path):
+        raise ValueError(f"{path} não tem {os.path.basename(meta_path)}: não dá para saber de quais "
+                         f"velas são os resultados; use outro arquivo de resultados")
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(meta_path, 'w') as f:
+        json.dump(fingerprint, f, indent=2)
+
+
+# ---------------------------------------------------------------- workers
+
+_worker = {}
+
+
+def _init_worker(descriptor, settings):
+    """Inicializador do pool: abre as velas compartilhadas uma vez por processo"""
+    shm, series = SharedCandles.attach(descriptor)
+    _worker.update(shm=shm, series=series, settings=settings, prepared={})
+
+
+def _prepared(backtester, params):
+    """Sinais da estratégia sobre o histórico inteiro (cache por worker)"""
+    cache = _worker['prepared']
+    if params not in cache:
+        if len(cache) >= PREPARED_CACHE_SIZE:
+            cache.pop(next(iter(cache)))
+        cache[params] = backtester.prepare(_worker['series'])
+    return cache[params]
+
+
+def _run_job(job):
+    """Executa um backtest -> linha da tabela (parâmetros + estatísticas)"""
+    rsi_period, stoch_period, k_smooth, d_smooth, stop, leverage, investment, start, end = job
+    params = (rsi_period, stoch_period, k_smooth, d_smooth)
+    settings = _worker['settings']
+    series = _worker['series']
+
+    backtester = Backtester(StochRSIStrategy(params), initial_capital=settings['initial_capital'],
+                            investment_per_trade=investment, leverage=leverage,
+                            base_interval=settings['base_interval'], warmup=settings['warmup'],
+                            mtf_intervals=settings['mtf_intervals'], stop_loss_percent=stop)
+    signals, confirmed = _prepared(backtester, params)
+
+    # Janela: fatia das velas e dos sinais já calculados (com o histórico anterior como aquecimento)
+    timestamps = series['timestamp']
+    first = 0 if start is None else int(np.searchsorted(timestamps, start))
+    last = len(series) if end is None else int(np.searchsorted(timestamps, end, side='right'))
+    result = backtester.run(series[first:last], prepared=(signals[first:last], confirmed[first:last]))
+
+    stats = result['statistics']
+    return list(job_key(job)) + ['' if stats.get(name) is None else stats[name] for name in RESULT_COLUMNS]
+
+
+# ---------------------------------------------------------------- tabela de resultados
+
+def _repair(path):
+    """Descarta uma última linha incompleta (gravação interrompida)"""
+    with open(path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b'\n'):
+            f.truncate(data.rfind(b'\n') + 1)
+
+
+def completed_keys(path):
+    """Chaves dos jobs já gravados no CSV"""
+    if not os.path.exists(path):
+        return set()
+    _repair(path)
+    width = len(PARAM_COLUMNS) + len(RESULT_COLUMNS)
+    with open(path, newline='') as f:
+        rows = csv.reader(f)
+        next(rows, None)
+        return {tuple(row[:len(PARAM_COLUMNS)]) for row in rows if len(row) == width}
+
+
+def load_results(path):
+    """Tabela de resultados como array estruturado NumPy (NaN onde vazio)"""
+    if not os.path.exists(path) or not completed_keys(path):
+        return np.empty(0, dtype=[(name, 'f8') for name in PARAM_COLUMNS + RESULT_COLUMNS])
+    return np.atleast_1d(np.genfromtxt(path, delimiter=',', names=True))
+
+
+def best(results, by='total_pnl', count=10):
+    """Melhores linhas por uma coluna (maior primeiro)"""
+    if not len(results):
+        return results
+    order = np.argsort(np.nan_to_num(results[by], nan=-np.inf))[::-1]
+    return results[order[:count]]
+
+
+def run_optimization(candles, jobs, path=None, workers=None, initial_capital=35.0,
+                     base_interval='5m', warmup=50, chunksize=None, verbose=True, mtf_intervals=(),
+                     results_dir=DEFAULT_RESULTS_DIR, prefix='results'):
+    """
+    Executa os jobs ainda não gravados em `path` e retorna a tabela completa
+    path: CSV de resultados; None = <results_dir>/<prefix>-<hash>.csv, derivado das velas
+    e da configuração (ver fingerprint_path)
+    workers: processos do pool (padrão: todos os núcleos; 1 = sem pool)
+    ValueError se `path` já tiver resultados de outras velas ou configuração
+    """
+    series = as_series(candles)
+    settings = {'initial_capital': initial_capital, 'base_interval': base_interval, 'warmup': warmup,
+                'mtf_intervals': tuple(mtf_intervals or ())}
+    fingerprint = dataset_fingerprint(series, settings)
+    path = path or fingerprint_path(fingerprint, results_dir, prefix)
+    check_fingerprint(path, fingerprint)
+
+    done = completed_keys(path)
+    pending = [job for job in jobs if job_key(job) not in done]
+    if verbose:
+        print(f"📁 Resultados em {path}")
+        print(f"🔎 {len(jobs)} jobs ({len(jobs) - len(pending)} já gravados, {len(pending)} a executar)")
+    if not pending:
+        return load_results(path)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+    workers = workers or os.cpu_count() or 1
+    chunksize = chunksize or max(1, len(pending) // (workers * 8))
+    started = time.perf_counter()
+
+    with open(path, 'a', newline='') as f, SharedCandles(series) as shared:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(PARAM_COLUMNS + RESULT_COLUMNS)
+            f.flush()
+
+        def record(rows):
+            for count, row in enumerate(rows, 1):
+                writer.writerow(row)
+                f.flush()
+                if verbose and (count % 50 == 0 or count == len(pending)):
+                    elapsed = time.perf_counter() - started
+                    print(f"   {count}/{len(pending)} jobs ({count / elapsed:.1f} jobs/s)")
+
+        if workers == 1:
+            _init_worker(shared.descriptor, settings)
+            try:
+                record(map(_run_job, pending))
+            finally:
+                _worker.pop('shm').close()
+                _worker.clear()
+        else:
+            with mp.Pool(workers, initializer=_init_worker, initargs=(shared.descriptor, settings)) as pool:
+                record(pool.imap_unordered(_run_job, pending, chunksize))
+
+    if verbose:
+        print(f"✅ {len(pending)} backtests em {time.perf_counter() - started:.1f}s com {workers} processo(s)")
+    return load_results(path)
+
+
+def _values(text, kind=int):
+    return [kind(value) for value in text.split(',') if value]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Busca de parâmetros com backtests em paralelo')
+    parser.add_argument('--file', default=None, help='CSV/JSON de velas ou pasta de um KlineStore')
+    parser.add_argument('--days', type=int, default=90, help='Dias de histórico do provedor (sem --file)')
+    parser.add_argument('--symbol', default='BTCUSDT')
+    parser.add_argument('--interval', default='5m')
+    parser.add_argument('--rsi', default='7,10,14,15,21')
+    parser.add_argument('--stoch', default='5,9,14')
+    parser.add_argument('--k', default='3')
+    parser.add_argument('--d', default='3')
+    parser.add_argument('--stop', default='3,5,7', help='stop_loss_percent')
+    parser.add_argument('--leverage', default='20,50')
+    parser.add_argument('--investment', default='25')
+    parser.add_argument('--windows', type=int, default=1, help='Janelas de tempo iguais')
+    parser.add_argument('--mtf', action='store_true', help='Aplicar o filtro de tendência 15m/1h')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--out', default=None,
+                        help='CSV de resultados (retomável; padrão: um arquivo por conjunto de velas em data/optimize)')
+    args = parser.parse_args()
+
+    if args.file:
+        candles = as_series(load_candles(args.file, args.symbol, args.interval))
+    else:
+        from data_provider import data_provider
+        candles = as_series(data_provider.get_historical_klines(args.days, args.symbol, args.interval))
+
+    jobs = parameter_grid(_values(args.rsi), _values(args.stoch), _values(args.k), _values(args.d),
+                          _values(args.stop, float), _values(args.leverage), _values(args.investment, float),
+                          time_windows(candles, args.windows))
+
+    results = run_optimization(candles, jobs, args.out, args.workers, base_interval=args.interval,
+                               mtf_intervals=('15m', '1h') if args.mtf else ())
+
+    print(f"\n🏆 Melhores por P&L ({len(results)} resultados):")
+    for row in best(results):
+        params = ', '.join(f"{name}={row[name]:g}" for name in PARAM_COLUMNS[:7])
+        if not np.isnan(row['start']):
+            window = [datetime.fromtimestamp(row[name] / 1000).strftime('%Y-%m-%d') for name in ('start', 'end')]
+            params += f" [{window[0]} → {window[1]}]"
+        print(f"   {params} | trades={row['total_trades']:.0f} P&L=${row['total_pnl']:.2f} "
+              f"DD=${row['max_drawdown']:.2f} PF={row['profit_factor']:.2f}")
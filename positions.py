@@ -0,0 +1,137 @@
+"""
+Positions - Posições compactas e livro de posições indexado
+
+Position guarda os campos em __slots__ (sem dict por instância) e aceita
+acesso como dict (position['pnl_dollar']), então o resto do código e os
+templates continuam iguais. O JSON enviado aos clientes só é montado em
+to_dict(), na borda.
+
+PositionBook indexa as posições abertas por id e por lado (LONG/SHORT) e
+mantém o total investido, então abrir, fechar e checar capital é O(1).
+"""
+
+# Campos na ordem do JSON (close_price/close_reason só depois de fechada)
+FIELDS = (
+    'id', 'type', 'entry_price', 'current_price', 'amount', 'position_size',
+    'stop_loss', 'initial_stop', 'trailing_stop', 'highest_price', 'lowest_price',
+    'pnl_percent', 'pnl_dollar', 'open_time', 'close_time', 'status',
+    'close_price', 'close_reason',
+)
+CLOSE_FIELDS = ('close_price', 'close_reason')
+
+
+class Position:
+    __slots__ = FIELDS
+
+    def __init__(self, **values):
+        for name in FIELDS:
+            setattr(self, name, values.get(name))
+
+    # Acesso como dict (compatível com as posições antigas)
+    def __getitem__(self, name):
+        try:
+            return getattr(self, name)
+        except (AttributeError, TypeError):
+            raise KeyError(name)
+
+    def __setitem__(self, name, value):
+        try:
+            setattr(self, name, value)
+        except (AttributeError, TypeError):
+            raise KeyError(name)
+
+    def __contains__(self, name):
+        return name in self.keys()
+
+    def get(self, name, default=None):
+        return getattr(self, name) if name in self.keys() else default
+
+    def keys(self):
+        if self.status == 'closed':
+            return FIELDS
+        return FIELDS[:-len(CLOSE_FIELDS)]
+
+    def copy(self):
+        return Position(**self.to_dict())
+
+    def to_dict(self):
+        """Formato JSON enviado ao dashboard e salvo em trades.json"""
+        return {name: getattr(self, name) for name in self.keys()}
+
+    def __repr__(self):
+        return f"Position({self.id}, {self.status}, pnl=${self.pnl_dollar:.2f})"
+
+
+class PositionBook:
+    """Posições abertas indexadas por id e por lado, com o total investido"""
+
+    def __init__(self):
+        self.by_id = {}
+        self.by_side = {'LONG': {}, 'SHORT': {}}
+        self.invested = 0.0
+
+    def add(self, position):
+        if position.id in self.by_id:
+            raise KeyError(f"Posição já existe: {position.id}")
+        self.by_id[position.id] = position
+        self.by_side.setdefault(position.type, {})[position.id] = position
+        self.invested += position.amount
+
+    def remove(self, position):
+        del self.by_id[position.id]
+        del self.by_side[position.type][position.id]
+        # Recomeça do zero quando vazio (sem acumular erro de arredondamento)
+        self.invested = self.invested - position.amount if self.by_id else 0.0
+
+    def get(self, position_id):
+        return self.by_id.get(position_id)
+
+    def side(self, position_type):
+        """Posições abertas de um lado (lista, pode fechar enquanto itera)"""
+        return list(self.by_side.get(position_type, {}).values())
+
+    def has_side(self, position_type):
+        return bool(self.by_side.get(position_type))
+
+    def unique_id(self, position_id):
+        """id livre no livro (sufixo _2, _3... se já houver outro no mesmo segundo)"""
+        candidate, count = position_id, 1
+        while candidate in self.by_id:
+            count += 1
+            candidate = f"{position_id}_{count}"
+        return candidate
+
+    def to_dicts(self):
+        return [position.to_dict() for position in self.by_id.values()]
+
+    def __contains__(self, position):
+        return getattr(position, 'id', None) in self.by_id
+
+    def __iter__(self):
+        # Cópia: permite fechar posições durante a iteração
+        return iter(list(self.by_id.values()))
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __bool__(self):
+        return bool(self.by_id)
+
+
+if __name__ == '__main__':
+    import time
+
+    print("🧪 Testando PositionBook...\n")
+
+    book = PositionBook()
+    start = time.perf_counter()
+    for i in range(10_000):
+        book.add(Position(id=f"LONG_{i}", type='LONG' if i % 2 else 'SHORT', amount=25.0, status='open'))
+    for position in book:
+        position.current_price = 1.0
+    for position in book:
+        book.remove(position)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    print(f"📊 10.000 posições abertas, atualizadas e fechadas em {elapsed:.1f} ms")
+    print(f"💰 Investido no fim: ${book.invested:.2f}")
@@ -0,0 +1,149 @@
+"""
+Strategy - Regras de sinal plugáveis, avaliadas sobre o histórico inteiro
+
+Uma estratégia calcula seus indicadores para todas as velas de uma vez e
+transforma esses arrays em um array de sinais (códigos int8). O sinal ao vivo
+usa exatamente as mesmas regras, aplicadas aos valores da última vela fechada.
+
+As funções aceitam uma CandleSeries ou um dict de colunas 2-D (ativos × tempo,
+como o de indicators.stack_series), então um scan da watchlist inteira é uma
+única chamada.
+"""
+import numpy as np
+import indicators
+
+# Parâmetros da estratégia: (rsi_period, stoch_period, k_smooth, d_smooth)
+STOCH_RSI_PARAMS = (15, 5, 3, 3)
+
+# Códigos de sinal
+NONE, LONG, SHORT, EXIT_LONG, EXIT_SHORT = range(5)
+SIGNAL_NAMES = {NONE: None, LONG: 'LONG', SHORT: 'SHORT', EXIT_LONG: 'EXIT_LONG', EXIT_SHORT: 'EXIT_SHORT'}
+SIGNAL_CODES = {name: code for code, name in SIGNAL_NAMES.items()}
+
+
+def _shift(values):
+    """Valor da vela anterior (NaN na primeira)"""
+    shifted = np.full(values.shape, np.nan)
+    shifted[..., 1:] = values[..., :-1]
+    return shifted
+
+
+class Strategy:
+    """
+    Base das estratégias
+    Subclasses implementam indicators() e rules(); generate() e confirm()
+    funcionam para o histórico inteiro e para a vela ao vivo
+    """
+    name = 'base'
+
+    def indicators(self, candles):
+        """dict nome -> array alinhado às velas (NaN onde não há dados)"""
+        raise NotImplementedError
+
+    def rules(self, values):
+        """Sinais (códigos) a partir dos indicadores, elemento a elemento"""
+        raise NotImplementedError
+
+    def reason(self, signal, values):
+        """Descrição do sinal para logs/dashboard (values: escalares da vela)"""
+        return SIGNAL_NAMES[signal] or 'Aguardando condições'
+
+    def generate(self, candles):
+        """Sinal de cada vela (avaliado no fechamento dela) -> array int8"""
+        return self.rules(self.indicators(candles))
+
+    def entry_allowed(self, signals, closes, previous_closes):
+        """Confirmação de entrada; por padrão entra direto na vela seguinte"""
+        return np.ones(signals.shape, dtype=bool)
+
+    def confirm(self, candles, signals):
+        """
+        Entradas confirmadas: entries[..., j] = sinal LONG/SHORT da vela j-1
+        confirmado pelo preço da vela j (última vela pode ser a aberta)
+        """
+        closes = np.asarray(candles['close'], dtype=np.float64)
+        entries = np.zeros(signals.shape, dtype=bool)
+        previous = signals[..., :-1]
+        entries[..., 1:] = (((previous == LONG) | (previous == SHORT))
+                            & self.entry_allowed(previous, closes[..., 1:], closes[..., :-1]))
+        return entries
+
+    def live_signal(self, values):
+        """
+        Sinal de uma vela a partir dos valores escalares dos indicadores
+        (mesmas regras de generate) -> (código, razão)
+        """
+        arrays = {name: np.array([np.nan if v is None else v], dtype=np.float64)
+                  for name, v in values.items()}
+        signal = int(self.rules(arrays)[0])
+        return signal, self.reason(signal, values)
+
+
+class StochRSIStrategy(Strategy):
+    """
+    Stoch RSI (15, 5, 3, 3):
+    - LONG/SHORT quando o K da vela anterior estava < 20 / > 80
+    - EXIT_LONG/EXIT_SHORT quando o K atual está > 80 / < 20
+    - Entrada só se a vela seguinte não andar contra o sinal
+    """
+    name = 'stoch_rsi'
+
+    def __init__(self, params=STOCH_RSI_PARAMS, oversold=20, overbought=80):
+        self.params = tuple(params)
+        self.oversold = oversold
+        self.overbought = overbought
+
+    def indicators(self, candles):
+        _, _, k, d = indicators.stoch_rsi(candles['close'], *self.params)
+        return {'k': k, 'd': d, 'k_prev': _shift(k)}
+
+    def rules(self, values):
+        k, d, k_prev = values['k'], values['d'], values['k_prev']
+        valid = ~np.isnan(k) & ~np.isnan(d)
+
+        # Mesma prioridade do analyze_klines original (comparações com NaN dão False)
+        conditions = [
+            valid & (k_prev < self.oversold),
+            valid & (k_prev > self.overbought),
+            valid & (k > self.overbought),
+            valid & (k < self.oversold),
+        ]
+        return np.select(conditions, [LONG, SHORT, EXIT_LONG, EXIT_SHORT], NONE).astype(np.int8)
+
+    def reason(self, signal, values):
+        k, k_prev = values['k'], values['k_prev']
+        if signal == LONG:
+            return f'Stoch RSI em oversold (prev={k_prev:.2f}, atual={k:.2f})'
+        if signal == SHORT:
+            return f'Stoch RSI em overbought (prev={k_prev:.2f}, atual={k:.2f})'
+        if signal == EXIT_LONG:
+            return f'Stoch RSI em overbought ({k:.2f}), sair de LONG'
+        if signal == EXIT_SHORT:
+            return f'Stoch RSI em oversold ({k:.2f}), sair de SHORT'
+        return 'Aguardando condições'
+
+    def entry_allowed(self, signals, closes, previous_closes):
+        # LONG: não entrar se a vela fechou abaixo da anterior; SHORT: acima
+        return np.where(signals == LONG, closes >= previous_closes, closes <= previous_closes)
+
+
+if __name__ == '__main__':
+    import time
+
+    print("🧪 Testando StochRSIStrategy...\n")
+
+    rng = np.random.default_rng(0)
+    closes = 100 + np.cumsum(rng.normal(0, 1, 30 * 288))
+    candles = {'close': closes}
+
+    strategy = StochRSIStrategy()
+    start = time.perf_counter()
+    signals = strategy.generate(candles)
+    entries = strategy.confirm(candles, signals)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    print(f"📊 {len(closes)} velas em {elapsed:.1f} ms")
+    for code, name in SIGNAL_NAMES.items():
+        if name:
+            print(f"   {name}: {int((signals == code).sum())}")
+    print(f"   Entradas confirmadas: {int(entries.sum())}")
@@ -0,0 +1,122 @@
+"""
+Sweep - Avalia uma grade de parâmetros do Stoch RSI sobre a mesma série
+
+Para cada combinação (rsi_period, stoch_period, k_smooth, d_smooth) calcula as
+séries K e D inteiras. Os passos intermediários são compartilhados: o RSI de
+cada período é calculado uma vez, a máxima/mínima móvel cresce de um período
+de stochastic para o próximo, e cada K é reaproveitado por todos os D.
+
+O resultado é um array (combinações, 2, tempo) em float32 (K e D). O tempo é
+processado em blocos com sobreposição (o Stoch RSI só depende dos últimos
+preços), então a memória fica limitada mesmo com meses de velas; passe um
+np.memmap em `out` para nem o resultado ficar na RAM.
+"""
+import itertools
+import numpy as np
+import indicators
+
+
+def grid_combos(rsi_periods, stoch_periods, k_smooths, d_smooths):
+    """Todas as combinações da grade, na ordem das linhas do resultado -> array (N, 4)"""
+    combos = itertools.product(rsi_periods, stoch_periods, k_smooths, d_smooths)
+    return np.array(list(combos), dtype=np.int64).reshape(-1, 4)
+
+
+def combo_index(combos, params):
+    """Linha do resultado correspondente a `params` (ex: (15, 5, 3, 3))"""
+    matches = np.flatnonzero((combos == np.asarray(params)).all(axis=1))
+    if not len(matches):
+        raise KeyError(f"Combinação fora da grade: {tuple(params)}")
+    return int(matches[0])
+
+
+def warmup_length(combos):
+    """Quantos preços anteriores influenciam um valor de D (memória finita)"""
+    return int(combos.sum(axis=1).max()) - 2
+
+
+def _sweep_block(closes, combos, rows, result, skip):
+    """
+    Calcula K/D de todas as combinações para um bloco de preços e grava em
+    `result` (view do bloco no resultado), descartando os `skip` preços de aquecimento
+    """
+    for rsi_period in np.unique(combos[:, 0]):
+        rsi = indicators.window_rsi(closes, rsi_period)
+        in_rsi = combos[:, 0] == rsi_period
+        stoch_periods = set(combos[in_rsi, 1].tolist())
+
+        # Máxima/mínima móvel crescendo de 1 em 1 período:
+        # janela w+1 = max(janela w, valor que entra pela esquerda)
+        highest = rsi.copy()
+        lowest = rsi.copy()
+        for window in range(1, max(stoch_periods) + 1):
+            if window > 1:
+                shift = window - 1
+                highest[shift:] = np.maximum(highest[shift:], rsi[:-shift])
+                lowest[shift:] = np.minimum(lowest[shift:], rsi[:-shift])
+                highest[:shift] = np.nan
+                lowest[:shift] = np.nan
+
+            if window not in stoch_periods:
+                continue
+
+            stoch = indicators.oscillator(rsi, highest, lowest)
+            in_stoch = in_rsi & (combos[:, 1] == window)
+
+            for k_smooth in np.unique(combos[in_stoch, 2]):
+                k = indicators.sma(stoch, k_smooth)
+                in_k = in_stoch & (combos[:, 2] == k_smooth)
+
+                for d_smooth in np.unique(combos[in_k, 3]):
+                    d = indicators.sma(k, d_smooth)
+                    for row in rows[in_k & (combos[:, 3] == d_smooth)]:
+                        result[row, 0] = k[skip:]
+                        result[row, 1] = d[skip:]
+
+
+def stoch_rsi_sweep(closes, rsi_periods, stoch_periods, k_smooths, d_smooths,
+                    out=None, chunk_size=20_000, dtype=np.float32):
+    """
+    Stoch RSI para todas as combinações da grade
+    Retorna (combos, result): combos (N, 4) e result (N, 2, len(closes)),
+    result[i, 0] = K e result[i, 1] = D da combinação combos[i] (NaN no início)
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    combos = grid_combos(rsi_periods, stoch_periods, k_smooths, d_smooths)
+    rows = np.arange(len(combos))
+    total = len(closes)
+
+    if out is None:
+        out = np.empty((len(combos), 2, total), dtype=dtype)
+    elif out.shape != (len(combos), 2, total):
+        raise ValueError(f"out deveria ter formato {(len(combos), 2, total)}, tem {out.shape}")
+
+    warmup = warmup_length(combos)
+
+    for start in range(0, total, chunk_size):
+        end = min(start + chunk_size, total)
+        # Incluir os preços anteriores que ainda influenciam o bloco
+        first = max(0, start - warmup)
+        _sweep_block(closes[first:end], combos, rows, out[:, :, start:end], start - first)
+
+    return combos, out
+
+
+if __name__ == '__main__':
+    import time
+
+    print("🧪 Testando sweep do Stoch RSI...\n")
+
+    # ~3 meses de velas de 5m
+    rng = np.random.default_rng(0)
+    closes = 100 + np.cumsum(rng.normal(0, 1, 90 * 288))
+
+    start = time.perf_counter()
+    combos, result = stoch_rsi_sweep(closes, range(7, 22), range(3, 15), range(1, 6), range(1, 6))
+    elapsed = time.perf_counter() - start
+
+    print(f"📊 {len(combos)} combinações × {len(closes)} velas em {elapsed:.1f}s")
+    print(f"💾 Resultado: {result.shape} ({result.nbytes / 1e6:.0f} MB)")
+
+    row = combo_index(combos, (15, 5, 3, 3))
+    print(f"🎯 (15, 5, 3, 3): K={result[row, 0, -1]:.2f}, D={result[row, 1, -1]:.2f}")
@@ -0,0 +1,107 @@
+"""
+Teste da agregação local de velas (1m -> 5m/15m/1h)
+"""
+import numpy as np
+import pytest
+from aggregator import CandleAggregator, resample
+from candles import CandleSeries
+
+
+def make_series(count, start=0):
+    """Velas de 1m sintéticas"""
+    rng = np.random.default_rng(42)
+    closes = 100 + np.cumsum(rng.normal(0, 1, count))
+    timestamps = start + np.arange(count, dtype=np.int64) * 60_000
+    return CandleSeries({
+        'timestamp': timestamps,
+        'open': closes - 0.5,
+        'high': closes + 1,
+        'low': closes - 1,
+        'close': closes,
+        'volume': np.ones(count),
+        'close_time': timestamps + 59_999,
+        'quote_volume': closes,
+        'trades': np.full(count, 3, dtype=np.int64),
+    })
+
+
+def test_incremental_matches_resample():
+    series = make_series(180)
+    aggregator = CandleAggregator('1m', ('5m', '15m', '1h'))
+    closed = []
+    aggregator.on_close(lambda interval, candle, complete: closed.append((interval, complete)))
+
+    for candle in series:
+        aggregator.update(candle)
+
+    for interval in ('5m', '15m', '1h'):
+        expected = resample(series, interval)
+        result = aggregator.series(interval)
+        for name in ('timestamp', 'open', 'high', 'low', 'close', 'volume', 'trades'):
+            assert np.allclose(result[name], expected[name])
+
+    # 180 minutos = 36 velas de 5m, 12 de 15m e 3 de 1h, todas completas
+    assert closed.count(('5m', True)) == 36
+    assert closed.count(('1h', True)) == 3
+
+
+def test_open_base_candle_is_provisional():
+    series = make_series(7)
+    aggregator = CandleAggregator('1m', ('5m',))
+    aggregator.seed(series[:6])
+
+    open_candle = series[6]
+    aggregator.update(open_candle, closed=False)
+
+    # Vela de 5m em andamento: 1 vela de 1m fechada + a vela aberta
+    current = aggregator.current('5m')
+    assert current['timestamp'] == 300_000
+    assert current['close'] == open_candle['close']
+    assert len(aggregator.history['5m']) == 1
+
+
+def test_gap_marks_bucket_incomplete():
+    series = make_series(10)
+    aggregator = CandleAggregator('1m', ('5m',))
+    closed = []
+    aggregator.on_close(lambda interval, candle, complete: closed.append(complete))
+
+    # Pular a vela das 00:02 (ex: stream caiu)
+    for i, candle in enumerate(series):
+        if i != 2:
+            aggregator.update(candle)
+
+    assert closed == [False, True]
+
+
+def test_columnar_seed_matches_candle_by_candle_updates():
+    # 2h37 de velas sem a das 00:07: bucket incompleto no meio e último bucket em andamento
+    series = make_series(157)
+    keep = np.ones(len(series), dtype=bool)
+    keep[7] = False
+    series = CandleSeries({name: column[keep] for name, column in series.columns.items()})
+
+    seeded = CandleAggregator('1m', ('5m', '15m', '1h'))
+    updated = CandleAggregator('1m', ('5m', '15m', '1h'))
+    seeded_closed, updated_closed = [], []
+    seeded.on_close(lambda interval, candle, complete: seeded_closed.append((interval, candle['timestamp'], complete)))
+    updated.on_close(lambda interval, candle, complete: updated_closed.append((interval, candle['timestamp'], complete)))
+
+    seeded.seed(series)
+    for candle in series:
+        updated.update(candle)
+
+    assert sorted(seeded_closed) == sorted(updated_closed)
+    assert seeded.last_timestamp == updated.last_timestamp
+    for interval in ('5m', '15m', '1h'):
+        assert seeded.current(interval) == pytest.approx(updated.current(interval))
+        expected = updated.series(interval)
+        result = seeded.series(interval)
+        for name in ('timestamp', 'open', 'high', 'low', 'close', 'volume', 'trades'):
+            assert np.allclose(result[name], expected[name])
+
+    # Depois do seed, as velas seguintes continuam no mesmo bucket
+    for candle in make_series(160)[157:]:
+        seeded.update(candle)
+        updated.update(candle)
+    assert seeded.series('1h')['close'].tolist() == updated.series('1h')['close'].tolist()
@@ -0,0 +1,130 @@
+"""
+Teste do Stoch RSI vetorizado e incremental contra o cálculo ponto a ponto/em lote
+"""
+import numpy as np
+from analyzer import TechnicalAnalyzer, StochRSIState, WilderRSI, MultiTimeframeState, RollingMean
+from aggregator import resample
+from candles import CandleSeries
+import indicators
+
+
+def reference_stoch_rsi(analyzer, prices, rsi_period, stoch_period, k_smooth, d_smooth):
+    """Cálculo ponto a ponto (um calculate_rsi por preço), só para comparação"""
+    rsi = [analyzer.calculate_rsi(prices[i - rsi_period:i + 1], rsi_period)
+           for i in range(rsi_period, len(prices))]
+    stoch = []
+    for i in range(stoch_period - 1, len(rsi)):
+        window = rsi[i - stoch_period + 1:i + 1]
+        hi, lo = max(window), min(window)
+        stoch.append(50 if hi == lo else (rsi[i] - lo) / (hi - lo) * 100)
+    k = [np.mean(stoch[i - k_smooth + 1:i + 1]) for i in range(k_smooth - 1, len(stoch))]
+    d = [np.mean(k[i - d_smooth + 1:i + 1]) for i in range(d_smooth - 1, len(k))]
+    return k, d
+
+
+def test_series_matches_pointwise_calculation():
+    analyzer = TechnicalAnalyzer()
+    rng = np.random.default_rng(3)
+    prices = 100 + np.cumsum(rng.normal(0, 1, 300))
+    prices[100:130] = prices[100]  # trecho sem variação (RSI 100 / stoch 50)
+
+    for params in [(15, 5, 3, 3), (14, 14, 3, 3)]:
+        _, _, k, d = analyzer.stoch_rsi_series(prices, *params)
+        k_ref, d_ref = reference_stoch_rsi(analyzer, prices, *params)
+
+        assert np.array_equal(k[len(prices) - len(k_ref):], k_ref)
+        assert np.array_equal(d[len(prices) - len(d_ref):], d_ref)
+        assert np.all(np.isnan(k[:len(prices) - len(k_ref)]))
+
+        # Valor escalar = último elemento da série
+        assert analyzer.calculate_stoch_rsi(prices, *params) == (k_ref[-1], d_ref[-1])
+
+
+def test_streaming_state_matches_batch():
+    analyzer = TechnicalAnalyzer()
+    rng = np.random.default_rng(8)
+    prices = 100 + np.cumsum(rng.normal(0, 1, 200))
+    _, _, k, d = analyzer.stoch_rsi_series(prices, 15, 5, 3, 3)
+
+    state = StochRSIState(15, 5, 3, 3)
+    state.seed(prices[:100])
+    assert (state.k, state.d) == (k[99], d[99])
+
+    for i in range(100, len(prices)):
+        # Valor provisório da vela aberta não altera o estado
+        assert state.peek(prices[i] + 5) == state.peek(prices[i] + 5)
+        assert state.peek(prices[i]) == state.update(prices[i]) == (k[i], d[i])
+
+    wilder = WilderRSI(14)
+    wilder.seed(prices[:150])
+    assert wilder.value() == analyzer.calculate_rsi(prices[:150], 14)
+    assert wilder.update(prices[150]) == analyzer.calculate_rsi(prices[:151], 14)
+
+
+def test_analysis_cache_per_closed_candle():
+    analyzer = TechnicalAnalyzer(cache_size=2)
+    prices = 100 + np.cumsum(np.random.default_rng(5).normal(0, 1, 80))
+    klines = [{'timestamp': i * 300_000, 'close': p} for i, p in enumerate(prices)]
+
+    first = analyzer.analyze_klines(klines, symbol='BTCUSDT', interval='5m', verbose=False)
+    again = analyzer.analyze_klines(klines, symbol='BTCUSDT', interval='5m', verbose=False)
+    assert first == again
+    assert analyzer.get_cache_stats()['hits'] == 1
+
+    # Nova vela fechada (e outro símbolo) = nova entrada; a mais antiga é descartada
+    analyzer.analyze_klines(klines[:-1], symbol='BTCUSDT', interval='5m', verbose=False)
+    analyzer.analyze_klines(klines, symbol='ETHUSDT', interval='5m', verbose=False)
+    stats = analyzer.get_cache_stats()
+    assert stats['misses'] == 3
+    assert stats['evictions'] == 1
+    assert stats['entries'] == 2
+
+
+def test_multi_timeframe_state_matches_resampled_batch():
+    rng = np.random.default_rng(9)
+    count = 2000
+    closes = 100 + np.cumsum(rng.normal(0, 1, count))
+    series = CandleSeries.from_dicts([
+        {'timestamp': i * 300_000, 'open': c, 'high': c + 1, 'low': c - 1, 'close': c}
+        for i, c in enumerate(closes)
+    ])
+
+    mtf = MultiTimeframeState('5m', ('15m', '1h'))
+    mtf.update(series[:1000])
+    for end in range(1001, count + 1):
+        mtf.update(series[end - 100:end])
+
+    for interval in ('15m', '1h'):
+        higher = resample(series, interval, complete_only=True, base_interval='5m')
+        _, _, k, d = indicators.stoch_rsi(higher['close'], 15, 5, 3, 3)
+        assert mtf.states[interval].k == k[-1]
+        assert mtf.states[interval].d == d[-1]
+        assert mtf.trends()[interval]['timestamp'] == higher['timestamp'][-1]
+
+
+def test_rolling_mean_matches_batch_sma_exactly():
+    rng = np.random.default_rng(11)
+    values = rng.normal(0, 1e6, 20_000) * rng.integers(0, 2, 20_000)
+
+    for window in (3, 14, 15):
+        expected = indicators.sma(values, window)
+        mean = RollingMean(window)
+        for i, value in enumerate(values):
+            provisional = mean.peek(value)
+            result = mean.update(value)
+            assert provisional == result
+            if i >= window - 1:
+                assert result == expected[i]
+
+
+def test_streaming_flat_prices_give_exact_rsi_and_stoch():
+    rng = np.random.default_rng(4)
+    prices = 100 + np.cumsum(rng.normal(0, 1, 120))
+    prices[60:] = prices[59]
+
+    state = StochRSIState(14, 14, 3, 3)
+    for close in prices:
+        k, d = state.update(close)
+    # Sem variação: RSI 100 em todas as janelas, stoch 50 (como no lote)
+    assert state.rsi.peek(prices[-1]) == 100
+    assert (k, d) == (50.0, 50.0)
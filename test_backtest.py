@@ -0,0 +1,88 @@
+"""
+Teste do backtest contra um replay vela a vela com o analyzer e o TradeSimulator
+"""
+from datetime import datetime
+import numpy as np
+from analyzer import TechnicalAnalyzer
+from backtest import Backtester
+from candles import CandleSeries
+from trader import TradeSimulator
+
+
+def make_candles(count=1500, seed=2, volatility=0.004):
+    rng = np.random.default_rng(seed)
+    closes = 40_000 * np.exp(np.cumsum(rng.normal(0, volatility, count)))
+    opens = np.r_[closes[0], closes[:-1]] * (1 + rng.normal(0, volatility / 4, count))
+    spread = np.abs(rng.normal(0, volatility, count)) * closes
+    timestamps = 1_700_000_000_000 + np.arange(count, dtype=np.int64) * 300_000
+    return CandleSeries({
+        'timestamp': timestamps,
+        'open': opens,
+        'high': np.maximum(opens, closes) + spread,
+        'low': np.minimum(opens, closes) - spread,
+        'close': closes,
+        'volume': np.ones(count),
+        'close_time': timestamps + 299_999,
+        'quote_volume': closes,
+        'trades': np.ones(count, dtype=np.int64),
+    })
+
+
+def replay(candles, warmup=50):
+    """Replay lento: analyze_klines + check_entry_conditions a cada vela, como o trading loop"""
+    analyzer = TechnicalAnalyzer()
+    sim = TradeSimulator()
+
+    for j in range(warmup - 1, len(candles)):
+        moment = datetime.fromtimestamp(candles['timestamp'][j] / 1000)
+        price = float(candles['open'][j])
+
+        # Vela j-1 fechou: trailing anda com o fechamento
+        for position in list(sim.open_positions):
+            sim.update_position_candle(position, candles[j - 1], candle_closed=True)
+
+        # Janela ao vivo: velas fechadas + vela j recém-aberta (preço atual = abertura)
+        window = candles[:j + 1].to_dicts()
+        window[-1]['close'] = price
+        analysis = analyzer.analyze_klines(window, verbose=False)
+
+        if analysis['signal'] in ('LONG', 'SHORT'):
+            can_enter, _ = analyzer.check_entry_conditions(window, analysis['signal'])
+            if can_enter:
+                sim.open_position(analysis['signal'], analysis['price'], timestamp=moment)
+        elif analysis['signal'] in ('EXIT_LONG', 'EXIT_SHORT'):
+            side = analysis['signal'].split('_')[1]
+            for position in [p for p in sim.open_positions if p['type'] == side]:
+                sim.close_position(position, analysis['price'], 'saída', timestamp=moment)
+
+        # Durante a vela j: stop pela mínima/máxima
+        for position in list(sim.open_positions):
+            hit_stop, reason, exit_price = sim.update_position_candle(position, candles[j])
+            if hit_stop:
+                sim.close_position(position, exit_price, reason, timestamp=moment)
+
+    return sim.closed_trades
+
+
+def test_backtest_matches_candle_by_candle_replay():
+    candles = make_candles()
+
+    result = Backtester().run(candles)
+    expected = replay(candles)
+
+    trades = [t for t in result['trades'] if t['close_reason'] != 'Fim do backtest']
+    assert len(trades) == len(expected) > 0
+    for trade, reference in zip(trades, expected):
+        for field in ('id', 'type', 'entry_price', 'close_price', 'open_time', 'close_time'):
+            assert trade[field] == reference[field]
+        assert np.isclose(trade['pnl_dollar'], reference['pnl_dollar'])
+
+
+def test_year_of_candles_runs_fast():
+    # Capital alto para o capital nunca acabar e haver trades o ano todo
+    result = Backtester(initial_capital=1e6).run(make_candles(count=365 * 288, seed=5, volatility=0.002))
+
+    stats = result['statistics']
+    assert stats['candles'] == 365 * 288
+    assert stats['total_trades'] == len(result['trades']) > 1000
+    assert stats['elapsed'] < 10
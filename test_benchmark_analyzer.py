@@ -0,0 +1,22 @@
+"""
+Regressão do analyzer: corretude contra a referência congelada e tempo relativo a ela
+(a referência é cronometrada na mesma execução, então não depende de baseline salvo)
+"""
+import pytest
+import benchmark_analyzer as bench
+
+
+@pytest.mark.parametrize('name, closes', bench.make_series((1_000, 10_000)))
+def test_fast_paths_match_frozen_reference(name, closes):
+    assert bench.check_correctness(closes) == []
+
+
+def test_no_performance_regression():
+    results = bench.run_benchmarks((10_000,))
+    assert set(bench.speedups(results)) == {f'{name}/10000' for name in bench.MIN_SPEEDUP}
+    assert bench.find_slow_paths(results) == []
+
+    # Baseline de tempos absolutos (opcional, gerado na mesma máquina)
+    baseline = bench.load_baseline()
+    if baseline is not None:
+        assert bench.find_regressions(results, baseline) == []
@@ -0,0 +1,181 @@
+"""
+Teste do provedor contra o stub local da Binance (não precisa de internet)
+"""
+import inspect
+import os
+import threading
+import numpy as np
+from binance_stub import BinanceStub
+from data_provider import BinanceDataProvider
+
+
+def test_history_paging_against_stub(tmp_path):
+    stub = BinanceStub(days=10)
+    stub.start()
+    try:
+        provider = BinanceDataProvider(base_url=stub.base_url, store_dir=str(tmp_path))
+        klines = provider.get_historical_klines(days=7)
+
+        timestamps = klines['timestamp']
+        assert len(klines) >= 7 * 288
+        assert np.all(np.diff(timestamps) == 300_000)
+
+        # Segunda chamada: só a sincronização incremental (1 requisição de klines)
+        before = stub.stats['by_path'].get('/fapi/v1/klines', 0)
+        provider.request_cache.invalidate()
+        provider.get_historical_klines(days=7)
+        assert stub.stats['by_path']['/fapi/v1/klines'] - before == 1
+    finally:
+        stub.stop()
+
+
+def test_retries_on_server_errors(tmp_path):
+    stub = BinanceStub(days=1, error_rate=0.3, seed=7)
+    stub.start()
+    try:
+        provider = BinanceDataProvider(base_url=stub.base_url, store_dir=str(tmp_path))
+        provider.http.backoff_base = 0.001
+        provider.price_ttl = 0
+
+        prices = [provider.get_current_price() for _ in range(30)]
+
+        assert all(price > 0 for price in prices)
+        assert stub.stats['errors'] > 0
+        stats = provider.get_http_stats()['endpoints']['/ticker/price']
+        assert stats['retries'] > 0
+        assert stats['requests'] == 30 + stats['retries']
+    finally:
+        stub.stop()
+
+
+def test_concurrent_reads_are_coalesced(tmp_path):
+    stub = BinanceStub(days=3, latency=0.1)
+    stub.start()
+    try:
+        provider = BinanceDataProvider(base_url=stub.base_url, store_dir=str(tmp_path))
+        provider.get_historical_klines(days=1)
+        provider.request_cache.invalidate()
+        before = dict(stub.stats['by_path'])
+
+        # 8 leituras de velas + 5 de preço ao mesmo tempo (sem cache seriam 8 + 5 × 2 = 18)
+        threads = [threading.Thread(target=provider.get_latest_klines) for _ in range(8)]
+        threads += [threading.Thread(target=provider.get_current_price) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        made = {path: count - before.get(path, 0) for path, count in stub.stats['by_path'].items()}
+        assert made == {'/fapi/v1/klines': 1, '/fapi/v1/ticker/price': 1, '/fapi/v1/ticker/24hr': 1}
+    finally:
+        stub.stop()
+
+
+def test_forced_ticker_refresh_keeps_kline_sync_cached(tmp_path):
+    stub = BinanceStub(days=3)
+    stub.start()
+    try:
+        provider = BinanceDataProvider(base_url=stub.base_url, store_dir=str(tmp_path))
+        provider.get_historical_klines(days=1)
+        provider.klines_ttl = 60
+        provider.sync_klines()
+        klines_before = stub.stats['by_path']['/fapi/v1/klines']
+
+        provider.refresh_tickers()
+        provider.refresh_tickers(force=True)
+        provider.sync_klines()
+
+        assert stub.stats['by_path']['/fapi/v1/ticker/price'] == 2
+        assert stub.stats['by_path']['/fapi/v1/klines'] == klines_before
+    finally:
+        stub.stop()
+
+
+def test_multi_symbol_provider_shares_tickers_and_keeps_stores_apart(tmp_path):
+    symbols = ('BTCUSDT', 'ETHUSDT', 'SOLUSDT')
+    stub = BinanceStub(symbols=symbols, days=2)
+    stub.start()
+    try:
+        provider = BinanceDataProvider(base_url=stub.base_url, store_dir=str(tmp_path), symbols=symbols)
+        provider.price_ttl = provider.change_24h_ttl = 60
+        views = {symbol: provider.view(symbol, '1m') for symbol in symbols}
+
+        # Uma chamada de cada ticker (sem 'symbol') alimenta todos os símbolos
+        market = provider.get_all_market_data()
+        assert set(market) == set(symbols)
+        assert stub.stats['by_path']['/fapi/v1/ticker/price'] == 1
+        assert stub.stats['by_path']['/fapi/v1/ticker/24hr'] == 1
+        assert len({market[s]['price'] for s in symbols}) == len(symbols)
+        for symbol, view in views.items():
+            assert view.get_current_price() == market[symbol]['price']
+            assert view.get_24h_change() == market[symbol]['change_24h']
+        assert stub.stats['by_path']['/fapi/v1/ticker/price'] == 1
+
+        # Cada símbolo tem o próprio armazenamento em disco
+        closes = {}
+        for symbol, view in views.items():
+            klines = view.get_latest_klines(50)
+            stored = provider.store.load(symbol, '1m')
+            assert len(klines) == 50
+            index = np.searchsorted(klines['timestamp'], stored['timestamp'][-10:])
+            assert np.array_equal(klines['close'][index], stored['close'][-10:])
+            closes[symbol] = klines['close']
+        assert not np.array_equal(closes['BTCUSDT'], closes['ETHUSDT'])
+
+        names, timestamps, columns = provider.get_watchlist_arrays(limit=50, interval='1m')
+        assert names == list(symbols)
+        assert columns['close'].shape == (len(symbols), 50)
+        for row, symbol in enumerate(names):
+            assert np.array_equal(columns['close'][row], closes[symbol])
+    finally:
+        stub.stop()
+
+
+def test_symbol_view_keeps_single_symbol_signatures():
+    from data_provider import SymbolView
+    expected = {
+        'get_current_price': '(self)',
+        'get_24h_change': '(self)',
+        'get_historical_klines': '(self, days=30)',
+        'get_latest_klines': '(self, limit=100)',
+        'calculate_price_change': '(self, klines, minutes)',
+        'get_market_data': '(self)',
+    }
+    for name, signature in expected.items():
+        assert str(inspect.signature(getattr(SymbolView, name))) == signature
+
+
+def test_symbol_listed_after_start_does_not_refetch_empty_head(tmp_path):
+    # O stub só tem 2 dias de velas: pedir 7 dias equivale a um símbolo listado há 2 dias
+    stub = BinanceStub(days=2)
+    stub.start()
+    try:
+        provider = BinanceDataProvider(base_url=stub.base_url, store_dir=str(tmp_path))
+        first = provider.get_historical_klines(days=7)
+        listed = provider.store.listing_time('BTCUSDT', '5m')
+        assert listed == first['timestamp'][0]
+
+        before = stub.stats['by_path']['/fapi/v1/klines']
+        for _ in range(3):
+            provider.request_cache.invalidate()
+            again = provider.get_historical_klines(days=7)
+            assert again['timestamp'][0] == listed
+
+        # Só a sincronização incremental a cada chamada
+        assert stub.stats['by_path']['/fapi/v1/klines'] - before == 3
+    finally:
+        stub.stop()
+
+
+def test_benchmark_cleans_up_its_store(tmp_path, monkeypatch):
+    import tempfile
+    from binance_stub import run_benchmark
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+
+    stub = BinanceStub(days=1)
+    stub.start()
+    try:
+        run_benchmark(stub, requests_count=5, workers=2)
+    finally:
+        stub.stop()
+    assert os.listdir(tmp_path) == []
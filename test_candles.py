@@ -0,0 +1,144 @@
+"""
+Teste das velas colunares (CandleSeries) e da janela circular (KlineWindow)
+"""
+import inspect
+import numpy as np
+from candles import CandleSeries, KlineWindow, FIELDS
+
+
+def candle(ts, close):
+    """Vela de 1m como dict (formato do stream)"""
+    return {'timestamp': ts, 'open': close - 0.5, 'high': close + 1, 'low': close - 1, 'close': close,
+            'volume': 1.0, 'close_time': ts + 59_999, 'quote_volume': close, 'trades': 3}
+
+
+def seeded_window(capacity, count):
+    window = KlineWindow(capacity)
+    window.seed([candle(i * 60_000, 100.0 + i) for i in range(count)])
+    return window
+
+
+def test_window_updates_open_candle_in_place():
+    window = seeded_window(5, 3)
+    calls = []
+    window.on_candle_closed(calls.append)
+
+    assert window.update(candle(120_000, 150.0)) is False
+    series = window.series()
+    assert len(series) == 3
+    assert series['close'].tolist() == [100.0, 101.0, 150.0]
+    assert calls == []
+
+
+def test_window_rewrites_late_final_values_of_previous_candle():
+    window = seeded_window(5, 3)
+    calls = []
+    window.on_candle_closed(calls.append)
+    window.update(candle(180_000, 200.0))
+
+    # Valores finais da vela anterior chegam depois da nova vela
+    assert window.update(candle(120_000, 160.0)) is False
+    # Velas mais antigas que a anterior são ignoradas
+    assert window.update(candle(60_000, 999.0)) is False
+
+    series = window.series()
+    assert series['timestamp'].tolist() == [0, 60_000, 120_000, 180_000]
+    assert series['close'].tolist() == [100.0, 101.0, 160.0, 200.0]
+    assert len(calls) == 1
+
+
+def test_window_callback_fires_once_per_new_timestamp():
+    window = seeded_window(5, 2)
+    closed_at = []
+    window.on_candle_closed(lambda w: closed_at.append(w.last_timestamp()))
+
+    for ts in (120_000, 180_000, 240_000):
+        for tick in range(4):
+            window.update(candle(ts, 100.0 + tick))
+
+    assert closed_at == [120_000, 180_000, 240_000]
+
+
+def test_window_wraps_past_capacity():
+    capacity = 4
+    window = KlineWindow(capacity)
+    window.seed([candle(0, 100.0)])
+    for i in range(1, 11):
+        window.update(candle(i * 60_000, 100.0 + i))
+
+    assert len(window) == capacity
+    # Cada valor gravado duas vezes: as duas metades dos buffers são iguais
+    for buffer in window.buffers.values():
+        assert np.array_equal(buffer[:capacity], buffer[capacity:])
+
+    series = window.series()
+    assert series['timestamp'].tolist() == [i * 60_000 for i in range(7, 11)]
+    assert series['close'].tolist() == [107.0, 108.0, 109.0, 110.0]
+
+
+def test_window_series_is_contiguous_view_after_wrap():
+    capacity = 4
+    window = seeded_window(capacity, capacity)
+    window.update(candle(4 * 60_000, 104.0))        # nova vela no slot 0
+    window.update(candle(3 * 60_000, 133.0))        # vela anterior (slot 3) reescrita
+
+    series = window.series()
+    assert series['timestamp'].tolist() == [60_000, 120_000, 180_000, 240_000]
+    assert series['close'].tolist() == [101.0, 102.0, 133.0, 104.0]
+    for name in FIELDS:
+        column = series[name]
+        assert column.flags['C_CONTIGUOUS']
+        assert np.shares_memory(column, window.buffers[name])
+
+
+def make_raw(start, count, step=60_000):
+    """Velas cruas no formato da Binance"""
+    return [[start + i * step, str(100.0 + i), str(101.0 + i), str(99.0 + i), str(100.5 + i),
+             '10.0', start + (i + 1) * step - 1, '1000.0', 42] for i in range(count)]
+
+
+def test_series_from_raw_and_from_dicts():
+    series = CandleSeries.from_raw(make_raw(0, 3))
+    assert len(series) == 3
+    assert series['timestamp'].dtype == np.int64
+    assert series['close'].tolist() == [100.5, 101.5, 102.5]
+    assert len(CandleSeries.from_raw([])) == 0
+
+    # Formato antigo: campos ausentes viram 0
+    rebuilt = CandleSeries.from_dicts([{'timestamp': 0, 'close': 1.5}, {'timestamp': 60_000, 'close': 2.5}])
+    assert rebuilt['close'].tolist() == [1.5, 2.5]
+    assert rebuilt['volume'].tolist() == [0.0, 0.0]
+    assert CandleSeries.from_dicts(series.to_dicts())['close'].tolist() == series['close'].tolist()
+
+
+def test_series_concat():
+    first = CandleSeries.from_raw(make_raw(0, 2))
+    second = CandleSeries.from_raw(make_raw(120_000, 3))
+
+    joined = CandleSeries.concat([first, CandleSeries.empty(), second])
+    assert joined['timestamp'].tolist() == [i * 60_000 for i in range(5)]
+    assert CandleSeries.concat([CandleSeries.empty(), first]) is first
+    assert len(CandleSeries.concat([])) == 0
+
+
+def test_series_slices_are_views_and_indexing_returns_dicts():
+    series = CandleSeries.from_raw(make_raw(0, 5))
+
+    tail = series[-2:]
+    assert len(tail) == 2
+    assert tail.timestamp.tolist() == [180_000, 240_000]
+    for name in FIELDS:
+        assert np.shares_memory(tail[name], series[name])
+
+    last = series[-1]
+    assert last == {'timestamp': 240_000, 'open': 104.0, 'high': 105.0, 'low': 103.0, 'close': 104.5,
+                    'volume': 10.0, 'close_time': 299_999, 'quote_volume': 1000.0, 'trades': 42}
+    assert type(last['timestamp']) is int and type(last['close']) is float
+
+
+def test_series_iterates_lazily():
+    series = CandleSeries.from_raw(make_raw(0, 3))
+    rows = iter(series)
+    assert inspect.isgenerator(rows)
+    assert next(rows) == series[0]
+    assert [candle['close'] for candle in series] == series['close'].tolist()
@@ -0,0 +1,90 @@
+"""
+Testes do TTLCache (cache com TTL + single-flight) do data_provider
+"""
+import threading
+import time
+import pytest
+from data_provider import TTLCache
+
+
+def run_concurrently(count, target):
+    """Dispara `count` threads ao mesmo tempo -> lista de (resultado, erro)"""
+    barrier = threading.Barrier(count)
+    outcomes = [None] * count
+
+    def worker(i):
+        barrier.wait()
+        try:
+            outcomes[i] = (target(), None)
+        except Exception as e:
+            outcomes[i] = (None, e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+def test_concurrent_callers_share_one_fetch():
+    cache = TTLCache()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return {'price': 1.0}
+
+    outcomes = run_concurrently(8, lambda: cache.get_or_fetch('ticker', 10, fetch))
+
+    assert len(calls) == 1
+    assert all(error is None and value is outcomes[0][0] for value, error in outcomes)
+    stats = cache.get_stats()
+    assert stats['misses'] == 1 and stats['coalesced'] == 7
+
+
+def test_entries_expire_after_ttl():
+    cache = TTLCache()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.get_or_fetch('key', 0.05, fetch) == 1
+    assert cache.get_or_fetch('key', 0.05, fetch) == 1
+    time.sleep(0.08)
+    assert cache.get_or_fetch('key', 0.05, fetch) == 2
+    assert cache.get_stats()['hits'] == 1
+
+
+def test_error_reaches_every_waiter_without_poisoning_the_cache():
+    cache = TTLCache()
+    calls = []
+
+    def failing():
+        calls.append(1)
+        time.sleep(0.2)
+        raise ConnectionError('timeout')
+
+    outcomes = run_concurrently(5, lambda: cache.get_or_fetch('ticker', 10, failing))
+
+    assert len(calls) == 1
+    assert all(isinstance(error, ConnectionError) for _, error in outcomes)
+    assert cache.get_stats()['errors'] == 1 and cache.get_stats()['entries'] == 0
+
+    # Próxima chamada busca de novo (o erro não ficou em cache)
+    assert cache.get_or_fetch('ticker', 10, lambda: 'ok') == 'ok'
+    with pytest.raises(KeyError):
+        cache.get_or_fetch('other', 10, lambda: {}['missing'])
+
+
+def test_invalidate_single_key():
+    cache = TTLCache()
+    cache.get_or_fetch('a', 10, lambda: 1)
+    cache.get_or_fetch('b', 10, lambda: 2)
+
+    cache.invalidate('a')
+    assert cache.get_or_fetch('a', 10, lambda: 3) == 3
+    assert cache.get_or_fetch('b', 10, lambda: 4) == 2
@@ -0,0 +1,167 @@
+"""
+Teste do cliente HTTP contra um servidor local com respostas roteirizadas (não precisa de internet)
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import http_client
+from http_client import BinanceHTTPClient, BinanceAPIError
+
+
+class ScriptedServer:
+    """Responde cada requisição com o próximo item de `responses`: (status, headers, corpo)"""
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.request_times = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.request_times.append(time.time())
+                status, headers, body = server.responses.pop(0) if len(server.responses) > 1 else server.responses[0]
+                body = body.encode()
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/fapi/v1"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeClock:
+    """Substitui o módulo time no http_client: sleep só avança o relógio"""
+    def __init__(self, now):
+        self.now = now
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def perf_counter(self):
+        return time.perf_counter()
+
+
+OK = (200, {}, '{"ok": true}')
+
+
+@pytest.mark.parametrize('status', [418, 429])
+def test_rate_limit_respects_retry_after(status):
+    server = ScriptedServer([(status, {'Retry-After': '1'}, '{}'), OK])
+    try:
+        client = BinanceHTTPClient(server.url, backoff_base=0.001)
+        start = time.time()
+        assert client.get('ping') == {'ok': True}
+
+        # Só o Retry-After (banned_until), sem uma segunda espera igual antes de repetir
+        assert 1 <= server.request_times[1] - server.request_times[0] < 1.5
+        assert client.banned_until >= start + 1
+        assert client.get_stats()['endpoints']['/ping']['retries'] == 1
+    finally:
+        server.close()
+
+
+def test_rate_limit_waits_once_at_the_shared_gate(monkeypatch):
+    clock = FakeClock(1000 * 60 + 10)
+    monkeypatch.setattr(http_client, 'time', clock)
+    server = ScriptedServer([(429, {'Retry-After': '3'}, '{}'), OK])
+    try:
+        client = BinanceHTTPClient(server.url, backoff_base=0.001)
+        assert client.get('ping') == {'ok': True}
+        # Uma única espera, em _reserve_weight (a mesma que segura as outras threads)
+        assert clock.sleeps == [pytest.approx(3.05)]
+    finally:
+        server.close()
+
+
+@pytest.mark.parametrize('status', [418, 429])
+def test_ban_blocks_later_calls(status):
+    server = ScriptedServer([(status, {'Retry-After': '1'}, '{}'), OK])
+    try:
+        client = BinanceHTTPClient(server.url, max_retries=0, backoff_base=0.001)
+        with pytest.raises(BinanceAPIError) as error:
+            client.get('ping')
+        assert error.value.status_code == status
+        banned_until = client.banned_until
+
+        # A chamada seguinte só sai depois do Retry-After
+        assert client.get('ping') == {'ok': True}
+        assert server.request_times[1] >= banned_until
+    finally:
+        server.close()
+
+
+def test_weight_header_pauses_until_minute_rollover(monkeypatch):
+    clock = FakeClock(1000 * 60 + 30)
+    monkeypatch.setattr(http_client, 'time', clock)
+    server = ScriptedServer([
+        (200, {'X-MBX-USED-WEIGHT-1M': '88'}, '[]'),
+        (200, {'X-MBX-USED-WEIGHT-1M': '5'}, '[]'),
+    ])
+    try:
+        client = BinanceHTTPClient(server.url, weight_limit=100)
+        client.get('klines', weight=1)
+        # Header da Binance vale mais que a contagem local (outros processos no mesmo IP)
+        assert client.used_weight == 88
+        assert clock.sleeps == []
+
+        # 88 + 5 passa de 90% do limite: esperar a virada do minuto
+        client.get('klines', weight=5)
+        assert clock.sleeps == [pytest.approx(30.05)]
+        assert client.weight_minute == 1001
+        assert client.used_weight == 5
+        assert len(server.request_times) == 2
+    finally:
+        server.close()
+
+
+def test_used_weight_resets_on_new_minute(monkeypatch):
+    clock = FakeClock(1000 * 60 + 59.5)
+    monkeypatch.setattr(http_client, 'time', clock)
+    server = ScriptedServer([(200, {'X-MBX-USED-WEIGHT': '80'}, '[]')])
+    try:
+        client = BinanceHTTPClient(server.url, weight_limit=100)
+        client.get('klines', weight=1)
+        assert client.used_weight == 80
+
+        # Minuto novo: o peso do minuto anterior não conta mais
+        clock.now += 1
+        assert client.get_stats()['used_weight'] == 0
+        client.get('klines', weight=20)
+        assert clock.sleeps == []
+    finally:
+        server.close()
+
+
+def test_invalid_body_is_retried_then_raises_api_error():
+    server = ScriptedServer([(200, {}, '{"trunc'), OK])
+    try:
+        client = BinanceHTTPClient(server.url, backoff_base=0.001)
+        assert client.get('ping') == {'ok': True}
+        assert client.get_stats()['endpoints']['/ping']['errors'] == 1
+    finally:
+        server.close()
+
+    server = ScriptedServer([(200, {}, '<html>gateway</html>')])
+    try:
+        client = BinanceHTTPClient(server.url, max_retries=2, backoff_base=0.001)
+        with pytest.raises(BinanceAPIError):
+            client.get('ping')
+        assert len(server.request_times) == 3
+    finally:
+        server.close()
@@ -0,0 +1,41 @@
+"""
+Teste dos kernels de indicadores em 2-D (ativos × tempo)
+"""
+import numpy as np
+import indicators
+from analyzer import TechnicalAnalyzer
+
+
+def make_closes(rows=4, count=300):
+    rng = np.random.default_rng(11)
+    return 100 + np.cumsum(rng.normal(0, 1, (rows, count)), axis=1)
+
+
+def test_rows_match_single_series():
+    closes = make_closes()
+
+    for kernel in (lambda x: indicators.ema(x, 20), lambda x: indicators.rsi(x, 14),
+                   lambda x: indicators.macd(x)[1], lambda x: indicators.bollinger(x)[0],
+                   lambda x: indicators.stoch_rsi(x, 15, 5, 3, 3)[2]):
+        batch = kernel(closes)
+        assert batch.shape == closes.shape
+        for row in range(len(closes)):
+            assert np.allclose(batch[row], kernel(closes[row]), equal_nan=True)
+
+
+def test_recursive_kernels_match_loops():
+    closes = make_closes(rows=2)
+
+    # EMA semeada com SMA, calculada vela a vela
+    alpha = 2 / 21
+    expected = np.full(closes.shape[1], np.nan)
+    expected[19] = closes[0, :20].mean()
+    for t in range(20, closes.shape[1]):
+        expected[t] = (1 - alpha) * expected[t - 1] + alpha * closes[0, t]
+    assert np.allclose(indicators.ema(closes, 20)[0], expected, equal_nan=True)
+
+    # RSI de Wilder igual ao calculate_rsi
+    analyzer = TechnicalAnalyzer()
+    rsi = indicators.rsi(closes, 14)
+    for t in (14, 100, closes.shape[1] - 1):
+        assert np.isclose(rsi[1, t], analyzer.calculate_rsi(closes[1, :t + 1], 14))
@@ -0,0 +1,117 @@
+"""
+Teste do armazenamento local de velas (não precisa de internet)
+"""
+import os
+import numpy as np
+import pytest
+from kline_store import KlineStore, COLUMNS, raw_to_columns
+
+
+def make_raw(start, count, step=300_000):
+    """Gera velas cruas no formato da Binance"""
+    klines = []
+    for i in range(count):
+        ts = start + i * step
+        price = 100.0 + i
+        klines.append([ts, str(price), str(price + 1), str(price - 1), str(price + 0.5),
+                       '10.0', ts + step - 1, '1000.0', 42])
+    return klines
+
+
+def test_append_and_reload(tmp_path):
+    store = KlineStore(str(tmp_path))
+    assert store.last_timestamp('BTCUSDT', '5m') is None
+
+    added = store.append('BTCUSDT', '5m', raw_to_columns(make_raw(0, 10)))
+    assert added == 10
+
+    # Reabrir em outra instância (simula reinício do app)
+    store = KlineStore(str(tmp_path))
+    columns = store.load('BTCUSDT', '5m')
+    assert len(columns['timestamp']) == 10
+    assert columns['close'][3] == 103.5
+    assert store.first_timestamp('BTCUSDT', '5m') == 0
+    assert store.last_timestamp('BTCUSDT', '5m') == 9 * 300_000
+
+
+def test_append_skips_duplicates(tmp_path):
+    store = KlineStore(str(tmp_path))
+    store.append('BTCUSDT', '5m', raw_to_columns(make_raw(0, 10)))
+
+    # Sobreposição de 5 velas: só as 5 novas devem ser gravadas
+    added = store.append('BTCUSDT', '5m', raw_to_columns(make_raw(5 * 300_000, 10)))
+    assert added == 5
+
+    timestamps = np.asarray(store.load('BTCUSDT', '5m')['timestamp'])
+    assert len(timestamps) == 15
+    assert np.all(np.diff(timestamps) == 300_000)
+
+
+def test_interrupted_write_is_truncated(tmp_path):
+    store = KlineStore(str(tmp_path))
+    store.append('BTCUSDT', '5m', raw_to_columns(make_raw(0, 10)))
+
+    # Simular escrita interrompida: só a coluna 'open' recebeu uma vela a mais
+    path = os.path.join(str(tmp_path), 'BTCUSDT_5m', 'open.f8')
+    with open(path, 'ab') as f:
+        f.write(np.array([1.0]).tobytes())
+
+    assert store.count('BTCUSDT', '5m') == 10
+    for name, dtype in COLUMNS:
+        size = os.path.getsize(os.path.join(str(tmp_path), 'BTCUSDT_5m', f"{name}.{dtype[1:]}"))
+        assert size == 10 * np.dtype(dtype).itemsize
+
+
+def test_listing_time_roundtrip(tmp_path):
+    store = KlineStore(str(tmp_path))
+    assert store.listing_time('NEWUSDT', '5m') is None
+
+    store.set_listing_time('NEWUSDT', '5m', 1_700_000_000_000)
+    store.append('NEWUSDT', '5m', raw_to_columns(make_raw(1_700_000_000_000, 3)))
+
+    reopened = KlineStore(str(tmp_path))
+    assert reopened.listing_time('NEWUSDT', '5m') == 1_700_000_000_000
+    assert reopened.listing_time('NEWUSDT', '1m') is None
+    assert reopened.count('NEWUSDT', '5m') == 3
+
+
+def test_replace_swaps_the_whole_generation(tmp_path):
+    store = KlineStore(str(tmp_path))
+    store.append('BTCUSDT', '5m', raw_to_columns(make_raw(3_000_000, 5)))
+    store.set_listing_time('BTCUSDT', '5m', 0)
+    old = store.load('BTCUSDT', '5m')
+
+    store.replace('BTCUSDT', '5m', raw_to_columns(make_raw(0, 15)))
+
+    assert store.count('BTCUSDT', '5m') == 15
+    assert store.first_timestamp('BTCUSDT', '5m') == 0
+    assert store.listing_time('BTCUSDT', '5m') == 0
+    # Memmap aberto antes da troca continua lendo a geração antiga inteira
+    assert old['timestamp'][0] == 3_000_000 and len(old['close']) == 5
+    assert sorted(os.listdir(tmp_path)) == ['BTCUSDT_5m']
+
+
+def test_interrupted_replace_keeps_the_old_generation(tmp_path, monkeypatch):
+    store = KlineStore(str(tmp_path))
+    store.append('BTCUSDT', '5m', raw_to_columns(make_raw(3_000_000, 5)))
+
+    # Queda entre as duas trocas de pasta: atual já virou .old, a nova ainda não entrou
+    rename = os.rename
+    calls = []
+
+    def crash_on_second(src, dst):
+        calls.append(src)
+        if len(calls) == 2:
+            raise OSError('queda simulada')
+        rename(src, dst)
+
+    monkeypatch.setattr(os, 'rename', crash_on_second)
+    with pytest.raises(OSError):
+        store.replace('BTCUSDT', '5m', raw_to_columns(make_raw(0, 15)))
+    monkeypatch.setattr(os, 'rename', rename)
+
+    reopened = KlineStore(str(tmp_path))
+    columns = reopened.load('BTCUSDT', '5m')
+    assert len(columns['timestamp']) == 5
+    assert columns['timestamp'][0] == 3_000_000
+    assert all(len(columns[name]) == 5 for name, _ in COLUMNS)
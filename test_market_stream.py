@@ -0,0 +1,171 @@
+"""
+Teste do modo streaming contra um servidor WebSocket local (não precisa de internet)
+"""
+import json
+import socket
+import threading
+import time
+import simple_websocket
+from candles import CandleSeries
+from data_provider import BinanceDataProvider, MarketStream
+
+
+class LocalStreamServer:
+    """Servidor WebSocket mínimo que envia mensagens no formato do stream combinado"""
+    def __init__(self, messages, close_after_send=False):
+        self.messages = messages
+        self.close_after_send = close_after_send
+        self.connections = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(5)
+        self.url = f"ws://127.0.0.1:{self.sock.getsockname()[1]}/stream"
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        # Ler o handshake HTTP e montar um environ estilo WSGI
+        request = b''
+        while b'\r\n\r\n' not in request:
+            request += conn.recv(4096)
+        environ = {'werkzeug.socket': conn}
+        for line in request.decode().split('\r\n')[1:]:
+            if ':' in line:
+                key, value = line.split(':', 1)
+                environ['HTTP_' + key.strip().upper().replace('-', '_')] = value.strip()
+
+        ws = simple_websocket.Server(environ)
+        self.connections += 1
+        for message in self.messages:
+            ws.send(json.dumps(message))
+
+        if self.close_after_send:
+            ws.close()
+            return
+
+        while ws.connected:
+            time.sleep(0.05)
+
+    def close(self):
+        self.sock.close()
+
+
+def kline_message(ts, close, closed=False):
+    return {'stream': 'btcusdt@kline_1m', 'data': {
+        'e': 'kline', 's': 'BTCUSDT',
+        'k': {'t': ts, 'T': ts + 59_999, 'o': '100', 'h': '110', 'l': '90', 'c': str(close),
+              'v': '1', 'q': '100', 'n': 10, 'x': closed}
+    }}
+
+
+def ticker_message(price, change):
+    return {'stream': 'btcusdt@ticker', 'data': {'e': '24hrTicker', 'c': str(price), 'P': str(change)}}
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_stream_feeds_market_data(tmp_path):
+    server = LocalStreamServer([
+        kline_message(0, 100, closed=True),
+        kline_message(60_000, 102),
+        ticker_message(102, 3.5),
+    ])
+    provider = BinanceDataProvider(store_dir=str(tmp_path))
+    provider.get_latest_klines = lambda limit=100, symbol=None, interval=None: CandleSeries.empty()
+
+    stream = provider.start_stream(stream_url=server.url)
+    try:
+        assert wait_for(lambda: stream.snapshot()['change_24h'] == 3.5)
+
+        data = provider.get_market_data()
+        assert data['price'] == 102
+        assert data['change_24h'] == 3.5
+        assert data['change_5min'] == 2.0
+
+        # A vela fechada foi gravada no armazenamento local
+        assert provider.store.last_timestamp('BTCUSDT', '1m') == 0
+    finally:
+        provider.stop_stream()
+        server.close()
+
+
+def test_stream_reconnects(tmp_path):
+    server = LocalStreamServer([ticker_message(100, 1.0)], close_after_send=True)
+    provider = BinanceDataProvider(store_dir=str(tmp_path))
+    provider.get_latest_klines = lambda limit=100, symbol=None, interval=None: CandleSeries.empty()
+
+    stream = provider.start_stream(stream_url=server.url)
+    stream.reconnect_delay = 0.05
+    try:
+        assert wait_for(lambda: server.connections >= 2)
+        assert stream.reconnects >= 1
+    finally:
+        provider.stop_stream()
+        server.close()
+
+
+def test_closed_candle_is_stored_outside_the_stream_lock(tmp_path):
+    provider = BinanceDataProvider(store_dir=str(tmp_path))
+    stream = MarketStream(provider)
+    writing = threading.Event()
+    release = threading.Event()
+
+    def slow_append(symbol, interval, candle):
+        writing.set()
+        release.wait(5)
+        return True
+
+    provider.append_candle = slow_append
+    handler = threading.Thread(target=stream.handle_message, args=(json.dumps(kline_message(0, 100, closed=True)),))
+    handler.start()
+    try:
+        assert writing.wait(5)
+        # Com a gravação em andamento, o estado continua acessível
+        reader = threading.Thread(target=stream.snapshot)
+        reader.start()
+        reader.join(1)
+        assert not reader.is_alive()
+        assert stream.snapshot()['price'] == 100
+    finally:
+        release.set()
+        handler.join(5)
+
+
+def test_gap_in_closed_candles_triggers_sync(tmp_path):
+    provider = BinanceDataProvider(store_dir=str(tmp_path))
+    provider.append_candle('BTCUSDT', '1m', CandleSeries.from_dicts([
+        {'timestamp': 0, 'close': 100.0, 'close_time': 59_999}])[0])
+    synced = threading.Event()
+    provider.sync_klines = lambda symbol=None, interval=None: synced.set() or []
+
+    stream = MarketStream(provider)
+    # Vela seguinte contígua: gravada sem sincronizar
+    stream.handle_message(json.dumps(kline_message(60_000, 101, closed=True)))
+    assert provider.store.last_timestamp('BTCUSDT', '1m') == 60_000
+    assert not synced.wait(0.2)
+
+    # Velas das 00:02 e 00:03 perdidas: buraco preenchido via REST
+    stream.handle_message(json.dumps(kline_message(240_000, 104, closed=True)))
+    assert synced.wait(5)
+    assert provider.store.last_timestamp('BTCUSDT', '1m') == 60_000
+
+    # Mensagem repetida (reconexão) não dispara nova sincronização
+    synced.clear()
+    stream._gap_sync.join(5)
+    stream.handle_message(json.dumps(kline_message(60_000, 101, closed=True)))
+    assert not synced.wait(0.2)
@@ -0,0 +1,57 @@
+"""
+Testes do Monte Carlo: estatísticas vetorizadas x loop, ruína e desempenho
+"""
+import numpy as np
+from montecarlo import analyze, path_statistics, simulate, trade_pnls
+
+
+def reference(pnls, initial_capital, ruin_level):
+    """Um caminho trade a trade, parando na ruína"""
+    equity = peak = initial_capital
+    drawdown = drawdown_percent = 0.0
+    for pnl in pnls:
+        equity += pnl
+        peak = max(peak, equity)
+        drawdown = max(drawdown, peak - equity)
+        drawdown_percent = max(drawdown_percent, (peak - equity) / peak * 100)
+        if equity < ruin_level:
+            return equity, drawdown, drawdown_percent, True
+    return equity, drawdown, drawdown_percent, False
+
+
+def test_path_statistics_match_loop():
+    samples = np.random.default_rng(0).normal(0.5, 6, (200, 40))
+    final, drawdown, drawdown_percent, ruined = path_statistics(samples, 35.0, 25.0)
+
+    for i, row in enumerate(samples):
+        expected = reference(row, 35.0, 25.0)
+        assert np.allclose((final[i], drawdown[i], drawdown_percent[i]), expected[:3])
+        assert ruined[i] == expected[3]
+
+
+def test_ruin_probabilities():
+    # Permutação de [+10, -30]: qualquer ordem termina abaixo de $25
+    result = simulate([10.0, -30.0], paths=1000, method='permutation', seed=1)
+    assert result['ruined'].all()
+
+    # Bootstrap de 1 trade: ruína só quando sai o -30 (metade das vezes)
+    result = simulate([10.0, -30.0], paths=20_000, length=1, seed=1)
+    assert abs(result['ruined'].mean() - 0.5) < 0.02
+
+
+def test_accepts_trade_records_and_reports_observed():
+    trades = [{'status': 'open', 'pnl_dollar': 0.0}] + [{'status': 'closed', 'pnl_dollar': v} for v in (5.0, -3.0, 4.0)]
+    assert trade_pnls(trades).tolist() == [5.0, -3.0, 4.0]
+
+    summary = analyze(trades, paths=500, method='permutation', seed=0)
+    assert summary['trades'] == 3 and summary['probability_of_ruin'] == 0
+    assert summary['observed']['final_capital'] == 41.0
+    # Permutação não muda o P&L final
+    assert np.isclose(summary['final_capital']['p5'], 41.0) and np.isclose(summary['final_capital']['p95'], 41.0)
+
+
+def test_hundred_thousand_paths_in_seconds():
+    pnls = np.random.default_rng(2).normal(0.3, 8, 200)
+    summary = analyze(pnls, paths=100_000, seed=3)
+    assert summary['paths'] == 100_000
+    assert summary['elapsed'] < 10
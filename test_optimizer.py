@@ -0,0 +1,99 @@
+"""
+Testes do optimizer: memória compartilhada, resultados iguais ao Backtester e retomada
+"""
+import csv
+import os
+import numpy as np
+import pytest
+from backtest import Backtester
+from optimizer import (SharedCandles, parameter_grid, run_optimization, time_windows,
+                       completed_keys, load_results, PARAM_COLUMNS)
+from strategy import StochRSIStrategy
+from test_backtest import make_candles
+
+
+def test_shared_candles_round_trip():
+    candles = make_candles(count=300)
+    with SharedCandles(candles) as shared:
+        shm, series = SharedCandles.attach(shared.descriptor)
+        for name in candles.columns:
+            assert np.array_equal(series[name], candles[name])
+        del series
+        shm.close()
+
+
+def test_pool_results_match_backtester_and_resume(tmp_path):
+    candles = make_candles(count=3000)
+    path = str(tmp_path / 'results.csv')
+    windows = time_windows(candles, 2)
+    jobs = parameter_grid((14, 15), (5,), (3,), (3,), stop_losses=(3.0, 5.0), leverages=(50,), windows=windows)
+    assert len(jobs) == 8
+
+    # Primeira metade, depois a busca inteira: só os jobs faltantes rodam
+    run_optimization(candles, jobs[:3], path, workers=2, verbose=False)
+    results = run_optimization(candles, jobs, path, workers=2, verbose=False)
+    assert len(results) == len(jobs) == len(completed_keys(path))
+
+    for row in results:
+        params = tuple(int(row[name]) for name in PARAM_COLUMNS[:4])
+        backtester = Backtester(StochRSIStrategy(params), leverage=int(row['leverage']),
+                                stop_loss_percent=row['stop_loss_percent'])
+        # Sinais do histórico inteiro, fatiados na janela (como o worker)
+        signals, confirmed = backtester.prepare(candles)
+        window = (candles['timestamp'] >= row['start']) & (candles['timestamp'] <= row['end'])
+        first, last = np.flatnonzero(window)[[0, -1]]
+        expected = backtester.run(candles[first:last + 1], prepared=(signals[first:last + 1], confirmed[first:last + 1]))
+        stats = expected['statistics']
+        assert row['total_trades'] == stats['total_trades']
+        assert np.isclose(row['total_pnl'], stats['total_pnl'])
+
+
+def test_interrupted_row_is_discarded(tmp_path):
+    candles = make_candles(count=1500)
+    path = str(tmp_path / 'results.csv')
+    jobs = parameter_grid((15,), (5,), (3,), (3,), stop_losses=(4.0, 5.0))
+
+    run_optimization(candles, jobs[:1], path, workers=1, verbose=False)
+    with open(path, 'a') as f:
+        f.write('15,5,3,3,5.0,50,25.0,,,12')   # linha cortada no meio
+
+    results = run_optimization(candles, jobs, path, workers=1, verbose=False)
+    assert len(results) == 2
+    with open(path, newline='') as f:
+        assert len(list(csv.reader(f))) == 3
+    assert len(load_results(path)) == 2
+
+
+def test_refuses_to_resume_with_other_candles_or_settings(tmp_path):
+    path = str(tmp_path / 'results.csv')
+    jobs = parameter_grid((15,), (5,), (3,), (3,))
+
+    first = run_optimization(make_candles(count=1500, seed=1), jobs, path, workers=1, verbose=False)
+    assert len(first) == 1
+
+    # Mesma grade e janela (histórico inteiro), outras velas: não pode reaproveitar
+    with pytest.raises(ValueError, match='sha1'):
+        run_optimization(make_candles(count=1500, seed=2), jobs, path, workers=1, verbose=False)
+    with pytest.raises(ValueError, match='initial_capital'):
+        run_optimization(make_candles(count=1500, seed=1), jobs, path, workers=1, verbose=False, initial_capital=100)
+
+    # Mesmas velas e configuração: retoma normalmente
+    again = run_optimization(make_candles(count=1500, seed=1), jobs, path, workers=1, verbose=False)
+    assert len(again) == 1 and again['total_pnl'][0] == first['total_pnl'][0]
+
+
+def test_default_results_file_follows_the_candles(tmp_path):
+    jobs = parameter_grid((15,), (5,), (3,), (3,))
+
+    # Sem --out: histórico novo (ex: provedor ao vivo) começa outro arquivo em vez de falhar
+    first = run_optimization(make_candles(count=1500, seed=1), jobs, workers=1, verbose=False,
+                             results_dir=str(tmp_path))
+    run_optimization(make_candles(count=1500, seed=2), jobs, workers=1, verbose=False, results_dir=str(tmp_path))
+    files = sorted(name for name in os.listdir(tmp_path) if name.endswith('.csv'))
+    assert len(files) == 2 and all(name.startswith('results-') for name in files)
+
+    # As mesmas velas de novo: retoma o arquivo delas
+    again = run_optimization(make_candles(count=1500, seed=1), jobs, workers=1, verbose=False,
+                             results_dir=str(tmp_path))
+    assert len(again) == 1 and again['total_pnl'][0] == first['total_pnl'][0]
+    assert len([name for name in os.listdir(tmp_path) if name.endswith('.csv')]) == 2
@@ -0,0 +1,55 @@
+"""
+Testes de Position/PositionBook e da integração com o TradeSimulator
+"""
+import json
+from datetime import datetime
+from positions import Position, PositionBook
+from trader import TradeSimulator
+
+
+def test_position_serializes_to_the_old_json_shape():
+    sim = TradeSimulator()
+    position, _ = sim.open_position('LONG', 40_000, timestamp=datetime(2024, 1, 1))
+
+    data = position.to_dict()
+    assert list(data) == [
+        'id', 'type', 'entry_price', 'current_price', 'amount', 'position_size',
+        'stop_loss', 'initial_stop', 'trailing_stop', 'highest_price', 'lowest_price',
+        'pnl_percent', 'pnl_dollar', 'open_time', 'close_time', 'status',
+    ]
+    assert position['type'] == position.type == 'LONG'
+    assert 'close_price' not in position and position.get('close_price', 1) == 1
+
+    sim.close_position(position, 41_000, 'Manual', timestamp=datetime(2024, 1, 2))
+    closed = json.loads(json.dumps(position.to_dict()))
+    assert closed['close_reason'] == 'Manual' and closed['status'] == 'closed'
+    assert not hasattr(position, '__dict__')
+
+
+def test_book_indexes_by_side_and_tracks_invested():
+    book = PositionBook()
+    positions = [Position(id=f"P{i}", type='LONG' if i % 2 else 'SHORT', amount=10.0) for i in range(6)]
+    for position in positions:
+        book.add(position)
+
+    assert len(book) == 6 and book.invested == 60
+    assert [p.id for p in book.side('LONG')] == ['P1', 'P3', 'P5']
+
+    for position in book.side('SHORT'):
+        book.remove(position)
+    assert len(book) == 3 and book.invested == 30 and not book.has_side('SHORT')
+    assert positions[1] in book and positions[0] not in book
+    assert book.unique_id('P1') == 'P1_2'
+
+
+def test_simulator_uses_book_for_capital_checks():
+    sim = TradeSimulator(initial_capital=50, investment_per_trade=25)
+    moment = datetime(2024, 1, 1)
+
+    long_position, _ = sim.open_position('LONG', 100, timestamp=moment)
+    assert sim.open_position('LONG', 100, timestamp=moment)[0] is None
+    short_position, _ = sim.open_position('SHORT', 100, timestamp=moment)
+    assert sim.open_positions.invested == 50
+
+    sim.close_position(long_position, 100)
+    assert sim.open_positions.invested == 25 and sim.open_positions.get(short_position.id) is short_position
@@ -5,6 +5,7 @@ Compare com TradingView manualmente
 from data_provider import data_provider
 from analyzer import analyzer
 from datetime import datetime
+import numpy as np
 
 print("="*60)
 print("🧪 TESTE STOCH RSI - Comparação com TradingView")
@@ -36,7 +37,7 @@ print("\n" + "="*60)
 print("\n🔢 CÁLCULO DETALHADO DO STOCH RSI:")
 print("="*60)
 
-closes = [k['close'] for k in klines]
+closes = klines['close']
 
 # Mostrar parâmetros
 print(f"\nParâmetros:")
@@ -50,9 +51,12 @@ print(f"  Método RSI: EMA (Wilder)")
 print(f"\n📊 Stoch RSI das últimas 10 velas:")
 print("-"*60)
 
+# Série completa calculada uma única vez
+_, _, k_series, d_series = analyzer.stoch_rsi_series(closes, 15, 5, 3, 3)
+
 for i in range(-10, 0):
-    closes_subset = closes[:len(closes)+i+1]
-    k_val, d_val = analyzer.calculate_stoch_rsi(closes_subset, 15, 5, 3, 3)
+    k_val = None if np.isnan(k_series[i]) else k_series[i]
+    d_val = None if np.isnan(d_series[i]) else d_series[i]
     
     dt = datetime.fromtimestamp(klines[i]['timestamp'] / 1000)
     k_str = f"{k_val:.2f}" if k_val is not None else "N/A"
@@ -0,0 +1,40 @@
+"""
+Teste da estratégia vetorizada contra o sinal ao vivo do analyzer
+"""
+import numpy as np
+from analyzer import TechnicalAnalyzer
+from strategy import StochRSIStrategy, SIGNAL_NAMES, LONG, SHORT
+
+
+def make_closes(count=200, seed=3):
+    return 100 + np.cumsum(np.random.default_rng(seed).normal(0, 1, count))
+
+
+def test_generate_matches_live_analysis():
+    closes = make_closes()
+    klines = [{'timestamp': i * 300_000, 'close': p} for i, p in enumerate(closes)]
+    strategy = StochRSIStrategy()
+    analyzer = TechnicalAnalyzer(strategy=strategy)
+
+    signals = strategy.generate({'close': closes})
+    entries = strategy.confirm({'close': closes}, signals)
+
+    # Ao vivo: a última vela está aberta, o sinal é o da penúltima
+    for n in range(40, len(closes) + 1):
+        analysis = analyzer.analyze_klines(klines[:n], verbose=False)
+        assert SIGNAL_NAMES[signals[n - 2]] == analysis['signal']
+
+        if signals[n - 2] in (LONG, SHORT):
+            confirmed, _ = analyzer.check_entry_conditions(klines[:n], analysis['signal'])
+            assert entries[n - 1] == confirmed
+
+
+def test_generate_scans_many_symbols():
+    closes = np.stack([make_closes(seed=s) for s in range(5)])
+    strategy = StochRSIStrategy()
+
+    signals = strategy.generate({'close': closes})
+
+    assert signals.shape == closes.shape
+    for row in range(len(closes)):
+        assert np.array_equal(signals[row], strategy.generate({'close': closes[row]}))
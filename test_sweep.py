@@ -0,0 +1,35 @@
+"""
+Teste do sweep de parâmetros do Stoch RSI
+"""
+import numpy as np
+import indicators
+from sweep import stoch_rsi_sweep, combo_index
+
+
+def test_sweep_matches_single_combination():
+    rng = np.random.default_rng(4)
+    closes = 100 + np.cumsum(rng.normal(0, 1, 3000))
+    closes[500:540] = closes[500]  # trecho sem variação
+
+    # Blocos pequenos para exercitar a sobreposição entre blocos
+    combos, result = stoch_rsi_sweep(closes, [5, 15], [1, 3, 5], [1, 3], [2, 3],
+                                     chunk_size=700, dtype=np.float64)
+
+    assert result.shape == (len(combos), 2, len(closes))
+    for params in combos:
+        _, _, k, d = indicators.stoch_rsi(closes, *params)
+        row = combo_index(combos, params)
+        assert np.array_equal(result[row, 0], k, equal_nan=True)
+        assert np.array_equal(result[row, 1], d, equal_nan=True)
+
+
+def test_sweep_writes_into_memmap(tmp_path):
+    closes = 100 + np.cumsum(np.random.default_rng(1).normal(0, 1, 500))
+    out = np.lib.format.open_memmap(str(tmp_path / 'sweep.npy'), mode='w+',
+                                    dtype=np.float32, shape=(4, 2, 500))
+
+    combos, result = stoch_rsi_sweep(closes, [14, 15], [5], [3], [2, 3], out=out)
+
+    assert result is out
+    _, _, k, _ = indicators.stoch_rsi(closes, 15, 5, 3, 3)
+    assert np.allclose(out[combo_index(combos, (15, 5, 3, 3)), 0], k, equal_nan=True)
@@ -0,0 +1,90 @@
+"""
+Testes do TradeStats: agregados corridos x recálculo completo, persistência
+"""
+import os
+import numpy as np
+from trade_stats import TradeStats, EQUITY_FILE
+
+
+def brute_force(pnls, initial_capital):
+    equity = initial_capital + np.cumsum(pnls)
+    peaks = np.maximum.accumulate(np.r_[initial_capital, equity])[1:]
+    wins = pnls > 0
+
+    streaks, current = [], 0
+    for win in wins:
+        current = (current + 1 if current > 0 else 1) if win else (current - 1 if current < 0 else -1)
+        streaks.append(current)
+
+    return {
+        'won': int(wins.sum()),
+        'total_pnl': pnls.sum(),
+        'biggest_win': pnls.max(),
+        'biggest_loss': pnls.min(),
+        'profit_factor': pnls[wins].sum() / -pnls[~wins].sum(),
+        'expectancy': pnls.mean(),
+        'max_drawdown': (peaks - equity).max(),
+        'max_win_streak': max(streaks),
+        'max_loss_streak': -min(streaks),
+        'current_streak': streaks[-1],
+    }
+
+
+def test_running_aggregates_match_brute_force():
+    pnls = np.random.default_rng(1).normal(0.2, 5, 5000)
+    stats = TradeStats(initial_capital=100)
+    for pnl in pnls:
+        stats.add(pnl)
+
+    summary = stats.summary()
+    for name, value in brute_force(pnls, 100).items():
+        assert np.isclose(summary[name], value), name
+    assert summary['total_trades'] == 5000
+    assert np.allclose(stats.equity_curve, 100 + np.cumsum(pnls))
+
+
+def test_empty_stats_keep_old_shape():
+    summary = TradeStats().summary()
+    assert summary['total_trades'] == 0 and summary['win_rate'] == 0
+    assert summary['current_capital'] == 35.0 and summary['profit_factor'] is None
+
+
+def test_persists_across_restarts(tmp_path):
+    path = str(tmp_path / 'stats')
+    stats = TradeStats(path=path)
+    for pnl in (5.0, -2.0, 3.0):
+        stats.add(pnl)
+        stats.save()
+
+    restored = TradeStats(path=path)
+    assert restored.summary() == stats.summary()
+    assert restored.equity_curve.tolist() == [40.0, 38.0, 41.0]
+
+    # Curva com pontos a mais (gravação interrompida) é truncada no load
+    with open(os.path.join(path, EQUITY_FILE), 'ab') as f:
+        np.array([99.0]).tofile(f)
+    restored = TradeStats(path=path)
+    restored.add(1.0)
+    restored.save()
+    assert TradeStats(path=path).equity_curve.tolist() == [40.0, 38.0, 41.0, 42.0]
+
+
+def test_rebuild_from_trades_json_records():
+    trades = [
+        {'status': 'open', 'pnl_dollar': 0.0},
+        {'status': 'closed', 'pnl_dollar': 4.0},
+        {'status': 'closed', 'pnl_dollar': -1.5},
+    ]
+    stats = TradeStats.from_trades(trades)
+    assert stats.total_trades == 2 and stats.total_pnl == 2.5 and stats.max_drawdown == 1.5
+
+
+def test_equity_curve_does_not_block_new_trades():
+    stats = TradeStats(initial_capital=10.0)
+    stats.add(1.0)
+    curve = stats.equity_curve
+    stats.add(2.0)
+
+    assert curve.tolist() == [11.0]
+    assert stats.equity_curve.tolist() == [11.0, 13.0]
+    assert TradeStats().equity_curve.dtype == np.float64
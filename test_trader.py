@@ -0,0 +1,64 @@
+"""
+Testes do stop por vela (mínima/máxima) do TradeSimulator
+"""
+import numpy as np
+from trader import TradeSimulator
+
+
+def random_candles(rng, count=200):
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, count)))
+    opens = np.r_[100.0, closes[:-1]] * (1 + rng.normal(0, 0.002, count))
+    highs = np.maximum(opens, closes) * (1 + np.abs(rng.normal(0, 0.005, count)))
+    lows = np.minimum(opens, closes) * (1 - np.abs(rng.normal(0, 0.005, count)))
+    return opens, highs, lows, closes
+
+
+def test_stop_hit_uses_candle_range_and_gap_fill():
+    sim = TradeSimulator()
+    position, _ = sim.open_position('LONG', 100)
+    stop = position['trailing_stop']
+
+    # Toque pela mínima entre as consultas: sai no stop
+    assert sim.stop_hit(position, 100, 101, stop) == (True, stop)
+    # Vela já abriu abaixo do stop: sai na abertura
+    assert sim.stop_hit(position, stop - 1, stop, stop - 2) == (True, stop - 1)
+    assert sim.stop_hit(position, 100, 101, stop + 0.01) == (False, None)
+
+    hit, reason, price = sim.update_position_candle(position, {'open': 100, 'high': 100, 'low': stop, 'close': 99})
+    assert hit and reason == 'Trailing Stop' and price == stop
+
+
+def test_trailing_moves_only_on_candle_close():
+    sim = TradeSimulator()
+    position, _ = sim.open_position('SHORT', 100)
+    initial = position['trailing_stop']
+
+    sim.update_position_candle(position, {'open': 100, 'high': 100, 'low': 90, 'close': 95})
+    assert position['trailing_stop'] == initial
+
+    sim.update_position_candle(position, {'open': 100, 'high': 100, 'low': 90, 'close': 95}, candle_closed=True)
+    assert position['trailing_stop'] < initial
+
+
+def test_resolve_stop_matches_candle_by_candle():
+    rng = np.random.default_rng(3)
+
+    for run in range(100):
+        sim = TradeSimulator(initial_capital=1e6)
+        opens, highs, lows, closes = random_candles(rng)
+        side = 'LONG' if run % 2 else 'SHORT'
+
+        fast, _ = sim.open_position(side, 100)
+        slow = fast.copy()
+        index, price = sim.resolve_stop(fast, opens, highs, lows, closes)
+
+        expected = (None, None)
+        for j in range(len(closes)):
+            candle = {'open': opens[j], 'high': highs[j], 'low': lows[j], 'close': closes[j]}
+            hit, _, exit_price = sim.update_position_candle(slow, candle, candle_closed=True)
+            if hit:
+                expected = (j, exit_price)
+                break
+
+        assert (index, price) == expected
+        assert fast['trailing_stop'] == slow['trailing_stop']
@@ -0,0 +1,87 @@
+"""
+Testes do walk forward: janelas, escolha in-sample e out-of-sample costurado
+"""
+import os
+import numpy as np
+from backtest import Backtester
+from strategy import StochRSIStrategy
+from test_backtest import make_candles
+import walk_forward as walk_forward_module
+from walk_forward import WalkForward, walk_forward_windows
+
+
+def test_windows_roll_with_contiguous_out_of_sample():
+    candles = make_candles(count=10 * 288)
+    windows = walk_forward_windows(candles, in_sample_days=4, out_of_sample_days=2)
+
+    assert len(windows) == 3
+    step = 300_000
+    for window in windows:
+        assert window['out_of_sample'][0] == window['in_sample'][1] + step
+    for previous, current in zip(windows, windows[1:]):
+        assert current['out_of_sample'][0] == previous['out_of_sample'][1] + step
+
+
+def test_out_of_sample_uses_in_sample_winner(tmp_path):
+    candles = make_candles(count=12 * 288, seed=4)
+    walk_forward = WalkForward((10, 15), (5,), (3,), (3,), stop_losses=(3.0, 5.0), leverages=(10,),
+                               in_sample_days=4, out_of_sample_days=2, min_trades=1, initial_capital=1e4,
+                               workers=1, results_path=str(tmp_path / 'in_sample.csv'))
+    result = walk_forward.run(candles, verbose=False)
+
+    assert len(result['windows']) == 4
+    chosen = [w for w in result['windows'] if w['params'] is not None]
+    assert chosen
+
+    for window in chosen:
+        start, end = window['in_sample']
+        first, last = np.searchsorted(candles['timestamp'], [start, end + 1])
+
+        # O escolhido é o melhor P&L in-sample entre todas as combinações da grade
+        scores = []
+        for rsi_period in (10, 15):
+            for stop in (3.0, 5.0):
+                backtester = Backtester(StochRSIStrategy((rsi_period, 5, 3, 3)), initial_capital=1e4,
+                                        leverage=10, stop_loss_percent=stop)
+                signals, confirmed = backtester.prepare(candles)
+                stats = backtester.run(candles[first:last], prepared=(signals[first:last], confirmed[first:last]))
+                if stats['statistics']['total_trades'] >= 1:
+                    scores.append(stats['statistics']['total_pnl'])
+        assert np.isclose(window['in_sample_score'], max(scores))
+
+    # Curva costurada = soma dos trechos out-of-sample
+    stats = result['statistics']
+    assert stats['total_trades'] == len(result['trades']) == sum(w['statistics']['total_trades'] for w in chosen)
+    assert np.isclose(stats['total_pnl'], sum(w['statistics']['total_pnl'] for w in chosen))
+    assert len(result['equity_curve']) == stats['total_trades']
+
+
+def test_ignores_rows_from_other_grids_in_the_same_file(tmp_path):
+    candles = make_candles(count=12 * 288, seed=4)
+    path = str(tmp_path / 'in_sample.csv')
+    settings = dict(in_sample_days=4, out_of_sample_days=2, min_trades=1, initial_capital=1e4,
+                    workers=1, results_path=path)
+
+    WalkForward((10, 15, 21), (5,), (3,), (3,), leverages=(10,), **settings).run(candles, verbose=False)
+    result = WalkForward((15,), (5,), (3,), (3,), leverages=(10,), **settings).run(candles, verbose=False)
+
+    chosen = [w['params'] for w in result['windows'] if w['params'] is not None]
+    assert chosen and all(params['rsi_period'] == 15 for params in chosen)
+
+
+def test_default_results_follow_the_rolling_history(tmp_path, monkeypatch):
+    monkeypatch.setattr(walk_forward_module, 'DEFAULT_RESULTS_DIR', str(tmp_path))
+    candles = make_candles(count=13 * 288, seed=4)
+    settings = dict(in_sample_days=4, out_of_sample_days=2, min_trades=1, initial_capital=1e4, workers=1)
+    walk_forward = WalkForward((15,), (5,), (3,), (3,), leverages=(10,), **settings)
+
+    # Histórico de um dia depois (ex: --days 365 no dia seguinte): outro arquivo, sem ValueError
+    first = walk_forward.run(candles[:12 * 288], verbose=False)
+    walk_forward.run(candles[288:], verbose=False)
+    files = [name for name in os.listdir(tmp_path) if name.endswith('.csv')]
+    assert len(files) == 2 and all(name.startswith('in_sample-') for name in files)
+
+    # O mesmo histórico de novo retoma o arquivo dele
+    again = walk_forward.run(candles[:12 * 288], verbose=False)
+    assert len([name for name in os.listdir(tmp_path) if name.endswith('.csv')]) == 2
+    assert again['statistics'] == first['statistics']
@@ -0,0 +1,194 @@
+"""
+Trade Stats - Estatísticas de trading como agregados corridos
+
+Cada trade fechado atualiza os contadores em O(1): totais, ganhos/perdas
+brutos, maior ganho/perda, curva de capital, drawdown máximo e sequências.
+O custo de consultar as estatísticas não cresce com o histórico.
+
+Persistência (pasta, ex: data/stats):
+- stats.json: agregados, gravado atomicamente (arquivo .tmp + os.replace);
+- equity.f8: curva de capital, binário append-only (um float64 por trade).
+Se a gravação for interrompida, a curva é truncada ao tamanho do stats.json.
+"""
+import os
+import json
+from array import array
+import numpy as np
+
+STATS_FILE = 'stats.json'
+EQUITY_FILE = 'equity.f8'
+
+# Agregados salvos em stats.json
+FIELDS = (
+    'initial_capital', 'total_trades', 'won', 'lost', 'total_pnl', 'gross_profit', 'gross_loss',
+    'biggest_win', 'biggest_loss', 'peak', 'max_drawdown', 'max_drawdown_percent',
+    'streak', 'max_win_streak', 'max_loss_streak',
+)
+
+
+class TradeStats:
+    def __init__(self, initial_capital=35.0, path=None):
+        """
+        initial_capital: capital inicial (base da curva e dos percentuais)
+        path: pasta para persistir; se já existir, os agregados são carregados
+        """
+        self.path = path
+        self.initial_capital = initial_capital
+        self.total_trades = 0
+        self.won = 0
+        self.lost = 0
+        self.total_pnl = 0.0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        self.biggest_win = 0.0
+        self.biggest_loss = 0.0
+        self.peak = initial_capital
+        self.max_drawdown = 0.0
+        self.max_drawdown_percent = 0.0
+        self.streak = 0            # > 0: ganhos seguidos, < 0: perdas seguidas
+        self.max_win_streak = 0
+        self.max_loss_streak = 0
+        self._equity = array('d')
+        self._saved = 0            # pontos da curva já gravados em disco
+
+        if path and os.path.exists(os.path.join(path, STATS_FILE)):
+            self.load()
+
+    @property
+    def equity(self):
+        return self.initial_capital + self.total_pnl
+
+    @property
+    def equity_curve(self):
+        """
+        Capital após cada trade (cópia NumPy)
+        Uma view sobre o array('d') travaria o buffer: o próximo add() não poderia crescê-lo
+        """
+        return np.array(self._equity, dtype=np.float64)
+
+    def add(self, pnl):
+        """Registra um trade fechado (P&L em dólares)"""
+        pnl = float(pnl)
+        first = self.total_trades == 0
+        self.total_trades += 1
+        self.total_pnl += pnl
+
+        # Maior ganho/perda: maior e menor P&L (como o get_statistics original)
+        self.biggest_win = pnl if first else max(self.biggest_win, pnl)
+        self.biggest_loss = pnl if first else min(self.biggest_loss, pnl)
+
+        if pnl > 0:
+            self.won += 1
+            self.gross_profit += pnl
+            self.streak = self.streak + 1 if self.streak > 0 else 1
+            self.max_win_streak = max(self.max_win_streak, self.streak)
+        else:
+            self.lost += 1
+            self.gross_loss -= pnl
+            self.streak = self.streak - 1 if self.streak < 0 else -1
+            self.max_loss_streak = max(self.max_loss_streak, -self.streak)
+
+        # Curva de capital e drawdown
+        equity = self.equity
+        self._equity.append(equity)
+        self.peak = max(self.peak, equity)
+        drawdown = self.peak - equity
+        if drawdown > self.max_drawdown:
+            self.max_drawdown = drawdown
+            self.max_drawdown_percent = drawdown / self.peak * 100 if self.peak > 0 else 0.0
+
+    def summary(self):
+        """Estatísticas no formato do get_statistics + métricas de risco"""
+        total = self.total_trades
+        return {
+            'total_trades': total,
+            'won': self.won,
+            'lost': self.lost,
+            'win_rate': (self.won / total * 100) if total else 0,
+            'total_pnl': self.total_pnl,
+            'total_pnl_percent': (self.total_pnl / self.initial_capital) * 100,
+            'biggest_win': self.biggest_win,
+            'biggest_loss': self.biggest_loss,
+            'current_capital': self.equity,
+            'gross_profit': self.gross_profit,
+            'gross_loss': self.gross_loss,
+            'profit_factor': (self.gross_profit / self.gross_loss) if self.gross_loss else None,
+            'expectancy': (self.total_pnl / total) if total else 0,
+            'average_win': (self.gross_profit / self.won) if self.won else 0,
+            'average_loss': (-self.gross_loss / self.lost) if self.lost else 0,
+            'max_drawdown': self.max_drawdown,
+            'max_drawdown_percent': self.max_drawdown_percent,
+            'current_streak': self.streak,
+            'max_win_streak': self.max_win_streak,
+            'max_loss_streak': self.max_loss_streak,
+        }
+
+    def save(self):
+        """Grava os pontos novos da curva e os agregados (O(1) por trade novo)"""
+        if not self.path:
+            return
+        os.makedirs(self.path, exist_ok=True)
+
+        # Curva primeiro: se cair no meio, o stats.json antigo trunca a curva no load
+        new_points = self._equity[self._saved:]
+        if len(new_points):
+            with open(os.path.join(self.path, EQUITY_FILE), 'ab') as f:
+                new_points.tofile(f)
+            self._saved = len(self._equity)
+
+        data = {name: getattr(self, name) for name in FIELDS}
+        stats_path = os.path.join(self.path, STATS_FILE)
+        tmp_path = stats_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, stats_path)
+
+    def load(self):
+        """Carrega agregados e curva de capital da pasta `path`"""
+        with open(os.path.join(self.path, STATS_FILE), 'r') as f:
+            data = json.load(f)
+        for name in FIELDS:
+            setattr(self, name, data[name])
+
+        equity_path = os.path.join(self.path, EQUITY_FILE)
+        self._equity = array('d')
+        if os.path.exists(equity_path):
+            with open(equity_path, 'rb') as f:
+                self._equity.frombytes(f.read(self.total_trades * self._equity.itemsize))
+        self._saved = len(self._equity)
+
+        # Escrita interrompida deixou pontos a mais: descartar no disco também
+        if os.path.exists(equity_path) and os.path.getsize(equity_path) > self._saved * self._equity.itemsize:
+            with open(equity_path, 'r+b') as f:
+                f.truncate(self._saved * self._equity.itemsize)
+
+    @classmethod
+    def from_trades(cls, trades, initial_capital=35.0, path=None):
+        """Reconstrói as estatísticas a partir de trades fechados (ex: trades.json antigo)"""
+        stats = cls(initial_capital)
+        stats.path = path
+        for trade in trades:
+            if trade.get('status') == 'closed':
+                stats.add(trade.get('pnl_dollar', 0))
+        return stats
+
+
+if __name__ == '__main__':
+    import time
+
+    print("🧪 Testando TradeStats...\n")
+
+    rng = np.random.default_rng(0)
+    pnls = rng.normal(0.5, 10, 200_000)
+
+    stats = TradeStats()
+    start = time.perf_counter()
+    for pnl in pnls:
+        stats.add(pnl)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    summary = stats.summary()
+    print(f"📊 {len(pnls)} trades em {elapsed:.0f} ms ({elapsed * 1000 / len(pnls):.2f} µs/trade)")
+    print(f"   Win rate: {summary['win_rate']:.1f}% | Profit factor: {summary['profit_factor']:.2f}")
+    print(f"   Drawdown máximo: ${summary['max_drawdown']:.2f} | Expectativa: ${summary['expectancy']:.2f}")
+    print(f"   Sequências: {summary['max_win_streak']} ganhos / {summary['max_loss_streak']} perdas")
@@ -3,6 +3,9 @@ Trader - Gerencia posições, stop loss, trailing stop e executa trades simulado
 """
 from datetime import datetime
 import json
+import numpy as np
+from positions import Position, PositionBook
+from trade_stats import TradeStats
 
 class TradeSimulator:
     def __init__(self, initial_capital=35.0, investment_per_trade=25.0, leverage=50):
@@ -12,19 +15,18 @@ class TradeSimulator:
         self.stop_loss_percent = 5.0  # 5% stop loss
         self.slippage_percent = 0.05  # 0.05% slippage realista
         
-        self.open_positions = []
+        self.open_positions = PositionBook()
         self.closed_trades = []
+        self.stats = TradeStats(initial_capital)  # agregados corridos dos trades fechados
         
     def can_open_position(self, position_type):
         """Verifica se há capital disponível para abrir posição"""
         # Verificar se já tem uma posição do mesmo tipo aberta
-        for pos in self.open_positions:
-            if pos['type'] == position_type:
-                return False, "Já existe uma posição deste tipo aberta"
+        if self.open_positions.has_side(position_type):
+            return False, "Já existe uma posição deste tipo aberta"
         
-        # Verificar capital disponível
-        total_invested = sum(pos['amount'] for pos in self.open_positions)
-        available = self.capital - total_invested
+        # Verificar capital disponível (total investido mantido pelo livro)
+        available = self.capital - self.open_positions.invested
         
         if available < self.investment_per_trade:
             return False, f"Capital insuficiente (disponível: ${available:.2f})"
@@ -44,8 +46,12 @@ class TradeSimulator:
             # Venda: preço um pouco menor
             return price * (1 - self.slippage_percent / 100)
     
-    def open_position(self, signal_type, entry_price):
-        """Abre uma nova posição (simulada)"""
+    def open_position(self, signal_type, entry_price, timestamp=None):
+        """
+        Abre uma nova posição (simulada)
+        timestamp: datetime da abertura (padrão: agora; o backtest passa o da vela)
+        """
+        opened_at = timestamp or datetime.now()
         can_open, reason = self.can_open_position(signal_type)
         
         if not can_open:
@@ -60,26 +66,26 @@ class TradeSimulator:
         else:  # SHORT
             stop_loss_price = actual_entry_price * (1 + self.stop_loss_percent / 100)
         
-        position = {
-            'id': f"{signal_type}_{int(datetime.now().timestamp())}",
-            'type': signal_type,
-            'entry_price': actual_entry_price,
-            'current_price': actual_entry_price,
-            'amount': self.investment_per_trade,
-            'position_size': self.calculate_position_size(),
-            'stop_loss': stop_loss_price,
-            'initial_stop': stop_loss_price,
-            'trailing_stop': stop_loss_price,
-            'highest_price': actual_entry_price if signal_type == 'LONG' else None,
-            'lowest_price': actual_entry_price if signal_type == 'SHORT' else None,
-            'pnl_percent': 0.0,
-            'pnl_dollar': 0.0,
-            'open_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'close_time': None,
-            'status': 'open'
-        }
-        
-        self.open_positions.append(position)
+        position = Position(
+            id=self.open_positions.unique_id(f"{signal_type}_{int(opened_at.timestamp())}"),
+            type=signal_type,
+            entry_price=actual_entry_price,
+            current_price=actual_entry_price,
+            amount=self.investment_per_trade,
+            position_size=self.calculate_position_size(),
+            stop_loss=stop_loss_price,
+            initial_stop=stop_loss_price,
+            trailing_stop=stop_loss_price,
+            highest_price=actual_entry_price if signal_type == 'LONG' else None,
+            lowest_price=actual_entry_price if signal_type == 'SHORT' else None,
+            pnl_percent=0.0,
+            pnl_dollar=0.0,
+            open_time=opened_at.strftime('%Y-%m-%d %H:%M:%S'),
+            close_time=None,
+            status='open',
+        )
+        
+        self.open_positions.add(position)
         
         return position, f"Posição {signal_type} aberta em ${actual_entry_price:.2f}"
     
@@ -91,56 +97,56 @@ class TradeSimulator:
         if not candle_closed:
             return  # Só atualiza quando a vela fechar
         
-        if position['type'] == 'LONG':
+        if position.type == 'LONG':
             # Atualizar highest_price
-            if current_price > position['highest_price']:
-                position['highest_price'] = current_price
+            if current_price > position.highest_price:
+                position.highest_price = current_price
                 
                 # Calcular novo trailing stop (5% abaixo do maior preço)
                 new_trailing = current_price * (1 - self.stop_loss_percent / 100)
                 
                 # Trailing stop só sobe
-                if new_trailing > position['trailing_stop']:
-                    position['trailing_stop'] = new_trailing
+                if new_trailing > position.trailing_stop:
+                    position.trailing_stop = new_trailing
         
         else:  # SHORT
             # Atualizar lowest_price
-            if position['lowest_price'] is None or current_price < position['lowest_price']:
-                position['lowest_price'] = current_price
+            if position.lowest_price is None or current_price < position.lowest_price:
+                position.lowest_price = current_price
                 
                 # Calcular novo trailing stop (5% acima do menor preço)
                 new_trailing = current_price * (1 + self.stop_loss_percent / 100)
                 
                 # Trailing stop só desce
-                if new_trailing < position['trailing_stop']:
-                    position['trailing_stop'] = new_trailing
+                if new_trailing < position.trailing_stop:
+                    position.trailing_stop = new_trailing
     
     def check_stop_loss(self, position, current_price):
         """Verifica se o trailing stop foi atingido"""
-        if position['type'] == 'LONG':
-            if current_price <= position['trailing_stop']:
+        if position.type == 'LONG':
+            if current_price <= position.trailing_stop:
                 return True, 'Trailing Stop'
         else:  # SHORT
-            if current_price >= position['trailing_stop']:
+            if current_price >= position.trailing_stop:
                 return True, 'Trailing Stop'
         
         return False, None
     
     def update_position(self, position, current_price, candle_closed=False):
         """Atualiza P&L de uma posição e verifica stop loss"""
-        position['current_price'] = current_price
+        position.current_price = current_price
         
         # Calcular P&L
-        if position['type'] == 'LONG':
-            price_change = (current_price - position['entry_price']) / position['entry_price']
+        if position.type == 'LONG':
+            price_change = (current_price - position.entry_price) / position.entry_price
         else:  # SHORT
-            price_change = (position['entry_price'] - current_price) / position['entry_price']
+            price_change = (position.entry_price - current_price) / position.entry_price
         
         # P&L percentual (considerando alavancagem)
-        position['pnl_percent'] = price_change * 100 * self.leverage
+        position.pnl_percent = price_change * 100 * self.leverage
         
         # P&L em dólares (sobre o investimento real)
-        position['pnl_dollar'] = position['amount'] * (position['pnl_percent'] / 100)
+        position.pnl_dollar = position.amount * (position.pnl_percent / 100)
         
         # Atualizar trailing stop (só quando vela fechar)
         self.update_trailing_stop(position, current_price, candle_closed)
@@ -150,22 +156,99 @@ class TradeSimulator:
         
         return hit_stop, stop_type
     
-    def close_position(self, position, close_price, reason='Manual'):
-        """Fecha uma posição"""
+    def stop_hit(self, position, open_price, high, low):
+        """
+        Stop atingido dentro de uma vela? -> (atingiu, preço de saída)
+        Caminho intrabar assumido: abertura -> extremo contra a posição -> resto da vela.
+        Como o trailing não anda dentro da vela, basta a mínima (LONG) / máxima (SHORT)
+        tocar o stop; a saída é no stop, ou na abertura se a vela já abriu além dele
+        """
+        stop = position.trailing_stop
+        if position.type == 'LONG':
+            if low <= stop:
+                return True, min(open_price, stop)
+        elif high >= stop:
+            return True, max(open_price, stop)
+        return False, None
+    
+    def update_position_candle(self, position, candle, candle_closed=False):
+        """
+        Atualiza a posição com uma vela (dict com open/high/low/close)
+        - stop checado com a mínima/máxima da vela (pega toques entre as consultas)
+        - P&L pelo fechamento (ou preço atual, se a vela ainda está aberta)
+        - trailing anda com o fechamento, só quando a vela fechar
+        Retorna (atingiu o stop, motivo, preço de saída)
+        """
+        hit_stop, exit_price = self.stop_hit(position, candle['open'], candle['high'], candle['low'])
+        if hit_stop:
+            return True, 'Trailing Stop', exit_price
+        
+        self.update_position(position, candle['close'], candle_closed)
+        return False, None, None
+    
+    def candle_stops(self, position, closes):
+        """
+        Stop em vigor durante cada vela de uma série (vetorizado)
+        O trailing só anda no fechamento: o stop da vela j usa os fechamentos até j-1
+        """
+        closes = np.asarray(closes, dtype=np.float64)
+        if position.type == 'LONG':
+            extremes = np.maximum.accumulate(np.r_[position.highest_price, closes[:-1]])
+            return np.maximum(extremes * (1 - self.stop_loss_percent / 100), position.trailing_stop)
+        
+        extremes = np.minimum.accumulate(np.r_[position.lowest_price, closes[:-1]])
+        return np.minimum(extremes * (1 + self.stop_loss_percent / 100), position.trailing_stop)
+    
+    def resolve_stop(self, position, opens, highs, lows, closes):
+        """
+        Avalia o stop vela a vela sobre uma série inteira de uma vez
+        Retorna (índice da vela que tocou o stop, preço de saída) ou (None, None).
+        O trailing da posição avança até a vela do stop (ou até o fim da série)
+        """
+        closes = np.asarray(closes, dtype=np.float64)
+        stops = self.candle_stops(position, closes)
+        
+        if position.type == 'LONG':
+            hits = np.asarray(lows) <= stops
+            exits = np.minimum(opens, stops)
+        else:
+            hits = np.asarray(highs) >= stops
+            exits = np.maximum(opens, stops)
+        
+        if hits.any():
+            index = int(hits.argmax())
+            self._advance_trailing(position, closes[:index])
+            return index, float(exits[index])
+        
+        self._advance_trailing(position, closes)
+        return None, None
+    
+    def _advance_trailing(self, position, closes):
+        """Aplica de uma vez os fechamentos ao trailing (mesmo resultado de update_trailing_stop)"""
+        if not len(closes):
+            return
+        if position.type == 'LONG':
+            self.update_trailing_stop(position, float(np.max(closes)), candle_closed=True)
+        else:
+            self.update_trailing_stop(position, float(np.min(closes)), candle_closed=True)
+    
+    def close_position(self, position, close_price, reason='Manual', timestamp=None):
+        """Fecha uma posição (timestamp: datetime do fechamento, padrão: agora)"""
         # Aplicar slippage na saída
-        actual_close_price = self.apply_slippage(close_price, is_buy=(position['type'] == 'SHORT'))
+        actual_close_price = self.apply_slippage(close_price, is_buy=(position.type == 'SHORT'))
         
         # Atualizar preço final
         self.update_position(position, actual_close_price)
         
         # Marcar como fechada
-        position['close_price'] = actual_close_price
-        position['close_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        position['close_reason'] = reason
-        position['status'] = 'closed'
+        position.close_price = actual_close_price
+        position.close_time = (timestamp or datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
+        position.close_reason = reason
+        position.status = 'closed'
         
-        # Atualizar capital
-        self.capital += position['pnl_dollar']
+        # Atualizar capital e estatísticas
+        self.capital += position.pnl_dollar
+        self.stats.add(position.pnl_dollar)
         
         # Mover para trades fechados
         self.closed_trades.append(position)
@@ -174,38 +257,10 @@ class TradeSimulator:
         return position
     
     def get_statistics(self):
-        """Retorna estatísticas de trading"""
-        if not self.closed_trades:
-            return {
-                'total_trades': 0,
-                'won': 0,
-                'lost': 0,
-                'win_rate': 0,
-                'total_pnl': 0,
-                'total_pnl_percent': 0,
-                'biggest_win': 0,
-                'biggest_loss': 0,
-                'current_capital': self.capital
-            }
-        
-        won = [t for t in self.closed_trades if t['pnl_dollar'] > 0]
-        lost = [t for t in self.closed_trades if t['pnl_dollar'] <= 0]
-        
-        total_pnl = sum(t['pnl_dollar'] for t in self.closed_trades)
-        biggest_win = max([t['pnl_dollar'] for t in self.closed_trades]) if self.closed_trades else 0
-        biggest_loss = min([t['pnl_dollar'] for t in self.closed_trades]) if self.closed_trades else 0
-        
-        return {
-            'total_trades': len(self.closed_trades),
-            'won': len(won),
-            'lost': len(lost),
-            'win_rate': (len(won) / len(self.closed_trades) * 100) if self.closed_trades else 0,
-            'total_pnl': total_pnl,
-            'total_pnl_percent': (total_pnl / 35.0) * 100,
-            'biggest_win': biggest_win,
-            'biggest_loss': biggest_loss,
-            'current_capital': self.capital
-        }
+        """Retorna estatísticas de trading (O(1): agregados corridos)"""
+        stats = self.stats.summary()
+        stats['current_capital'] = self.capital
+        return stats
 
 
 # Instância global
@@ -221,14 +276,14 @@ if __name__ == '__main__':
     # Simular abertura LONG
     pos, msg = sim.open_position('LONG', 40000)
     print(f"✅ {msg}")
-    print(f"📊 Stop Loss: ${pos['stop_loss']:.2f}")
-    print(f"💰 Tamanho da posição (com alavancagem): ${pos['position_size']:.2f}\n")
+    print(f"📊 Stop Loss: ${pos.stop_loss:.2f}")
+    print(f"💰 Tamanho da posição (com alavancagem): ${pos.position_size:.2f}\n")
     
     # Simular movimento de preço
     print("📈 Preço sobe para $41,000")
     sim.update_position(pos, 41000, candle_closed=True)
-    print(f"💵 P&L: {pos['pnl_percent']:.2f}% (${pos['pnl_dollar']:.2f})")
-    print(f"🛡️  Trailing Stop atualizado: ${pos['trailing_stop']:.2f}\n")
+    print(f"💵 P&L: {pos.pnl_percent:.2f}% (${pos.pnl_dollar:.2f})")
+    print(f"🛡️  Trailing Stop atualizado: ${pos.trailing_stop:.2f}\n")
     
     # Fechar posição
     closed = sim.close_position(pos, 41000, 'Take Profit')
@@ -0,0 +1,238 @@
+"""
+Walk Forward - Otimização em janelas móveis com avaliação fora da amostra
+
+O histórico é dividido em janelas móveis: em cada uma, os parâmetros são
+otimizados na parte in-sample (busca em paralelo do optimizer.py) e os
+escolhidos são avaliados na parte out-of-sample seguinte, com o Backtester
+(mesmas regras do TradeSimulator). O resultado final costura os trechos
+out-of-sample em uma única curva de capital.
+
+Os sinais de cada conjunto de parâmetros são calculados uma vez sobre o
+histórico inteiro e fatiados para cada janela, então janelas sobrepostas
+não recalculam indicadores (o Stoch RSI só depende dos últimos preços).
+"""
+import argparse
+import os
+from datetime import datetime
+import numpy as np
+
+from backtest import Backtester, load_candles
+from candles import as_series
+from kline_store import INTERVAL_MS
+from optimizer import parameter_grid, run_optimization, PARAM_COLUMNS
+from strategy import StochRSIStrategy
+from trade_stats import TradeStats
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESULTS_DIR = os.path.join(BASE_DIR, 'data', 'walk_forward')
+
+DAY_MS = 24 * 60 * 60_000
+
+
+def walk_forward_windows(series, in_sample_days=60, out_of_sample_days=15, step_days=None, interval='5m'):
+    """
+    Janelas móveis -> [{'in_sample': (ts inicial, ts final), 'out_of_sample': (ts inicial, ts final)}]
+    step_days: avanço entre janelas (padrão: out_of_sample_days, trechos OOS contíguos)
+    """
+    timestamps = series['timestamp']
+    per_day = DAY_MS // INTERVAL_MS[interval]
+    in_sample = int(in_sample_days * per_day)
+    out_of_sample = int(out_of_sample_days * per_day)
+    step = int((step_days or out_of_sample_days) * per_day)
+
+    windows = []
+    start = 0
+    while start + in_sample + out_of_sample <= len(timestamps):
+        split = start + in_sample
+        end = split + out_of_sample
+        windows.append({
+            'in_sample': (int(timestamps[start]), int(timestamps[split - 1])),
+            'out_of_sample': (int(timestamps[split]), int(timestamps[end - 1])),
+        })
+        start += step
+    return windows
+
+
+class PreparedCache:
+    """Sinais (Backtester.prepare) por parâmetros da estratégia, sobre o histórico inteiro"""
+
+    def __init__(self, series, **settings):
+        self.series = series
+        self.settings = settings
+        self.prepared = {}
+
+    def get(self, params):
+        if params not in self.prepared:
+            backtester = Backtester(StochRSIStrategy(params), **self.settings)
+            self.prepared[params] = backtester.prepare(self.series)
+        return self.prepared[params]
+
+    def window(self, params, start, end):
+        """(velas, (signals, confirmed)) de uma janela de timestamps"""
+        timestamps = self.series['timestamp']
+        first = int(np.searchsorted(timestamps, start))
+        last = int(np.searchsorted(timestamps, end, side='right'))
+        signals, confirmed = self.get(params)
+        return self.series[first:last], (signals[first:last], confirmed[first:last])
+
+
+def select_best(results, window, objective='total_pnl', min_trades=5, jobs=None):
+    """
+    Melhor linha in-sample de uma janela (None se nenhuma tiver trades suficientes)
+    jobs: só considera linhas desses jobs (a grade atual; o CSV pode ter linhas de outras grades)
+    """
+    start, end = window
+    rows = results[(results['start'] == start) & (results['end'] == end) & (results['total_trades'] >= min_trades)]
+    if jobs is not None:
+        keys = {tuple(float(value) for value in job[:7]) for job in jobs}
+        in_grid = [tuple(row[name].item() for name in PARAM_COLUMNS[:7]) in keys for row in rows]
+        rows = rows[np.array(in_grid, dtype=bool)]
+    if not len(rows):
+        return None
+    return rows[int(np.argmax(np.nan_to_num(rows[objective], nan=-np.inf)))]
+
+
+class WalkForward:
+    def __init__(self, rsi_periods=(7, 14, 15, 21), stoch_periods=(5, 9, 14), k_smooths=(3,), d_smooths=(3,),
+                 stop_losses=(5.0,), leverages=(50,), investments=(25.0,),
+                 in_sample_days=60, out_of_sample_days=15, step_days=None,
+                 objective='total_pnl', min_trades=5, initial_capital=35.0,
+                 base_interval='5m', warmup=50, workers=None, results_path=None):
+        """
+        Grade de parâmetros como no optimizer.parameter_grid
+        objective: coluna da tabela de resultados maximizada in-sample
+        results_path: CSV das buscas in-sample (retomável; recusado se for de outras velas,
+        ver optimizer.check_fingerprint); None = data/walk_forward/in_sample-<hash>.csv,
+        um arquivo por histórico e configuração (rodar de novo retoma ou começa outro)
+        """
+        self.grid = (rsi_periods, stoch_periods, k_smooths, d_smooths, stop_losses, leverages, investments)
+        self.in_sample_days = in_sample_days
+        self.out_of_sample_days = out_of_sample_days
+        self.step_days = step_days
+        self.objective = objective
+        self.min_trades = min_trades
+        self.initial_capital = initial_capital
+        self.base_interval = base_interval
+        self.warmup = warmup
+        self.workers = workers
+        self.results_path = results_path
+
+    def run(self, candles, verbose=True):
+        """
+        Executa o walk forward -> {'windows': [...], 'trades': [...], 'statistics': {...},
+        'equity_curve': array} com as estatísticas do out-of-sample costurado
+        """
+        series = as_series(candles)
+        windows = walk_forward_windows(series, self.in_sample_days, self.out_of_sample_days,
+                                       self.step_days, self.base_interval)
+        if not windows:
+            raise ValueError("Histórico curto demais para uma janela in-sample + out-of-sample")
+
+        # 1. Busca in-sample de todas as janelas de uma vez (pool + cache de sinais por worker)
+        jobs = parameter_grid(*self.grid, windows=[w['in_sample'] for w in windows])
+        results = run_optimization(series, jobs, self.results_path, self.workers, self.initial_capital,
+                                   self.base_interval, self.warmup, verbose=verbose,
+                                   results_dir=DEFAULT_RESULTS_DIR, prefix='in_sample')
+
+        # 2. Parâmetros escolhidos avaliados fora da amostra, com o capital passando de uma janela à outra
+        cache = PreparedCache(series, base_interval=self.base_interval, warmup=self.warmup)
+        stitched = TradeStats(self.initial_capital)
+        reports = []
+        trades = []
+        capital = self.initial_capital
+
+        for window in windows:
+            best = select_best(results, window['in_sample'], self.objective, self.min_trades, jobs)
+            report = {'in_sample': window['in_sample'], 'out_of_sample': window['out_of_sample'],
+                      'params': None, 'in_sample_score': None, 'statistics': None}
+
+            if best is not None:
+                params = {name: best[name].item() for name in PARAM_COLUMNS[:7]}
+                strategy_params = tuple(int(params[name]) for name in PARAM_COLUMNS[:4])
+                window_series, prepared = cache.window(strategy_params, *window['out_of_sample'])
+
+                backtester = Backtester(StochRSIStrategy(strategy_params), initial_capital=capital,
+                                        investment_per_trade=params['investment_per_trade'],
+                                        leverage=int(params['leverage']), base_interval=self.base_interval,
+                                        warmup=self.warmup, stop_loss_percent=params['stop_loss_percent'])
+                result = backtester.run(window_series, prepared=prepared)
+
+                for trade in result['trades']:
+                    stitched.add(trade.pnl_dollar)
+                trades.extend(result['trades'])
+                capital = result['statistics']['current_capital']
+
+                report.update(params=params, in_sample_score=best[self.objective].item(),
+                              statistics=result['statistics'])
+
+            reports.append(report)
+            if verbose:
+                self._print_window(report)
+
+        return {
+            'windows': reports,
+            'trades': trades,
+            'statistics': stitched.summary(),
+            'equity_curve': stitched.equity_curve,
+        }
+
+    @staticmethod
+    def _print_window(report):
+        start, end = (datetime.fromtimestamp(ts / 1000).strftime('%Y-%m-%d') for ts in report['out_of_sample'])
+        if report['params'] is None:
+            print(f"   {start} → {end}: sem parâmetros com trades suficientes in-sample")
+            return
+        params = report['params']
+        stats = report['statistics']
+        print(f"   {start} → {end}: RSI {params['rsi_period']:.0f}/{params['stoch_period']:.0f} "
+              f"stop {params['stop_loss_percent']:g}% {params['leverage']:.0f}x | "
+              f"IS {report['in_sample_score']:.2f} → OOS ${stats['total_pnl']:.2f} ({stats['total_trades']} trades)")
+
+
+def _values(text, kind=int):
+    return [kind(value) for value in text.split(',') if value]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Walk forward da estratégia Stoch RSI')
+    parser.add_argument('--file', default=None, help='CSV/JSON de velas ou pasta de um KlineStore')
+    parser.add_argument('--days', type=int, default=365, help='Dias de histórico do provedor (sem --file)')
+    parser.add_argument('--symbol', default='BTCUSDT')
+    parser.add_argument('--interval', default='5m')
+    parser.add_argument('--rsi', default='7,14,15,21')
+    parser.add_argument('--stoch', default='5,9,14')
+    parser.add_argument('--k', default='3')
+    parser.add_argument('--d', default='3')
+    parser.add_argument('--stop', default='3,5')
+    parser.add_argument('--leverage', default='50')
+    parser.add_argument('--investment', default='25')
+    parser.add_argument('--in-sample', type=float, default=60, help='Dias in-sample')
+    parser.add_argument('--out-of-sample', type=float, default=15, help='Dias out-of-sample')
+    parser.add_argument('--step', type=float, default=None, help='Avanço entre janelas (dias)')
+    parser.add_argument('--objective', default='total_pnl')
+    parser.add_argument('--min-trades', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--out', default=None,
+                        help='CSV das buscas in-sample (retomável; padrão: um arquivo por histórico em data/walk_forward)')
+    args = parser.parse_args()
+
+    if args.file:
+        candles = as_series(load_candles(args.file, args.symbol, args.interval))
+    else:
+        from data_provider import data_provider
+        candles = as_series(data_provider.get_historical_klines(args.days, args.symbol, args.interval))
+
+    walk_forward = WalkForward(_values(args.rsi), _values(args.stoch), _values(args.k), _values(args.d),
+                               _values(args.stop, float), _values(args.leverage), _values(args.investment, float),
+                               args.in_sample, args.out_of_sample, args.step, args.objective, args.min_trades,
+                               base_interval=args.interval, workers=args.workers, results_path=args.out)
+
+    print(f"🧪 Walk forward: {len(candles)} velas de {args.interval} ({args.symbol})")
+    result = walk_forward.run(candles)
+    stats = result['statistics']
+
+    print(f"\n📊 Out-of-sample costurado ({len(result['windows'])} janelas):")
+    print(f"   Trades: {stats['total_trades']} ({stats['won']} ganhos / {stats['lost']} perdas)")
+    print(f"   P&L total: ${stats['total_pnl']:.2f} ({stats['total_pnl_percent']:.2f}%)")
+    print(f"   Drawdown máximo: ${stats['max_drawdown']:.2f} | Expectativa: ${stats['expectancy']:.2f}")
+    print(f"   Capital final: ${stats['current_capital']:.2f}")